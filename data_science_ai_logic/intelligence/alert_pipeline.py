@@ -0,0 +1,399 @@
+'''
+Daily alert generation for every business in a local store.
+
+demo.py runs the three rules for one synthetic business. This pipeline runs them for every
+business in a sqlite store and writes the alerts back to it:
+
+    businesses(id, name, min_cash_buffer, cash_balance)                      amounts in kobo
+    daily_totals(business_id, day, income, expense)                          one row per business-day, kobo
+    inventory_items(id, business_id, name, quantity, unit, unit_cost, received_date, expiry_date)
+    alerts(..., run_id, business_id, run_date, alert_type, severity, ...)    written by the pipeline
+
+Stages, per chunk of `chunk_size` consecutive business ids:
+  1. load:      one range query per table. Only the 8 days the rules look at are read, and only
+                items that expire within EXPIRY_WARNING_DAYS (the rest are SAFE and never alert).
+  2. evaluate:  evaluate_inventory_items, evaluate_expense_anomaly and evaluate_cashflow_risk,
+                exactly as the backend would call them one business at a time.
+  3. write:     the chunk's alerts are inserted with a single executemany. Its checkpoint is
+                committed in the same transaction.
+
+Stages 1 and 2 run in worker processes. The parent keeps at most 2 x workers chunks in flight and
+does all the writes, so memory stays bounded and sqlite has a single writer. A run interrupted
+part-way resumes from its checkpoints: rerun with the same --run-id (default: the date).
+
+Run with (from data_science_ai_logic/):
+    python -m intelligence.alert_pipeline generate alerts.db --businesses 100000
+    python -m intelligence.alert_pipeline run alerts.db --as-of 2026-03-01 --workers 8
+'''
+import argparse
+import bisect
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .money import from_kobo
+from .rules import (
+    EXPIRY_WARNING_DAYS, evaluate_inventory_items, evaluate_expense_anomaly, evaluate_cashflow_risk,
+)
+
+DEFAULT_CHUNK_SIZE = 2000
+WINDOW_DAYS = 7
+PROGRESS_SECONDS = 2.0
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS businesses (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL,
+    min_cash_buffer INTEGER NOT NULL DEFAULT 0, cash_balance INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    business_id INTEGER NOT NULL, day TEXT NOT NULL,
+    income INTEGER NOT NULL DEFAULT 0, expense INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (business_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS inventory_items (
+    id INTEGER PRIMARY KEY, business_id INTEGER NOT NULL, name TEXT NOT NULL,
+    quantity INTEGER, unit TEXT, unit_cost INTEGER, received_date TEXT, expiry_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inventory_items_business_expiry ON inventory_items (business_id, expiry_date);
+"""
+
+OUTPUT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, business_id INTEGER NOT NULL, run_date TEXT NOT NULL,
+    alert_type TEXT NOT NULL, severity TEXT NOT NULL, title TEXT NOT NULL, message TEXT NOT NULL,
+    status TEXT NOT NULL, related_model TEXT, related_id INTEGER, extra TEXT
+);
+CREATE INDEX IF NOT EXISTS alerts_run_business ON alerts (run_id, business_id);
+CREATE TABLE IF NOT EXISTS alert_pipeline_chunks (
+    run_id TEXT NOT NULL, first_id INTEGER NOT NULL, last_id INTEGER NOT NULL,
+    businesses INTEGER NOT NULL, alerts INTEGER NOT NULL, PRIMARY KEY (run_id, first_id)
+);
+CREATE TABLE IF NOT EXISTS alert_pipeline_runs (
+    run_id TEXT PRIMARY KEY, as_of TEXT NOT NULL, finished INTEGER NOT NULL DEFAULT 0, report TEXT
+);
+"""
+
+STAGES = ("load", "inventory", "expense", "cashflow")
+
+
+def connect(path: str, read_only: bool = False) -> sqlite3.Connection:
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")      # workers keep reading while the parent writes
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# -------------------------
+# STAGES 1 + 2 (worker side)
+# -------------------------
+_READERS: Dict[str, sqlite3.Connection] = {}
+
+
+def _reader(path: str) -> sqlite3.Connection:
+    if path not in _READERS:
+        _READERS[path] = connect(path, read_only=True)
+    return _READERS[path]
+
+
+def evaluate_chunk(path: str, first_id: int, last_id: int, as_of: str) -> Tuple[List[tuple], Dict[str, float]]:
+    """Alerts for businesses first_id..last_id as alert-table rows (minus run_id), plus stage seconds."""
+    conn = _reader(path)
+    today = date.fromisoformat(as_of)
+    window = [(today - timedelta(days=d)).isoformat() for d in range(WINDOW_DAYS, 0, -1)]
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    t0 = time.perf_counter()
+    businesses = conn.execute(
+        "SELECT id, min_cash_buffer, cash_balance FROM businesses WHERE id BETWEEN ? AND ? ORDER BY id",
+        (first_id, last_id),
+    ).fetchall()
+    daily: Dict[int, Dict[str, Tuple[int, int]]] = {}
+    for bid, day, income, expense in conn.execute(
+        "SELECT business_id, day, income, expense FROM daily_totals"
+        " WHERE business_id BETWEEN ? AND ? AND day BETWEEN ? AND ?",
+        (first_id, last_id, window[0], as_of),
+    ):
+        daily.setdefault(bid, {})[day] = (income, expense)
+    items: Dict[int, List[Dict[str, Any]]] = {}
+    for bid, item_id, name, expiry in conn.execute(
+        "SELECT business_id, id, name, expiry_date FROM inventory_items"
+        " WHERE business_id BETWEEN ? AND ? AND expiry_date <= ?",
+        (first_id, last_id, (today + timedelta(days=EXPIRY_WARNING_DAYS)).isoformat()),
+    ):
+        items.setdefault(bid, []).append({"id": item_id, "name": name, "expiry_date": date.fromisoformat(expiry)})
+    timings["load"] = time.perf_counter() - t0
+
+    rows: List[tuple] = []
+
+    def add(bid: int, alert: Optional[Dict[str, Any]]) -> None:
+        if alert:
+            rows.append((bid, as_of, alert["alert_type"], alert["severity"], alert["title"], alert["message"],
+                         alert["status"], alert["related_model"], alert["related_id"], json.dumps(alert["extra"])))
+
+    for bid, min_cash_buffer, cash_balance in businesses:
+        t0 = time.perf_counter()
+        for a in evaluate_inventory_items(items.get(bid, ()), today):
+            add(bid, a)
+        t1 = time.perf_counter()
+
+        days = daily.get(bid, {})
+        income = [from_kobo(days.get(d, (0, 0))[0]) for d in window]
+        expense = [from_kobo(days.get(d, (0, 0))[1]) for d in window]
+        today_income, today_expense = (from_kobo(k) for k in days.get(as_of, (0, 0)))
+        add(bid, evaluate_expense_anomaly(today_total=today_expense, last_7_days_totals=expense))
+        t2 = time.perf_counter()
+
+        add(bid, evaluate_cashflow_risk(
+            last_7_days_income_totals=income, last_7_days_expense_totals=expense,
+            today_income=today_income, today_expense=today_expense,
+            min_cash_buffer=from_kobo(min_cash_buffer), today_cash_balance=from_kobo(cash_balance),
+        ))
+        t3 = time.perf_counter()
+        timings["inventory"] += t1 - t0
+        timings["expense"] += t2 - t1
+        timings["cashflow"] += t3 - t2
+
+    timings["businesses"] = len(businesses)
+    return rows, timings
+
+
+def _evaluate_task(args) -> Tuple[int, int, List[tuple], Dict[str, float]]:
+    path, first_id, last_id, as_of = args
+    rows, timings = evaluate_chunk(path, first_id, last_id, as_of)
+    return first_id, last_id, rows, timings
+
+
+# -------------------------
+# CHUNKS + CHECKPOINTS
+# -------------------------
+def iter_chunks(conn: sqlite3.Connection, chunk_size: int,
+                done: List[Tuple[int, int]]) -> Iterator[Tuple[int, int]]:
+    """(first_id, last_id) ranges of up to chunk_size businesses not covered by a done range."""
+    done = sorted(done)
+    starts = [lo for lo, _ in done]
+    after = None
+    while True:
+        if after is None:
+            ids = [r[0] for r in conn.execute("SELECT id FROM businesses ORDER BY id LIMIT ?", (chunk_size,))]
+        else:
+            ids = [r[0] for r in conn.execute(
+                "SELECT id FROM businesses WHERE id > ? ORDER BY id LIMIT ?", (after, chunk_size))]
+        if not ids:
+            return
+        i = bisect.bisect_right(starts, ids[0]) - 1
+        if i >= 0 and done[i][1] >= ids[0]:
+            after = done[i][1]          # inside a finished chunk: skip past it
+            continue
+        if i + 1 < len(done) and done[i + 1][0] <= ids[-1]:
+            ids = [x for x in ids if x < done[i + 1][0]]   # stop where the next finished chunk starts
+        yield ids[0], ids[-1]
+        after = ids[-1]
+
+
+def _write_chunk(conn: sqlite3.Connection, run_id: str, first_id: int, last_id: int,
+                 rows: List[tuple], businesses: int) -> None:
+    with conn:
+        conn.executemany(
+            "INSERT INTO alerts (run_id, business_id, run_date, alert_type, severity, title, message, status,"
+            " related_model, related_id, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, *r) for r in rows],
+        )
+        conn.execute(
+            "INSERT INTO alert_pipeline_chunks (run_id, first_id, last_id, businesses, alerts) VALUES (?, ?, ?, ?, ?)",
+            (run_id, first_id, last_id, businesses, len(rows)),
+        )
+
+
+# -------------------------
+# RUN
+# -------------------------
+def run_pipeline(path: str, as_of: Optional[str] = None, run_id: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, workers: Optional[int] = None,
+                 fresh: bool = False, progress: bool = True) -> Dict[str, Any]:
+    """Evaluate every business in the store at `path` and write the alerts; returns a report."""
+    as_of = as_of or date.today().isoformat()
+    run_id = run_id or as_of
+    workers = workers or os.cpu_count() or 1
+    t_start = time.perf_counter()
+
+    conn = connect(path)
+    conn.executescript(OUTPUT_SCHEMA)
+    with conn:
+        if fresh:
+            conn.execute("DELETE FROM alerts WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM alert_pipeline_chunks WHERE run_id = ?", (run_id,))
+        conn.execute("INSERT OR REPLACE INTO alert_pipeline_runs (run_id, as_of, finished) VALUES (?, ?, 0)",
+                     (run_id, as_of))
+
+    total = conn.execute("SELECT COUNT(*) FROM businesses").fetchone()[0]
+    done = conn.execute(
+        "SELECT first_id, last_id, businesses FROM alert_pipeline_chunks WHERE run_id = ?", (run_id,)
+    ).fetchall()
+    resumed = sum(r[2] for r in done)
+    chunks = iter_chunks(conn, chunk_size, [(lo, hi) for lo, hi, _ in done])
+
+    stage_seconds = dict.fromkeys(STAGES + ("write",), 0.0)
+    counts = {"businesses": 0, "alerts": 0, "chunks": 0}
+    severities: Dict[str, int] = {}
+    last_report = time.perf_counter()
+
+    def finish(first_id, last_id, rows, timings):
+        nonlocal last_report
+        t0 = time.perf_counter()
+        _write_chunk(conn, run_id, first_id, last_id, rows, int(timings["businesses"]))
+        stage_seconds["write"] += time.perf_counter() - t0
+        for stage in STAGES:
+            stage_seconds[stage] += timings[stage]
+        counts["businesses"] += int(timings["businesses"])
+        counts["alerts"] += len(rows)
+        counts["chunks"] += 1
+        for r in rows:
+            key = f"{r[2]}:{r[3]}"
+            severities[key] = severities.get(key, 0) + 1
+        now = time.perf_counter()
+        if progress and now - last_report >= PROGRESS_SECONDS:
+            last_report = now
+            done_n = resumed + counts["businesses"]
+            rate = counts["businesses"] / (now - t_start)
+            eta = (total - done_n) / rate if rate else float("inf")
+            print(f"[alerts] {done_n:,}/{total:,} businesses  {rate:,.0f}/s  "
+                  f"{counts['alerts']:,} alerts  eta {eta:,.0f}s", file=sys.stderr)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            for first_id, last_id in chunks:
+                in_flight.add(pool.submit(_evaluate_task, (path, first_id, last_id, as_of)))
+                if len(in_flight) >= 2 * workers:
+                    completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for f in completed:
+                        finish(*f.result())
+            for f in in_flight:
+                finish(*f.result())
+    else:
+        for first_id, last_id in chunks:
+            finish(*_evaluate_task((path, first_id, last_id, as_of)))
+
+    wall = time.perf_counter() - t_start
+    report = {
+        "run_id": run_id,
+        "as_of": as_of,
+        "store": path,
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "businesses_total": total,
+        "businesses_resumed": resumed,
+        **counts,
+        "alerts_by_type_severity": dict(sorted(severities.items())),
+        "wall_seconds": round(wall, 3),
+        "businesses_per_second": round(counts["businesses"] / wall, 1) if wall else None,
+        # load/evaluate stages are summed over worker processes; write is the parent's time
+        "stage_seconds": {k: round(v, 3) for k, v in stage_seconds.items()},
+    }
+    with conn:
+        conn.execute("UPDATE alert_pipeline_runs SET finished = 1, report = ? WHERE run_id = ?",
+                     (json.dumps(report), run_id))
+    conn.close()
+    return report
+
+
+# -------------------------
+# SYNTHETIC STORE
+# -------------------------
+def generate_store(path: str, n_businesses: int, as_of: Optional[str] = None, days: int = WINDOW_DAYS + 1,
+                   items_per_business: int = 8, seed: int = 42, batch: int = 5000) -> None:
+    """A store of n businesses with the sample sheets' healthy / struggling / variable profiles,
+    `days` of daily totals ending at as_of, and inventory expiring from 3 days ago to 30 ahead."""
+    rng = random.Random(seed)
+    today = date.fromisoformat(as_of) if as_of else date.today()
+    day_list = [(today - timedelta(days=d)).isoformat() for d in range(days - 1, -1, -1)]
+    profiles = {"healthy": (1.35, 0.15), "struggling": (0.92, 0.25), "variable": (1.05, 0.45)}
+    products = ["Tomatoes", "Milk", "Rice", "Bread", "Yam", "Beans", "Pepper", "Onions", "Garri", "Eggs"]
+
+    conn = connect(path)
+    conn.executescript(STORE_SCHEMA)
+    item_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM inventory_items").fetchone()[0]
+    first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM businesses").fetchone()[0] + 1
+
+    for start in range(first, first + n_businesses, batch):
+        businesses, totals, items = [], [], []
+        for bid in range(start, min(start + batch, first + n_businesses)):
+            profile = rng.choice(list(profiles))
+            margin, noise = profiles[profile]
+            base = rng.uniform(20000, 120000)
+            for day in day_list:
+                income = max(0.0, rng.gauss(base * margin, base * noise))
+                expense = max(0.0, rng.gauss(base, base * noise * 0.5))
+                if rng.random() < 0.03:
+                    expense *= rng.uniform(1.5, 4.0)        # occasional spend spike
+                totals.append((bid, day, round(income * 100), round(expense * 100)))
+            buffer = round(base * 2)
+            balance = round(base * rng.uniform(0.5, 6.0))
+            businesses.append((bid, f"{profile}_{bid:06d}", buffer * 100, balance * 100))
+            for _ in range(items_per_business):
+                item_id += 1
+                received = today - timedelta(days=rng.randint(0, 20))
+                expiry = today + timedelta(days=rng.randint(-3, 30))
+                items.append((item_id, bid, rng.choice(products), rng.randint(1, 50), "unit",
+                              rng.randint(100, 5000) * 100, received.isoformat(), expiry.isoformat()))
+        with conn:
+            conn.executemany("INSERT INTO businesses VALUES (?, ?, ?, ?)", businesses)
+            conn.executemany("INSERT INTO daily_totals VALUES (?, ?, ?, ?)", totals)
+            conn.executemany("INSERT INTO inventory_items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", items)
+    conn.close()
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"\n=== ALERTS  run={report['run_id']} as_of={report['as_of']} workers={report['workers']} ===")
+    print(f"{report['businesses']:,} businesses in {report['chunks']} chunks "
+          f"({report['businesses_resumed']:,} already done), {report['alerts']:,} alerts, "
+          f"{report['wall_seconds']}s wall, {report['businesses_per_second']:,}/s")
+    print("stage seconds: " + "  ".join(f"{k}={v}" for k, v in report["stage_seconds"].items()))
+    for key, n in report["alerts_by_type_severity"].items():
+        print(f"  {key}: {n:,}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Daily alert generation for every business in a local store.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="create / extend a synthetic store")
+    gen.add_argument("store")
+    gen.add_argument("--businesses", type=int, default=1000)
+    gen.add_argument("--as-of", default=None)
+    gen.add_argument("--items", type=int, default=8, help="inventory items per business")
+    gen.add_argument("--seed", type=int, default=42)
+    run = sub.add_parser("run", help="evaluate the rules for every business and write the alerts")
+    run.add_argument("store")
+    run.add_argument("--as-of", default=None, help="day to score (default: today)")
+    run.add_argument("--run-id", default=None, help="checkpoint key (default: the as-of date)")
+    run.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    run.add_argument("--workers", type=int, default=None)
+    run.add_argument("--fresh", action="store_true", help="discard this run's alerts and checkpoints first")
+    run.add_argument("--out", help="write the JSON report here")
+    args = ap.parse_args()
+
+    if args.command == "generate":
+        t0 = time.perf_counter()
+        generate_store(args.store, args.businesses, args.as_of, items_per_business=args.items, seed=args.seed)
+        print(f"Wrote {args.businesses:,} businesses to {args.store} in {time.perf_counter() - t0:.1f}s")
+        return
+
+    report = run_pipeline(args.store, as_of=args.as_of, run_id=args.run_id, chunk_size=args.chunk_size,
+                          workers=args.workers, fresh=args.fresh)
+    _print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
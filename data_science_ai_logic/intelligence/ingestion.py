@@ -0,0 +1,214 @@
+'''
+Cached columnar ingestion of the sample-dataset workbooks.
+
+Parsing 'ALL_SAMPLE_DATASETS (1).xlsx' is the slowest step of every notebook run. This module
+parses each sheet once and stores it as typed columns, one .npy file per column, under
+
+    <cache_dir>/<sha256 of the workbook>/<sheet>/<column>.npy
+    <cache_dir>/<sha256 of the workbook>/manifest.json
+
+Column types:
+- dates become datetime64[ns] (UTC)
+- numbers become int64 / float64
+- text columns are dictionary-encoded as int32 codes, with the category list kept in the manifest
+
+Loads memory-map the .npy files and read only the requested columns. The cache key is the
+workbook's content hash, so an edited workbook gets a fresh cache and an unchanged copy under a
+different name reuses the existing one.
+
+Run with (from data_science_ai_logic/):
+    python -m intelligence.ingestion warm "ALL_SAMPLE_DATASETS (1).xlsx"
+    python -m intelligence.ingestion info "ALL_SAMPLE_DATASETS (1).xlsx"
+'''
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "workbooks")
+FORMAT_VERSION = 1
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(name))
+
+
+def _is_date_column(name: str, s: pd.Series) -> bool:
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return True
+    return name == "date" or name.endswith("_date") or name.endswith("_at")
+
+
+# -------------------------
+# WRITE
+# -------------------------
+def _encode_column(name: str, s: pd.Series, out_dir: str, file_name: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, f"{file_name}.npy")
+    if _is_date_column(name, s):
+        parsed = pd.to_datetime(s, utc=True, errors="coerce")
+        if parsed.notna().sum() >= s.notna().sum():
+            np.save(path, parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]"))
+            return {"kind": "datetime", "dtype": "datetime64[ns]"}
+    if pd.api.types.is_bool_dtype(s):
+        np.save(path, s.to_numpy(dtype=bool))
+        return {"kind": "bool", "dtype": "bool"}
+    if pd.api.types.is_integer_dtype(s):
+        np.save(path, s.to_numpy(dtype=np.int64))
+        return {"kind": "int", "dtype": "int64"}
+    if pd.api.types.is_float_dtype(s):
+        np.save(path, s.to_numpy(dtype=np.float64))
+        return {"kind": "float", "dtype": "float64"}
+
+    codes, categories = pd.factorize(s.astype("string"), use_na_sentinel=True)
+    np.save(path, codes.astype(np.int32))
+    return {"kind": "category", "dtype": "int32", "categories": [str(c) for c in categories]}
+
+
+def _write_sheet(df: pd.DataFrame, out_dir: str) -> Dict[str, Any]:
+    os.makedirs(out_dir)
+    columns = {}
+    for i, name in enumerate(df.columns):
+        file_name = f"{i:03d}_{_safe_name(name)}"
+        columns[str(name)] = {"file": f"{file_name}.npy", **_encode_column(str(name), df[name], out_dir, file_name)}
+    return {"rows": int(len(df)), "columns": columns}
+
+
+def warm(path: str, cache_dir: str = DEFAULT_CACHE_DIR, force: bool = False) -> Dict[str, Any]:
+    """Parse every sheet of the workbook into the cache (no-op when already cached). Returns the manifest."""
+    digest = file_hash(path)
+    target = os.path.join(cache_dir, digest)
+    manifest_path = os.path.join(target, "manifest.json")
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    sheets = pd.read_excel(path, sheet_name=None)
+    parse_seconds = time.perf_counter() - t0
+
+    # build in a scratch directory and rename into place, so readers never see half a cache
+    tmp = tempfile.mkdtemp(prefix=f".{digest[:12]}-", dir=cache_dir)
+    try:
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "sha256": digest,
+            "source": os.path.basename(path),
+            "parse_seconds": round(parse_seconds, 3),
+            "sheets": {},
+        }
+        for i, (name, df) in enumerate(sheets.items()):
+            sheet_dir = f"{i:02d}_{_safe_name(name)}"
+            manifest["sheets"][str(name)] = {"dir": sheet_dir, **_write_sheet(df, os.path.join(tmp, sheet_dir))}
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return manifest
+
+
+# -------------------------
+# READ
+# -------------------------
+class CachedWorkbook:
+    """Read side of the cache for one workbook. Columns are memory-mapped and loaded on demand."""
+
+    def __init__(self, path: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.manifest = warm(path, cache_dir)
+        self.root = os.path.join(cache_dir, self.manifest["sha256"])
+
+    @property
+    def sheets(self) -> List[str]:
+        return list(self.manifest["sheets"])
+
+    def _sheet(self, sheet: str) -> Dict[str, Any]:
+        try:
+            return self.manifest["sheets"][sheet]
+        except KeyError:
+            raise KeyError(f"Sheet '{sheet}' not in workbook; have {self.sheets}")
+
+    def columns(self, sheet: str, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Raw column arrays (read-only memmaps). Text columns come back as int32 codes."""
+        meta = self._sheet(sheet)
+        wanted = columns or list(meta["columns"])
+        out = {}
+        for name in wanted:
+            if name not in meta["columns"]:
+                raise KeyError(f"Column '{name}' not in sheet '{sheet}'")
+            col = meta["columns"][name]
+            out[name] = np.load(os.path.join(self.root, meta["dir"], col["file"]), mmap_mode="r")
+        return out
+
+    def categories(self, sheet: str, column: str) -> List[str]:
+        return self._sheet(sheet)["columns"][column].get("categories", [])
+
+    def load(self, sheet: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """A DataFrame with just the requested columns; text columns come back as pandas Categoricals."""
+        meta = self._sheet(sheet)
+        data = {}
+        for name, arr in self.columns(sheet, columns).items():
+            col = meta["columns"][name]
+            if col["kind"] == "category":
+                data[name] = pd.Categorical.from_codes(np.asarray(arr), categories=col["categories"])
+            else:
+                data[name] = arr
+        return pd.DataFrame(data, copy=False)
+
+    def load_all(self, columns: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        return {sheet: self.load(sheet, columns) for sheet in self.sheets}
+
+
+def read_sheet(path: str, sheet: str, columns: Optional[List[str]] = None,
+               cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """Drop-in for pd.read_excel(path, sheet_name=sheet, usecols=columns)."""
+    return CachedWorkbook(path, cache_dir).load(sheet, columns)
+
+
+# -------------------------
+# CLI
+# -------------------------
+def main():
+    ap = argparse.ArgumentParser(description="Columnar cache for the sample-dataset workbooks.")
+    ap.add_argument("command", choices=["warm", "info"])
+    ap.add_argument("workbook")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    ap.add_argument("--force", action="store_true", help="re-parse even if the cache exists")
+    args = ap.parse_args()
+
+    if args.command == "warm":
+        t0 = time.perf_counter()
+        manifest = warm(args.workbook, args.cache_dir, force=args.force)
+        print(f"Cached {len(manifest['sheets'])} sheet(s) of {manifest['source']} in {time.perf_counter() - t0:.3f}s "
+              f"(excel parse {manifest['parse_seconds']}s) -> {os.path.join(args.cache_dir, manifest['sha256'])}")
+        return
+
+    wb = CachedWorkbook(args.workbook, args.cache_dir)
+    print(f"{wb.manifest['source']}  sha256={wb.manifest['sha256'][:16]}...")
+    for sheet, meta in wb.manifest["sheets"].items():
+        cols = ", ".join(f"{n}:{c['kind']}" for n, c in meta["columns"].items())
+        print(f"- {sheet}: {meta['rows']} rows  [{cols}]")
+
+
+if __name__ == "__main__":
+    main()
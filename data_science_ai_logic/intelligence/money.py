@@ -0,0 +1,35 @@
+"""Fixed-point money for the rules: naira amounts as integer kobo.
+
+Same rounding as the backend's NUMERIC(15,2) columns (half away from zero), so rule decisions
+and alert figures agree with the database to the kobo. Stdlib only, like the rest of this package.
+"""
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from fractions import Fraction
+from typing import Iterable
+
+KOBO_PER_NAIRA = 100
+
+
+def to_kobo(value) -> int:
+    """Naira (int, float, str or Decimal) -> kobo, rounded half away from zero."""
+    if isinstance(value, int):
+        return value * KOBO_PER_NAIRA
+    try:
+        # str() first so 1.005 converts as written, not as its binary approximation
+        return int(Decimal(str(value).strip()).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Not a valid amount: {value!r}")
+
+
+def from_kobo(kobo: int) -> float:
+    return kobo / KOBO_PER_NAIRA
+
+
+def sum_kobo(values: Iterable) -> int:
+    return sum(to_kobo(v) for v in values)
+
+
+def ratio_at_least(numerator_kobo: int, denominator_kobo: int, threshold) -> bool:
+    """numerator / denominator >= threshold, decided exactly (no float division)."""
+    t = Fraction(str(threshold))
+    return numerator_kobo * t.denominator >= t.numerator * denominator_kobo
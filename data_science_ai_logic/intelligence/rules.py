@@ -1,6 +1,8 @@
 from datetime import date
+from typing import Optional
 from .models import Alert
 from .aggregates import mean, safe_ratio
+from .money import to_kobo, sum_kobo, ratio_at_least
 
 # ============================================================
 # 4) Business Rules & Logic
@@ -9,13 +11,15 @@ from .aggregates import mean, safe_ratio
 # -------------------------
 # INVENTORY EXPIRY LOGIC
 # -------------------------
+EXPIRY_WARNING_DAYS = 5   # items further out than this are SAFE and never alert
+
 def inventory_expiry_label(days_left: int) -> str:
     """Maps remaining days to a label."""
     if days_left <= 0:
         return "EXPIRED"
     if days_left <= 2:
         return "URGENT"
-    if days_left <= 5:
+    if days_left <= EXPIRY_WARNING_DAYS:
         return "WARNING"
     return "SAFE"
 
@@ -28,9 +32,12 @@ def inventory_expiry_severity(label: str) -> str:
         "EXPIRED": "CRITICAL",
     }[label]
 
-def evaluate_inventory_item(item_id: int, name: str, expiry_date: date):
-    """Return an expiry alert dict for a single item, or None if SAFE."""
-    today = date.today()
+def evaluate_inventory_item(item_id: int, name: str, expiry_date: date, today: Optional[date] = None):
+    """Return an expiry alert dict for a single item, or None if SAFE.
+
+    today defaults to date.today(); batch runs pass the day they are scoring.
+    """
+    today = today or date.today()
     days_left = (expiry_date - today).days
     label = inventory_expiry_label(days_left)
     severity = inventory_expiry_severity(label)
@@ -54,14 +61,15 @@ def evaluate_inventory_item(item_id: int, name: str, expiry_date: date):
         extra={"days_left": days_left, "expiry_label": label}
     ).to_dict()
 
-def evaluate_inventory_items(items):
+def evaluate_inventory_items(items, today: Optional[date] = None):
     """Evaluate a list of inventory items.
 
     items: list of dicts with keys: id, name, expiry_date (as date)
     """
+    today = today or date.today()
     alerts = []
     for it in items:
-        a = evaluate_inventory_item(it["id"], it["name"], it["expiry_date"])
+        a = evaluate_inventory_item(it["id"], it["name"], it["expiry_date"], today)
         if a:
             alerts.append(a)
     return alerts
@@ -80,21 +88,24 @@ def evaluate_expense_anomaly(today_total: float, last_7_days_totals: list[float]
       >= 1.5x -> MEDIUM
       else -> no alert
     """
-    baseline = mean(last_7_days_totals)
-    if baseline <= 0:
+    # decided in exact kobo: ratio >= t  <=>  today * n >= t * sum(last n days)
+    n = len(last_7_days_totals)
+    baseline_sum = sum_kobo(last_7_days_totals)
+    if n == 0 or baseline_sum <= 0:
         return None
 
-    r = safe_ratio(today_total, baseline)
-
-    if r >= 3.0:
+    today = to_kobo(today_total) * n
+    if ratio_at_least(today, baseline_sum, 3.0):
         sev = "CRITICAL"
-    elif r >= 2.0:
+    elif ratio_at_least(today, baseline_sum, 2.0):
         sev = "HIGH"
-    elif r >= 1.5:
+    elif ratio_at_least(today, baseline_sum, 1.5):
         sev = "MEDIUM"
     else:
         return None
 
+    baseline = mean(last_7_days_totals)
+    r = safe_ratio(today_total, baseline)
     msg = f"Today's expenses are {r:.1f}× higher than your 7-day average."
 
     return Alert(
@@ -130,19 +141,20 @@ def evaluate_cashflow_risk(
     - If today expense > today income -> MEDIUM
     - else -> LOW
     """
+    # comparisons in kobo so a balance equal to the buffer in the database is not "below" it here
     deficits_last_3 = 0
     for i in range(1, 4):
         if len(last_7_days_income_totals) >= i and len(last_7_days_expense_totals) >= i:
-            if last_7_days_expense_totals[-i] > last_7_days_income_totals[-i]:
+            if to_kobo(last_7_days_expense_totals[-i]) > to_kobo(last_7_days_income_totals[-i]):
                 deficits_last_3 += 1
 
-    if today_cash_balance < min_cash_buffer:
+    if to_kobo(today_cash_balance) < to_kobo(min_cash_buffer):
         sev = "CRITICAL"
         msg = "Cash balance is below your minimum buffer. Immediate action recommended."
     elif deficits_last_3 == 3:
         sev = "HIGH"
         msg = "Expenses exceeded income for 3 consecutive days. Cashflow risk is high."
-    elif today_expense > today_income:
+    elif to_kobo(today_expense) > to_kobo(today_income):
         sev = "MEDIUM"
         msg = "Today's expenses are higher than today's income. Monitor cashflow closely."
     else:
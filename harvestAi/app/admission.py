@@ -0,0 +1,263 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Deque, Optional
+
+ITEMS_PER_COST_UNIT = 1000       # one unit ~ 1k rows of classification/summarising work
+CELLS_PER_ITEM = 400             # simulated path-days costing about as much as one row
+MAX_REQUEST_SHARE = 0.5          # one request never reserves more than half a route's capacity
+MAX_SKIPS = 8                    # a waiter passed over this many times blocks smaller ones behind it
+
+DEFAULT_CAPACITY = int(os.getenv("HARVESTAI_ADMISSION_CAPACITY", "64"))
+DEFAULT_MAX_WAIT = float(os.getenv("HARVESTAI_ADMISSION_MAX_WAIT", "2.0"))
+DEFAULT_MAX_QUEUED = int(os.getenv("HARVESTAI_ADMISSION_MAX_QUEUED", "256"))
+DEFAULT_MAX_QUEUED_PER_TENANT = int(os.getenv("HARVESTAI_ADMISSION_MAX_QUEUED_PER_TENANT", "32"))
+# every admitted request also holds one of these, whatever its route: the routes share one
+# threadpool (anyio's default is 40 threads), so per-route budgets alone can oversubscribe it
+GLOBAL_CAPACITY = int(os.getenv("HARVESTAI_ADMISSION_GLOBAL_CAPACITY", "40"))
+GLOBAL = "global"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, route: str, reason: str, retry_after: float):
+        self.route = route
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{route}: {reason}")
+
+
+class _Waiter:
+    __slots__ = ("tenant", "cost", "future", "skips")
+
+    def __init__(self, tenant: str, cost: int, future: asyncio.Future):
+        self.tenant = tenant
+        self.cost = cost
+        self.future = future
+        self.skips = 0
+
+
+class RouteLimiter:
+    """Cost-weighted concurrency limit for one route with a bounded, tenant-fair wait queue.
+
+    Requests reserve `cost` units out of `capacity`. When a request cannot start immediately it is
+    queued under its tenant; freed capacity is handed out round-robin across tenants, so one
+    business flooding the route only ever competes for its own turn. While another tenant is
+    queued below its fair share (capacity / active tenants), a tenant already holding more than
+    that is not granted more, though it always gets at least one request in flight. All state is
+    touched from the event loop only, so no locking is needed.
+    """
+
+    def __init__(self, name: str, capacity: int = DEFAULT_CAPACITY, max_wait: float = DEFAULT_MAX_WAIT,
+                 max_queued: int = DEFAULT_MAX_QUEUED, max_queued_per_tenant: int = DEFAULT_MAX_QUEUED_PER_TENANT):
+        self.name = name
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+        self.max_queued_per_tenant = max_queued_per_tenant
+        self.in_use = 0
+        self.queued = 0
+        self._tenant_in_use: Dict[str, int] = {}
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._seconds_per_unit = 0.01   # EWMA of service time, used for Retry-After hints
+        self.stats = {"admitted": 0, "queued_total": 0, "rejected_full": 0, "rejected_timeout": 0}
+
+    def clamp(self, cost: int) -> int:
+        return max(1, min(cost, max(1, int(self.capacity * MAX_REQUEST_SHARE))))
+
+    def _fair_share(self) -> int:
+        active = len(self._tenant_in_use.keys() | self._queues.keys())
+        return max(1, self.capacity // max(1, active))
+
+    def _over_share(self, tenant: str, cost: int) -> bool:
+        held = self._tenant_in_use.get(tenant, 0)
+        share = self._fair_share()
+        if held == 0 or held + cost <= share:
+            return False
+        return any(t != tenant and self._tenant_in_use.get(t, 0) < share for t in self._queues)
+
+    def _grant(self, tenant: str, cost: int) -> None:
+        self.in_use += cost
+        self._tenant_in_use[tenant] = self._tenant_in_use.get(tenant, 0) + cost
+
+    def _retry_after(self) -> float:
+        backlog = self.in_use + sum(w.cost for q in self._queues.values() for w in q)
+        return max(1.0, math.ceil(backlog * self._seconds_per_unit / self.capacity))
+
+    async def acquire(self, tenant: str, cost: int) -> int:
+        cost = self.clamp(cost)
+
+        if not self._queues and self.in_use + cost <= self.capacity:
+            self._grant(tenant, cost)
+            self.stats["admitted"] += 1
+            return cost
+
+        tenant_queue = self._queues.get(tenant)
+        if self.queued >= self.max_queued or (tenant_queue and len(tenant_queue) >= self.max_queued_per_tenant):
+            self.stats["rejected_full"] += 1
+            raise AdmissionRejected(self.name, "queue full", self._retry_after())
+
+        waiter = _Waiter(tenant, cost, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(tenant, deque()).append(waiter)
+        self.queued += 1
+        self.stats["queued_total"] += 1
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # granted in the same tick the timer fired; give the capacity back
+                self.release(tenant, cost)
+            else:
+                self._remove(waiter)
+                waiter.future.cancel()
+                self._dispatch()
+            self.stats["rejected_timeout"] += 1
+            raise AdmissionRejected(self.name, "timed out waiting for capacity", self._retry_after())
+        except asyncio.CancelledError:
+            # client went away while queued
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(tenant, cost)
+            else:
+                self._remove(waiter)
+                self._dispatch()
+            raise
+
+        self.stats["admitted"] += 1
+        return cost
+
+    def release(self, tenant: str, cost: int, elapsed: Optional[float] = None) -> None:
+        self.in_use -= cost
+        held = self._tenant_in_use.get(tenant, 0) - cost
+        if held > 0:
+            self._tenant_in_use[tenant] = held
+        else:
+            self._tenant_in_use.pop(tenant, None)
+        if elapsed is not None:
+            self._seconds_per_unit = 0.9 * self._seconds_per_unit + 0.1 * (elapsed / cost)
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        q = self._queues.get(waiter.tenant)
+        if q and waiter in q:
+            q.remove(waiter)
+            self.queued -= 1
+            if not q:
+                del self._queues[waiter.tenant]
+
+    def _dispatch(self) -> None:
+        # Round-robin over tenants: look at each tenant's head waiter once per pass, grant it if it
+        # fits, then move that tenant to the back. A head that has been skipped MAX_SKIPS times
+        # stops the pass so large requests are not starved by a stream of small ones. A tenant over
+        # its fair share is passed over (without counting a skip) while others are owed capacity.
+        progressed = True
+        while self._queues and progressed:
+            progressed = False
+            for tenant in list(self._queues.keys()):
+                q = self._queues[tenant]
+                head = q[0]
+                if self._over_share(tenant, head.cost):
+                    continue
+                if self.in_use + head.cost > self.capacity:
+                    head.skips += 1
+                    if head.skips > MAX_SKIPS:
+                        return
+                    continue
+
+                q.popleft()
+                self.queued -= 1
+                self._grant(tenant, head.cost)
+                head.future.set_result(True)
+                progressed = True
+
+                del self._queues[tenant]
+                if q:
+                    self._queues[tenant] = q
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "queued": self.queued,
+            "queued_tenants": len(self._queues),
+            "tenants_in_flight": len(self._tenant_in_use),
+            "fair_share": self._fair_share(),
+            **self.stats,
+        }
+
+
+_LIMITERS: Dict[str, RouteLimiter] = {GLOBAL: RouteLimiter(GLOBAL, capacity=GLOBAL_CAPACITY)}
+
+
+def limiter(route: str) -> RouteLimiter:
+    if route not in _LIMITERS:
+        _LIMITERS[route] = RouteLimiter(route)
+    return _LIMITERS[route]
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: lim.snapshot() for name, lim in _LIMITERS.items()}
+
+
+@asynccontextmanager
+async def admit(route: str, tenant: str, items: int):
+    # the route's cost budget first, then one request slot of the budget shared by all routes
+    lim, shared = limiter(route), _LIMITERS[GLOBAL]
+    cost = await lim.acquire(tenant, estimate_cost(items))
+    try:
+        await shared.acquire(tenant, 1)
+    except BaseException:
+        lim.release(tenant, cost)
+        raise
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed = time.monotonic() - started
+        shared.release(tenant, 1, elapsed=elapsed)
+        lim.release(tenant, cost, elapsed=elapsed)
+
+
+# -------------------------
+# COST / TENANT ESTIMATION
+# -------------------------
+def estimate_cost(items: int) -> int:
+    return 1 + items // ITEMS_PER_COST_UNIT
+
+
+def simulation_items(paths: int, horizon_days: int) -> int:
+    """Row-equivalents of a Monte Carlo run; its cost is paths * horizon_days, not its input size."""
+    return paths * horizon_days // CELLS_PER_ITEM
+
+
+def count_items(payload: Any) -> int:
+    """Row count of any of the request shapes the /run routes accept."""
+    if isinstance(payload, list):
+        return len(payload)
+    if isinstance(payload, dict):
+        for key in ("inventory", "expenses", "transactions"):
+            if isinstance(payload.get(key), list):
+                return len(payload[key])
+        if isinstance(payload.get("data"), dict):
+            return count_items(payload["data"])
+    return 0
+
+
+def tenant_of(payload: Any, header_value: Optional[str] = None) -> str:
+    """business_id from the X-Business-Id header, the payload, or its first row."""
+    if header_value:
+        return header_value
+    if isinstance(payload, dict):
+        if payload.get("business_id"):
+            return str(payload["business_id"])
+        if isinstance(payload.get("data"), dict):
+            return tenant_of(payload["data"])
+        for key in ("inventory", "expenses", "transactions"):
+            rows = payload.get(key)
+            if isinstance(rows, list):
+                return tenant_of(rows)
+    if isinstance(payload, list) and payload and isinstance(payload[0], dict) and payload[0].get("business_id"):
+        return str(payload[0]["business_id"])
+    return "anonymous"
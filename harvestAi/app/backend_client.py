@@ -1,23 +1,207 @@
+import os
+import random
+import threading
+import time
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-BASE_URL = "http://18.175.213.46:3000"
+# Override with a local stub (see loadtest/stub_backend.py) to load-test without hitting production.
+BASE_URL = os.getenv("HARVESTAI_BACKEND_URL", "http://18.175.213.46:3000").rstrip("/")
+TIMEOUT_SECONDS = float(os.getenv("HARVESTAI_BACKEND_TIMEOUT", "30"))
+
+# Total time budget for one incoming request, including retries. Callers may ask for less
+# (X-Request-Deadline-Ms header) but never more.
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("HARVESTAI_BACKEND_DEADLINE", "10"))
+
+MAX_RETRIES = 2              # extra attempts, idempotent posts only
+RETRY_BASE_SECONDS = 0.1
+RETRY_CAP_SECONDS = 1.0
+
+BREAKER_FAILURE_THRESHOLD = 5    # consecutive failures before the circuit opens
+BREAKER_RESET_SECONDS = 15.0     # how long it stays open before a single probe is let through
+
+# A timed-out attempt whose timeout was cut to the caller's remaining budget is not held against
+# the backend when that budget was shorter than this: the caller gave it no fair chance. Waiting
+# at least this long and still timing out is a failure, whoever set the deadline.
+FAIR_TIMEOUT_SECONDS = float(os.getenv("HARVESTAI_BACKEND_FAIR_TIMEOUT", "2"))
+
+# Bulkhead: at most this many threads may be blocked on the backend at once, so a slow backend
+# can never take the whole threadpool away from the local /run/inventory-expiry and
+# /run/anomalies-local routes (FastAPI's default pool has 40 threads).
+MAX_INFLIGHT = int(os.getenv("HARVESTAI_BACKEND_MAX_INFLIGHT", "16"))
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
 
 
 class BackendError(Exception):
-    def __init__(self, status_code: int, message: str):
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
         self.status_code = status_code
         self.message = message
+        self.retry_after = retry_after
         super().__init__(f"{status_code}: {message}")
 
 
-def _post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+class CircuitBreaker:
+    """Consecutive-failure breaker: CLOSED -> OPEN after N failures, HALF_OPEN after a cool-down,
+    then CLOSED again on one successful probe (or back to OPEN if the probe fails)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_owner: Optional[int] = None
+
+    def allow(self) -> Optional[float]:
+        """Returns None if the call may proceed, otherwise seconds until the next probe."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return None
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if self._state == self.OPEN and remaining <= 0:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_owner = threading.get_ident()
+                return None
+            return max(remaining, 1.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe this thread holds without recording an outcome (the call
+        said nothing about backend health, or raised something unexpected)."""
+        with self._lock:
+            if self._probe_in_flight and self._probe_owner == threading.get_ident():
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._failures}
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+_INFLIGHT = threading.BoundedSemaphore(MAX_INFLIGHT)
+
+
+def _breaker(path: str) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        if path not in _BREAKERS:
+            _BREAKERS[path] = CircuitBreaker()
+        return _BREAKERS[path]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _BREAKERS_LOCK:
+        return {path: b.snapshot() for path, b in _BREAKERS.items()}
+
+
+def deadline_from_header(value: Optional[str]) -> float:
+    """Absolute time.monotonic() deadline from an incoming X-Request-Deadline-Ms header (remaining ms)."""
+    budget = DEFAULT_DEADLINE_SECONDS
+    if value:
+        try:
+            budget = min(budget, max(float(value), 0.0) / 1000.0)
+        except ValueError:
+            pass
+    return time.monotonic() + budget
+
+
+def _backoff(attempt: int) -> float:
+    # "full jitter": uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt)))
+
+
+def _attempt(url: str, payload: Dict[str, Any], remaining: float) -> requests.Response:
+    headers = {DEADLINE_HEADER: str(int(remaining * 1000))}
+    return requests.post(url, json=payload, headers=headers, timeout=min(TIMEOUT_SECONDS, remaining))
+
+
+class _DeadlineTimeout(Exception):
+    """The attempt timed out only because the caller's deadline was shorter than TIMEOUT_SECONDS."""
+
+
+def _client_deadline_timeout(remaining: float, deadline: float) -> bool:
+    """True when a timed-out attempt says nothing about the backend: its timeout was cut to the
+    remaining budget, that budget was too short to be fair, and it has now run out."""
+    cut = remaining < TIMEOUT_SECONDS
+    return cut and remaining < FAIR_TIMEOUT_SECONDS and time.monotonic() >= deadline
+
+
+def _post(path: str, payload: Dict[str, Any], deadline: Optional[float] = None,
+          idempotent: bool = False) -> Dict[str, Any]:
     url = f"{BASE_URL}{path}"
+    if deadline is None:
+        deadline = time.monotonic() + DEFAULT_DEADLINE_SECONDS
+    breaker = _breaker(path)
+    attempts = 1 + (MAX_RETRIES if idempotent else 0)
+
+    if not _INFLIGHT.acquire(blocking=False):
+        raise BackendError(503, "Too many in-flight backend requests", retry_after=1.0)
     try:
-        r = requests.post(url, json=payload, timeout=30)
-    except requests.RequestException as e:
-        raise BackendError(502, f"Backend request failed: {str(e)}")
+        for attempt in range(attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise BackendError(504, f"Deadline exceeded before backend call to {path}")
+
+            wait = breaker.allow()
+            if wait is not None:
+                raise BackendError(503, f"Backend circuit open for {path}", retry_after=wait)
+
+            try:
+                try:
+                    r = _attempt(url, payload, remaining)
+                    failure: Optional[BackendError] = None
+                    if r.status_code >= 500:
+                        failure = BackendError(r.status_code, r.text or "No response body")
+                except requests.Timeout as e:
+                    if _client_deadline_timeout(remaining, deadline):
+                        raise _DeadlineTimeout() from e
+                    r = None
+                    failure = BackendError(504, f"Backend request timed out: {str(e)}")
+                except requests.RequestException as e:
+                    r = None
+                    failure = BackendError(502, f"Backend request failed: {str(e)}")
+
+                if failure is None:
+                    breaker.record_success()
+                    break
+                breaker.record_failure()
+            except _DeadlineTimeout:
+                # the client's own short deadline ran out: not a backend health signal, so the
+                # shared breaker is left alone, and there is no time left to retry
+                raise BackendError(504, f"Deadline exceeded waiting for backend call to {path}")
+            finally:
+                breaker.release_probe()   # no-op once record_success / record_failure ran
+            pause = _backoff(attempt)
+            if attempt + 1 >= attempts or time.monotonic() + pause >= deadline:
+                raise failure
+            time.sleep(pause)
+    finally:
+        _INFLIGHT.release()
 
+    # 4xx is the caller's problem, not a backend health signal: no retry, no breaker trip.
     if r.status_code >= 400:
         raise BackendError(r.status_code, r.text or "No response body")
 
@@ -27,13 +211,14 @@ def _post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         return {"raw": r.text}
 
 
-def post_cashflow(payload: Dict[str, Any]) -> Dict[str, Any]:
-    return _post("/predictions/cashflow", payload)
+def post_cashflow(payload: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+    # not retried: the backend records the submitted transactions
+    return _post("/predictions/cashflow", payload, deadline=deadline)
 
 
-def post_inventory(payload: Dict[str, Any]) -> Dict[str, Any]:
-    return _post("/predictions/inventory", payload)
+def post_inventory(payload: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+    return _post("/predictions/inventory", payload, deadline=deadline, idempotent=True)
 
 
-def post_anomalies(payload: Dict[str, Any]) -> Dict[str, Any]:
-    return _post("/predictions/anomalies", payload)
\ No newline at end of file
+def post_anomalies(payload: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+    return _post("/predictions/anomalies", payload, deadline=deadline, idempotent=True)
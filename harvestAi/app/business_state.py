@@ -0,0 +1,460 @@
+'''
+Per-business warm state: derived structures kept between requests and updated incrementally.
+
+/run/cashflow and /run/anomalies-local used to rebuild everything from the request body on
+every call. This cache keeps, per (business_id, section), a fold state and the output derived
+from it:
+
+    cashflow:  summarize_cashflow output (totals, category totals) and the risk inputs that
+               evaluate_cashflow_risk expects (7-day income/expense totals, today, balance);
+               folded as kobo totals plus daily totals for the last RISK_WINDOW_DAYS days
+    anomalies: detect_expense_anomalies output (median / MAD and the anomalies); folded as the
+               sorted amounts with their row indices, from which median, MAD and the anomalous
+               tail are selected in O(log n)
+
+An entry is marked with how many rows it has folded and a hash of those rows (only the fields
+the fold reads). A request whose first rows hash to the mark folds in only the rows after it,
+and a request with exactly the marked rows is a hit. Either way the request pays one hashing
+pass over its rows, which is far cheaper than parsing and folding them, and raw rows are never
+stored. Any other request (fewer rows, or different rows before the mark) rebuilds the entry.
+Amending a transaction changes the hash, so it rebuilds too; invalidate(business_id) drops the
+entries of a business everywhere, e.g. after it deletes history.
+
+Memory is bounded by HARVESTAI_STATE_MAX_MB, evicting least-recently-used entries first.
+
+When HARVESTAI_STATE_DB is set, every uvicorn worker also reads and writes a shared sqlite file
+(a local stand-in for a shared cache such as Redis):
+- a worker that misses locally can adopt the checkpoint another worker saved, if the request's
+  first rows hash to its mark, and fold in only the rest
+- a checkpoint is the whole fold state, so it is rewritten only once a quarter of the history
+  is new since the last one (CHECKPOINT_RATIO): O(1) per row on average, not O(history) per
+  request
+- invalidations bump a per-business generation in the file, so the other workers drop their
+  local copies on their next access
+'''
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.logic.expense_anomaly import MAD_SCALE, mad_of_sorted, median_of_sorted
+from app.logic.money import to_kobo, from_kobo
+
+DEFAULT_MAX_BYTES = int(float(os.getenv("HARVESTAI_STATE_MAX_MB", "256")) * 1024 * 1024)
+STATE_DB_PATH = os.getenv("HARVESTAI_STATE_DB")
+
+CASHFLOW = "cashflow"
+ANOMALIES = "anomalies"
+
+RISK_WINDOW_DAYS = 7
+Z_THRESHOLD = 3.5
+FOLD_INSERT_MAX = 256      # larger batches are merged with one sort instead of row-by-row inserts
+CHECKPOINT_RATIO = 4       # shared checkpoint once a quarter of the history is new since the last
+
+
+# -------------------------
+# CASHFLOW
+# -------------------------
+class CashflowSection:
+    """Same output as {"summary": summarize_cashflow(txs), "risk_inputs": <7-day totals>}."""
+
+    @staticmethod
+    def digest(h: "hashlib._Hash", transactions: List[Dict[str, Any]]) -> None:
+        # every field the fold reads, one terminated record per row, so chunks hash like the whole
+        h.update("".join(
+            f"{tx.get('transaction_id')!r}\x1f{tx['date']!r}\x1f{tx['type']!r}\x1f{tx['amount']!r}"
+            f"\x1f{tx.get('category')!r}\x1f{tx.get('current_balance')!r}\x1e"
+            for tx in transactions
+        ).encode())
+
+    @staticmethod
+    def new() -> Dict[str, Any]:
+        # categories in first-seen order, as summarize_cashflow numbers them
+        return {"count": 0, "income": 0, "expense": 0, "categories": {}, "daily": {}, "latest": None}
+
+    @staticmethod
+    def fold(acc: Dict[str, Any], transactions: List[Dict[str, Any]], start: int) -> None:
+        daily = acc["daily"]
+        latest = datetime.fromisoformat(acc["latest"][0]) if acc["latest"] else None
+        for tx in transactions:
+            kobo = to_kobo(tx["amount"])
+            ts = datetime.fromisoformat(str(tx["date"]).replace("Z", "+00:00"))
+            if ts.tzinfo is not None:
+                ts = ts.replace(tzinfo=None)
+            col = 0 if str(tx["type"]).lower() == "income" else 1
+            if col == 0:
+                acc["income"] += kobo
+            else:
+                acc["expense"] += kobo
+                cat = str(tx.get("category") or "unknown")
+                acc["categories"][cat] = acc["categories"].get(cat, 0) + kobo
+            day = daily.setdefault(ts.date().isoformat(), [0, 0])
+            day[col] += kobo
+            if latest is None or ts >= latest:
+                latest = ts
+                acc["latest"] = [ts.isoformat(), tx.get("current_balance")]
+        acc["count"] += len(transactions)
+        # days before the window can never come back into it: "today" only moves forward
+        today = latest.date()
+        oldest = (today - timedelta(days=RISK_WINDOW_DAYS)).isoformat()
+        acc["daily"] = {d: v for d, v in daily.items() if d >= oldest}
+
+    @staticmethod
+    def result(acc: Dict[str, Any], transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        income, expense = acc["income"], acc["expense"]
+        top = sorted(acc["categories"].items(), key=lambda c: -c[1])[:5]
+        today = datetime.fromisoformat(acc["latest"][0]).date()
+        window = [(today - timedelta(days=d)).isoformat() for d in range(RISK_WINDOW_DAYS, 0, -1)]
+        daily = acc["daily"]
+        return {
+            "summary": {
+                "transaction_count": acc["count"],
+                "total_income": from_kobo(income),
+                "total_expense": from_kobo(expense),
+                "net_cashflow": from_kobo(income - expense),
+                "top_expense_categories": [{"category": c, "amount": from_kobo(k)} for c, k in top],
+            },
+            "risk_inputs": {
+                "as_of": today.isoformat(),
+                "last_7_days_income_totals": [from_kobo(daily.get(d, [0, 0])[0]) for d in window],
+                "last_7_days_expense_totals": [from_kobo(daily.get(d, [0, 0])[1]) for d in window],
+                "today_income": from_kobo(daily.get(today.isoformat(), [0, 0])[0]),
+                "today_expense": from_kobo(daily.get(today.isoformat(), [0, 0])[1]),
+                "today_cash_balance": acc["latest"][1],
+            },
+        }
+
+    @staticmethod
+    def dumps(acc: Dict[str, Any]) -> str:
+        return json.dumps(acc, default=str)
+
+    @staticmethod
+    def loads(data: str) -> Dict[str, Any]:
+        return json.loads(data)
+
+    @staticmethod
+    def nbytes(acc: Dict[str, Any]) -> int:
+        return 2 * len(json.dumps(acc, default=str))
+
+
+def build_cashflow_state(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    acc = CashflowSection.new()
+    CashflowSection.fold(acc, transactions, 0)
+    return CashflowSection.result(acc, transactions)
+
+
+# -------------------------
+# ANOMALIES
+# -------------------------
+class AnomaliesSection:
+    """Same output as detect_expense_anomalies(payload) at its default z_threshold."""
+
+    @staticmethod
+    def digest(h: "hashlib._Hash", expenses: List[Dict[str, Any]]) -> None:
+        # the fold reads only the amounts; anomalies are echoed from the request's own rows
+        h.update(array("d", (float(e["amount"]) for e in expenses)).tobytes())
+
+    @staticmethod
+    def new() -> Dict[str, array]:
+        return {"amounts": array("d"), "index": array("q")}
+
+    @staticmethod
+    def fold(acc: Dict[str, array], expenses: List[Dict[str, Any]], start: int) -> None:
+        amounts, index = acc["amounts"], acc["index"]
+        if len(expenses) > FOLD_INSERT_MAX:
+            # one stable sort beats many O(n) inserts; ties stay in row order
+            pairs = list(zip(amounts, index))
+            pairs.extend((float(e["amount"]), start + offset) for offset, e in enumerate(expenses))
+            pairs.sort(key=lambda p: p[0])
+            acc["amounts"] = array("d", (p[0] for p in pairs))
+            acc["index"] = array("q", (p[1] for p in pairs))
+            return
+        for offset, e in enumerate(expenses):
+            amt = float(e["amount"])
+            pos = bisect_right(amounts, amt)      # ties stay in row order
+            amounts.insert(pos, amt)
+            index.insert(pos, start + offset)
+
+    @staticmethod
+    def result(acc: Dict[str, array], expenses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        amounts, index = acc["amounts"], acc["index"]
+        n = len(amounts)
+        if n == 0:
+            return {"status": "error", "message": "No expenses provided."}
+
+        if n < 5:
+            max_amt = amounts[-1]
+            rows = [i for a, i in zip(amounts, index) if a == max_amt and max_amt > 0]
+            anomalies = [{**expenses[i], "anomaly_score": None,
+                          "reason": "Highest expense (insufficient data for stats)"} for i in sorted(rows)]
+            return {
+                "status": "success",
+                "summary": {"count": n, "anomalies": len(anomalies), "method": "fallback-max"},
+                "anomalies": anomalies,
+            }
+
+        med = median_of_sorted(amounts, 0, n)
+        mad = mad_of_sorted(amounts, 0, n, med)
+        denom = (MAD_SCALE * mad) if mad != 0 else 1e-9
+
+        # scores only grow with the amount, so the anomalies are a tail of the sorted amounts
+        scored = {}
+        for pos in range(n - 1, -1, -1):
+            score = (amounts[pos] - med) / denom
+            if score < Z_THRESHOLD:
+                break
+            scored[index[pos]] = score
+        anomalies = [
+            {**expenses[i], "anomaly_score": round(scored[i], 3),
+             "reason": f"Unusually high expense (robust z >= {Z_THRESHOLD})"}
+            for i in sorted(scored)
+        ]
+        return {
+            "status": "success",
+            "summary": {
+                "count": n,
+                "anomalies": len(anomalies),
+                "median_amount": round(med, 2),
+                "mad": round(mad, 2),
+                "method": "robust-mad-zscore",
+                "z_threshold": Z_THRESHOLD,
+            },
+            "anomalies": anomalies,
+        }
+
+    @staticmethod
+    def dumps(acc: Dict[str, array]) -> str:
+        return json.dumps({k: base64.b64encode(v.tobytes()).decode() for k, v in acc.items()})
+
+    @staticmethod
+    def loads(data: str) -> Dict[str, array]:
+        acc = AnomaliesSection.new()
+        for k, v in json.loads(data).items():
+            acc[k].frombytes(base64.b64decode(v))
+        return acc
+
+    @staticmethod
+    def nbytes(acc: Dict[str, array]) -> int:
+        return sum(v.itemsize * len(v) for v in acc.values())
+
+
+SECTIONS = {CASHFLOW: CashflowSection, ANOMALIES: AnomaliesSection}
+
+
+# -------------------------
+# SHARED STORE (cross-worker)
+# -------------------------
+class SqliteStateStore:
+    """Fold-state checkpoints and invalidation generations in one sqlite file shared by all workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS business_fold ("
+            " business_id TEXT NOT NULL, section TEXT NOT NULL, generation INTEGER NOT NULL,"
+            " row_count INTEGER NOT NULL, prefix_digest TEXT NOT NULL, acc TEXT NOT NULL,"
+            " PRIMARY KEY (business_id, section))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS business_generation (business_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+
+    def generation(self, business_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generation FROM business_generation WHERE business_id = ?", (business_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def mark(self, business_id: str, section: str, generation: int) -> Optional[Tuple[int, str]]:
+        """(row_count, prefix digest) of the saved checkpoint, without loading its fold state."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT row_count, prefix_digest FROM business_fold"
+                " WHERE business_id = ? AND section = ? AND generation = ?",
+                (business_id, section, generation),
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def load(self, business_id: str, section: str, generation: int, row_count: int) -> Optional[str]:
+        """The serialised fold state, if the checkpoint still covers exactly row_count rows."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT acc FROM business_fold"
+                " WHERE business_id = ? AND section = ? AND generation = ? AND row_count = ?",
+                (business_id, section, generation, row_count),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, business_id: str, section: str, generation: int, row_count: int, prefix_digest: str,
+            acc: str) -> None:
+        with self._lock:
+            # skipped if the business was invalidated while this worker was folding, or if
+            # another worker already saved a checkpoint that covers more rows
+            self._conn.execute(
+                "INSERT OR REPLACE INTO business_fold"
+                " (business_id, section, generation, row_count, prefix_digest, acc)"
+                " SELECT ?, ?, ?, ?, ?, ? WHERE COALESCE("
+                "  (SELECT generation FROM business_generation WHERE business_id = ?), 0) = ?"
+                " AND COALESCE((SELECT row_count FROM business_fold WHERE business_id = ? AND section = ?"
+                "  AND generation = ?), -1) < ?",
+                (business_id, section, generation, row_count, prefix_digest, acc, business_id, generation,
+                 business_id, section, generation, row_count),
+            )
+
+    def invalidate(self, business_id: str) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO business_generation (business_id, generation) VALUES (?, 1)"
+                    " ON CONFLICT(business_id) DO UPDATE SET generation = generation + 1",
+                    (business_id,),
+                )
+                self._conn.execute("DELETE FROM business_fold WHERE business_id = ?", (business_id,))
+                gen = self._conn.execute(
+                    "SELECT generation FROM business_generation WHERE business_id = ?", (business_id,)
+                ).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return gen
+
+
+# -------------------------
+# IN-PROCESS LRU
+# -------------------------
+class _Entry:
+    __slots__ = ("acc", "derived", "row_count", "digest", "saved", "nbytes", "generation")
+
+    def __init__(self, acc: Any, derived: Dict[str, Any], row_count: int, digest: bytes, saved: int,
+                 nbytes: int, generation: int):
+        self.acc = acc
+        self.derived = derived
+        self.row_count = row_count
+        self.digest = digest          # hash of the first row_count rows
+        self.saved = saved            # row_count of the last checkpoint written to the shared store
+        self.nbytes = nbytes
+        self.generation = generation
+
+
+def _prefix(section, rows: List[Dict[str, Any]], count: int, h: "hashlib._Hash", hashed: int) -> int:
+    """Extend h, which covers rows[:hashed], to cover rows[:count]; returns count."""
+    if count > hashed:
+        section.digest(h, rows[hashed:count])
+    return count
+
+
+class BusinessStateCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, shared: Optional[SqliteStateStore] = None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.nbytes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.stats = {"hits": 0, "folds": 0, "shared_hits": 0, "misses": 0, "stale": 0, "evictions": 0,
+                      "invalidations": 0, "checkpoints": 0}
+
+    def _drop(self, key: Tuple[str, str]) -> Optional[_Entry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+        return entry
+
+    def _insert(self, key: Tuple[str, str], entry: _Entry) -> None:
+        with self._lock:
+            self._drop(key)
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes:
+                old_key, _ = next(iter(self._entries.items()))
+                self._drop(old_key)
+                self.stats["evictions"] += 1
+
+    def get_or_build(self, business_id: str, section_name: str,
+                     rows: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], str]:
+        """Derived state for these rows (the business's full history, oldest first), and how it
+        was obtained: "hit", "fold" (only rows after the mark were folded in), "shared" (a
+        checkpoint from another worker, plus the rows after it) or "miss" (built from scratch)."""
+        section = SECTIONS[section_name]
+        key = (business_id, section_name)
+        generation = self.shared.generation(business_id) if self.shared else 0
+
+        with self._lock:
+            entry = self._drop(key)       # taken out while in use, so two requests never fold into one state
+        h, hashed = hashlib.blake2b(digest_size=16), 0
+
+        acc, start, saved, how = None, 0, 0, "miss"
+        if entry is not None:
+            if entry.generation == generation and entry.row_count <= len(rows):
+                hashed = _prefix(section, rows, entry.row_count, h, hashed)
+                if h.digest() == entry.digest:
+                    acc, start, saved = entry.acc, entry.row_count, entry.saved
+                    how = "hit" if start == len(rows) else "fold"
+            if acc is None:
+                self.stats["stale"] += 1
+
+        if acc is None and self.shared:
+            mark = self.shared.mark(business_id, section_name, generation)
+            if mark is not None and mark[0] <= len(rows):
+                h, hashed = hashlib.blake2b(digest_size=16), 0
+                hashed = _prefix(section, rows, mark[0], h, hashed)
+                data = self.shared.load(business_id, section_name, generation, mark[0]) \
+                    if h.hexdigest() == mark[1] else None
+                if data is not None:
+                    acc, start, saved, how = section.loads(data), mark[0], mark[0], "shared"
+        if acc is None:
+            h, hashed = hashlib.blake2b(digest_size=16), 0
+            acc = section.new()
+
+        if how == "hit":
+            derived = entry.derived
+        else:
+            if start < len(rows):
+                section.fold(acc, rows[start:], start)
+            derived = section.result(acc, rows)
+        _prefix(section, rows, len(rows), h, hashed)
+        self.stats[{"hit": "hits", "fold": "folds", "shared": "shared_hits", "miss": "misses"}[how]] += 1
+
+        # checkpoint when the rows since the last one are at least 1/CHECKPOINT_RATIO of the
+        # history, so writing the whole state stays O(1) per row on average
+        if self.shared and (len(rows) - saved) * CHECKPOINT_RATIO >= len(rows) > saved:
+            self.shared.put(business_id, section_name, generation, len(rows), h.hexdigest(), section.dumps(acc))
+            saved = len(rows)
+            self.stats["checkpoints"] += 1
+        nbytes = entry.nbytes if how == "hit" else section.nbytes(acc) + 2 * len(json.dumps(derived, default=str))
+        self._insert(key, _Entry(acc, derived, len(rows), h.digest(), saved, nbytes, generation))
+        return derived, how
+
+    def invalidate(self, business_id: str) -> None:
+        """Call when transactions of the business are amended, deleted or reordered."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == business_id]:
+                self._drop(key)
+            self.stats["invalidations"] += 1
+        if self.shared:
+            self.shared.invalidate(business_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "approx_bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "shared_db": self.shared.path if self.shared else None,
+                **self.stats,
+            }
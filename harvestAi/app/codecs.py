@@ -0,0 +1,240 @@
+'''
+Content negotiation for request/response bodies.
+
+Requests may be sent as
+    Content-Type: application/json                      (default)
+    Content-Type: application/msgpack                   (pip install msgpack)
+    Content-Type: application/vnd.apache.arrow.stream   (pip install pyarrow)
+optionally compressed with
+    Content-Encoding: gzip | deflate | zstd             (zstd: pip install zstandard)
+
+An Arrow IPC body carries the rows of the route's list (transactions / inventory / expenses /
+upserts) as one record batch stream, one column per field. Any other request fields (e.g.
+current_date, business_id, base_version) go in the schema metadata under b"envelope" as a JSON
+object.
+
+Responses are msgpack-encoded when the client sends Accept: application/msgpack, otherwise JSON.
+Decoded bodies are handed to FastAPI as Python objects directly, so they never go through a
+JSON encode/parse round trip.
+'''
+import contextvars
+import json
+import os
+import zlib
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+_pa_ipc = None    # pyarrow.ipc, imported by the first Arrow body (it alone takes ~0.1s to import)
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+MAX_DECODED_BYTES = int(os.getenv("HARVESTAI_MAX_DECODED_BYTES", str(256 * 1024 * 1024)))
+
+# Where the rows of an Arrow body go in each route's request model.
+ARROW_ROWS: Dict[str, Tuple[str, ...]] = {
+    "/run/cashflow": ("transactions",),
+    "/run/cashflow-runway": ("transactions",),
+    "/run/inventory-expiry": ("payload", "inventory"),
+    "/run/inventory": ("payload", "inventory"),
+    "/run/anomalies": ("payload", "expenses"),
+    "/run/anomalies-local": ("payload", "expenses"),
+    "/run/anomalies-grouped": ("payload", "expenses"),
+    "/run/anomalies-baseline": ("payload", "expenses"),
+    "/sync/inventory": ("upserts",),
+}
+
+_ACCEPT: contextvars.ContextVar[str] = contextvars.ContextVar("harvestai_accept", default="")
+
+
+class CodecError(Exception):
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.message = message
+        super().__init__(f"{status_code}: {message}")
+
+
+# -------------------------
+# DECOMPRESSION
+# -------------------------
+def _inflate(body: bytes, wbits: int) -> bytes:
+    try:
+        out = zlib.decompressobj(wbits).decompress(body, MAX_DECODED_BYTES + 1)
+    except zlib.error as e:
+        raise CodecError(400, f"Could not decompress body: {e}")
+    if len(out) > MAX_DECODED_BYTES:
+        raise CodecError(413, "Decompressed body too large")
+    return out
+
+
+def _unzstd(body: bytes) -> bytes:
+    if zstandard is None:
+        raise CodecError(415, "zstd request bodies need the 'zstandard' package on the server")
+    try:
+        with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+            out = reader.read(MAX_DECODED_BYTES + 1)
+    except zstandard.ZstdError as e:
+        raise CodecError(400, f"Could not decompress zstd body: {e}")
+    if len(out) > MAX_DECODED_BYTES:
+        raise CodecError(413, "Decompressed body too large")
+    return out
+
+
+def decompress(body: bytes, content_encoding: str) -> bytes:
+    enc = content_encoding.strip().lower()
+    if enc in ("", "identity"):
+        return body
+    if enc in ("gzip", "x-gzip"):
+        return _inflate(body, 16 + zlib.MAX_WBITS)
+    if enc == "deflate":
+        return _inflate(body, zlib.MAX_WBITS)
+    if enc == "zstd":
+        return _unzstd(body)
+    raise CodecError(415, f"Unsupported Content-Encoding: '{content_encoding}'")
+
+
+# -------------------------
+# DECODING
+# -------------------------
+def _media_type(content_type: str) -> str:
+    return content_type.split(";", 1)[0].strip().lower()
+
+
+def _arrow_ipc():
+    global _pa_ipc
+    if _pa_ipc is None:
+        try:
+            import pyarrow.ipc as pa_ipc
+        except ImportError:  # optional
+            pa_ipc = False
+        _pa_ipc = pa_ipc
+    return _pa_ipc or None
+
+
+def _decode_arrow(data: bytes, path: str) -> Any:
+    pa_ipc = _arrow_ipc()
+    if pa_ipc is None:
+        raise CodecError(415, f"{ARROW_STREAM} bodies need the 'pyarrow' package on the server")
+    if path not in ARROW_ROWS:
+        raise CodecError(415, f"{ARROW_STREAM} is not supported on {path}")
+    try:
+        table = pa_ipc.open_stream(data).read_all()
+    except Exception as e:
+        raise CodecError(400, f"Invalid Arrow IPC stream: {e}")
+
+    meta = table.schema.metadata or {}
+    try:
+        envelope = json.loads(meta[b"envelope"]) if b"envelope" in meta else {}
+    except ValueError:
+        envelope = None
+    if not isinstance(envelope, dict):
+        raise CodecError(400, "Arrow 'envelope' metadata must be a JSON object")
+
+    *parents, leaf = ARROW_ROWS[path]
+    body: Dict[str, Any] = {}
+    node = body
+    for key in parents:
+        node = node.setdefault(key, {})
+    node.update(envelope)
+    node[leaf] = table.to_pylist()
+    return body
+
+
+def decode_body(body: bytes, content_type: str, content_encoding: str, path: str) -> Any:
+    data = decompress(body, content_encoding)
+    media = _media_type(content_type) or JSON
+
+    if media == JSON or media.endswith("+json"):
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise CodecError(400, f"Invalid JSON body: {e}")
+    if media in MSGPACK_TYPES:
+        if msgpack is None:
+            raise CodecError(415, "msgpack bodies need the 'msgpack' package on the server")
+        try:
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        except Exception as e:
+            raise CodecError(400, f"Invalid msgpack body: {e}")
+    if media == ARROW_STREAM:
+        return _decode_arrow(data, path)
+    raise CodecError(415, f"Unsupported Content-Type: '{content_type}'")
+
+
+def _needs_decoding(content_type: str, content_encoding: str) -> bool:
+    # plain JSON goes through FastAPI's own parser untouched
+    if content_encoding.strip().lower() not in ("", "identity"):
+        return True
+    media = _media_type(content_type)
+    return bool(media) and media != JSON and not media.endswith("+json")
+
+
+# -------------------------
+# FASTAPI INTEGRATION
+# -------------------------
+class DecodedRequest(Request):
+    """A request whose body has already been decoded; FastAPI reads it back via json()."""
+
+    def __init__(self, scope, receive, raw: bytes, decoded: Any):
+        super().__init__(scope, receive)
+        self._raw = raw
+        self._decoded = decoded
+
+    async def body(self) -> bytes:
+        return self._raw
+
+    async def json(self) -> Any:
+        return self._decoded
+
+
+class NegotiatedRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        original = super().get_route_handler()
+        path = self.path
+
+        async def handler(request: Request):
+            token = _ACCEPT.set(request.headers.get("accept", ""))
+            try:
+                content_type = request.headers.get("content-type", "")
+                content_encoding = request.headers.get("content-encoding", "")
+                if _needs_decoding(content_type, content_encoding):
+                    raw = await request.body()
+                    try:
+                        decoded = decode_body(raw, content_type, content_encoding, path)
+                    except CodecError as e:
+                        return JSONResponse(status_code=e.status_code, content={"detail": e.message})
+                    scope = dict(request.scope)
+                    scope["headers"] = [
+                        (k, v) for k, v in request.scope["headers"] if k not in (b"content-type", b"content-encoding")
+                    ] + [(b"content-type", JSON.encode())]
+                    request = DecodedRequest(scope, request.receive, raw or b" ", decoded)
+                return await original(request)
+            finally:
+                _ACCEPT.reset(token)
+
+        return handler
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON by default; msgpack when the current request asked for it in Accept."""
+
+    def render(self, content: Any) -> bytes:
+        accept = _ACCEPT.get()
+        if msgpack is not None and any(t in accept for t in MSGPACK_TYPES):
+            self.media_type = MSGPACK_TYPES[0]
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
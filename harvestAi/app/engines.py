@@ -0,0 +1,129 @@
+'''
+Lazy loading of the heavy engines and stores behind the routes.
+
+Importing app.main used to import every logic module up front. That meant numpy, requests and
+(in codecs) pyarrow loaded before the first request, and every worker and CLI run paid for it.
+Each engine is now a proxy that imports its module, or builds its object, on first attribute
+access:
+
+    inventory = engine("inventory", "app.logic.inventory_parallel")
+    inventory.check_inventory_expiry_parallel(payload)      # imports on the first call
+
+The first request to a route pays the cost of loading its engine. To avoid that, set
+HARVESTAI_WARMUP to "all" or a comma-separated list of engine names. create_app() then loads
+those engines in a background thread after startup. GET /ready returns 503 until the warm-up
+finishes, so a load balancer only routes traffic to a warm worker. GET /health does not wait.
+
+Engines are modules, so they are shared by the whole process. Stores are per app: create_app()
+builds them with lazy(..., registry) into its own registry (a copy of the engines', see
+registry()), and warm() / status() take that registry.
+'''
+import importlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+WARMUP = os.getenv("HARVESTAI_WARMUP", "")
+
+
+class _Lazy:
+    """Loads its target once, thread-safely, and forwards attribute access to it. It has no
+    public attributes of its own, so it cannot shadow the target's; use loaded() / resolve()."""
+
+    def __init__(self, name: str, load: Callable[[], Any]):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_load", load)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_seconds", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _resolve(self) -> Any:
+        if self._seconds is None:
+            with self._lock:
+                if self._seconds is None:
+                    t0 = time.perf_counter()
+                    object.__setattr__(self, "_target", self._load())
+                    object.__setattr__(self, "_seconds", time.perf_counter() - t0)
+        return self._target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+
+    def __bool__(self) -> bool:
+        return True          # never load just to be tested for truth
+
+    def __len__(self) -> int:
+        return len(self._resolve())
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._name}: {'loaded' if loaded(self) else 'not loaded'}>"
+
+
+def loaded(proxy: _Lazy) -> bool:
+    return proxy._seconds is not None
+
+
+def resolve(proxy: _Lazy) -> Any:
+    """The loaded module / object itself (loading it if needed)."""
+    return proxy._resolve()
+
+
+_REGISTRY: Dict[str, _Lazy] = {}
+
+
+def engine(name: str, module: str) -> _Lazy:
+    """A module imported on first use."""
+    return _register(_Lazy(name, lambda: importlib.import_module(module)), _REGISTRY)
+
+
+def lazy(name: str, build: Callable[[], Any], registry: Optional[Dict[str, _Lazy]] = None) -> _Lazy:
+    """An object (store, cache, ...) built on first use."""
+    return _register(_Lazy(name, build), _REGISTRY if registry is None else registry)
+
+
+def registry() -> Dict[str, _Lazy]:
+    """A new registry holding the process-wide engines; add one app's stores to it."""
+    return dict(_REGISTRY)
+
+
+def _register(proxy: _Lazy, registry: Dict[str, _Lazy]) -> _Lazy:
+    registry[proxy._name] = proxy
+    return proxy
+
+
+def _check(names: List[str], registry: Dict[str, _Lazy]) -> None:
+    unknown = [n for n in names if n not in registry]
+    if unknown:
+        raise ValueError(f"Unknown engine(s) {unknown}; choose from {sorted(registry)}")
+
+
+def warm(names: Optional[Iterable[str]] = None, registry: Optional[Dict[str, _Lazy]] = None) -> Dict[str, float]:
+    """Load the named engines (all when names is None); returns seconds per engine loaded now."""
+    registry = _REGISTRY if registry is None else registry
+    names = list(registry) if names is None else list(names)
+    _check(names, registry)
+    took = {}
+    for name in names:
+        proxy = registry[name]
+        if not loaded(proxy):
+            proxy._resolve()
+            took[name] = round(proxy._seconds, 4)
+    return took
+
+
+def warmup_names(spec: str = WARMUP, registry: Optional[Dict[str, _Lazy]] = None) -> Optional[List[str]]:
+    """HARVESTAI_WARMUP -> engine names: [] for none, None for all. Unknown names raise."""
+    spec = spec.strip()
+    if spec.lower() == "all":
+        return None
+    names = [n.strip() for n in spec.split(",") if n.strip()]
+    _check(names, _REGISTRY if registry is None else registry)
+    return names
+
+
+def status(registry: Optional[Dict[str, _Lazy]] = None) -> Dict[str, Any]:
+    return {
+        name: {"loaded": loaded(p), "load_seconds": round(p._seconds, 4) if loaded(p) else None}
+        for name, p in (_REGISTRY if registry is None else registry).items()
+    }
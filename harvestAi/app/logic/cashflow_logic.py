@@ -1,6 +1,10 @@
 from typing import Dict, Any, List, Tuple
 from datetime import datetime
 
+import numpy as np
+
+from app.logic.money import to_kobo_array, from_kobo, total_kobo, group_total_kobo
+
 REQUIRED_TX_FIELDS = ["current_balance", "transaction_id", "date", "type", "amount", "category", "description"]
 ALLOWED_TYPES = {"income", "expense"}
 
@@ -33,27 +37,34 @@ def validate_transaction(tx: Dict[str, Any], index: int) -> Tuple[bool, str]:
 
 
 def summarize_cashflow(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    income = 0.0
-    expense = 0.0
-    expense_by_category: Dict[str, float] = {}
+    # exact kobo sums (app/logic/money.py), so totals match NUMERIC(15,2) to the kobo
+    amounts = to_kobo_array([tx["amount"] for tx in transactions])
+    is_income = np.array([str(tx["type"]).lower() == "income" for tx in transactions], dtype=bool)
 
-    for tx in transactions:
-        amt = float(tx["amount"])
-        ttype = str(tx["type"]).lower()
-        cat = str(tx.get("category") or "unknown")
+    categories: Dict[str, int] = {}
+    codes = [
+        categories.setdefault(str(tx.get("category") or "unknown"), len(categories))
+        for tx, inc in zip(transactions, is_income.tolist()) if not inc
+    ]
+    return summarize_cashflow_kobo(amounts, is_income, np.array(codes, dtype=np.intp), list(categories))
 
-        if ttype == "income":
-            income += amt
-        else:
-            expense += amt
-            expense_by_category[cat] = expense_by_category.get(cat, 0.0) + amt
 
-    top_cats = sorted(expense_by_category.items(), key=lambda x: x[1], reverse=True)[:5]
+def summarize_cashflow_kobo(amounts: np.ndarray, is_income: np.ndarray, expense_category_codes: np.ndarray,
+                            category_names: List[str]) -> Dict[str, Any]:
+    """Columnar core of summarize_cashflow: kobo amounts, an income mask, and a category code
+    (index into category_names) for each expense row in order."""
+    expense_amounts = amounts[~is_income]
+    by_category = group_total_kobo(expense_category_codes, expense_amounts, len(category_names))
+    income = total_kobo(amounts[is_income])
+    expense = total_kobo(expense_amounts)
+    top_cats = np.argsort(-by_category, kind="stable")[:5]
 
     return {
-        "transaction_count": len(transactions),
-        "total_income": round(income, 2),
-        "total_expense": round(expense, 2),
-        "net_cashflow": round(income - expense, 2),
-        "top_expense_categories": [{"category": c, "amount": round(a, 2)} for c, a in top_cats],
-    }
\ No newline at end of file
+        "transaction_count": int(len(amounts)),
+        "total_income": from_kobo(income),
+        "total_expense": from_kobo(expense),
+        "net_cashflow": from_kobo(income - expense),
+        "top_expense_categories": [
+            {"category": category_names[i], "amount": from_kobo(by_category[i])} for i in top_cats
+        ],
+    }
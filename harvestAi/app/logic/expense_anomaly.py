@@ -1,10 +1,11 @@
-from typing import Dict, Any, List, Tuple, Optional
+from bisect import bisect_left
+from typing import Dict, Any, Callable, List, Sequence, Tuple, Optional
 from statistics import median
 
-_MAD_SCALE = 1.4826
+MAD_SCALE = 1.4826
 
 
-def _get_expenses(payload: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+def get_expenses(payload: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
     if isinstance(payload.get("data"), dict) and isinstance(payload["data"].get("expenses"), list):
         return payload["data"]["expenses"]
     if isinstance(payload.get("expenses"), list):
@@ -13,7 +14,7 @@ def _get_expenses(payload: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
 
 
 def validate_expense_payload(payload: Dict[str, Any]) -> Tuple[bool, str]:
-    expenses = _get_expenses(payload)
+    expenses = get_expenses(payload)
     if not isinstance(expenses, list) or len(expenses) == 0:
         return False, "Expected 'expenses' as a non-empty list (either at top-level or inside data)."
 
@@ -33,7 +34,7 @@ def validate_expense_payload(payload: Dict[str, Any]) -> Tuple[bool, str]:
 
 
 def detect_expense_anomalies(payload: Dict[str, Any], z_threshold: float = 3.5) -> Dict[str, Any]:
-    expenses = _get_expenses(payload) or []
+    expenses = get_expenses(payload) or []
     amounts = [float(e["amount"]) for e in expenses]
 
     if len(amounts) < 5:
@@ -55,7 +56,7 @@ def detect_expense_anomalies(payload: Dict[str, Any], z_threshold: float = 3.5)
     abs_dev = [abs(x - med) for x in amounts]
     mad = median(abs_dev)
 
-    denom = (_MAD_SCALE * mad) if mad != 0 else 1e-9
+    denom = (MAD_SCALE * mad) if mad != 0 else 1e-9
 
     anomalies = []
     for e in expenses:
@@ -77,4 +78,159 @@ def detect_expense_anomalies(payload: Dict[str, Any], z_threshold: float = 3.5)
             "z_threshold": z_threshold,
         },
         "anomalies": anomalies,
-    }
\ No newline at end of file
+    }
+
+# -------------------------
+# GROUPED BASELINES
+# -------------------------
+MEDIUM_Z_THRESHOLD = 2.0
+MIN_GROUP_SIZE = 5
+DEFAULT_GROUP_BY = ("business_id", "category")
+
+# expense_anomalies.z_score is NUMERIC(6,3) and deviation_percentage NUMERIC(6,2)
+_Z_LIMIT = 999.999
+_PCT_LIMIT = 9999.99
+
+
+def _clamp(x: float, limit: float) -> float:
+    return max(-limit, min(limit, x))
+
+
+def anomaly_level(z: Optional[float], z_threshold: float, medium_threshold: float) -> str:
+    if z is not None and z >= z_threshold:
+        return "High"
+    if z is not None and z >= medium_threshold:
+        return "Medium"
+    return "Normal"
+
+
+def robust_z(amount: float, med: float, mad: float) -> float:
+    denom = (MAD_SCALE * mad) if mad != 0 else 1e-9
+    return _clamp((amount - med) / denom, _Z_LIMIT)
+
+
+def deviation_percentage(amount: float, med: Optional[float]) -> Optional[float]:
+    return round(_clamp((amount - med) / med * 100.0, _PCT_LIMIT), 2) if med else None
+
+
+def median_of_sorted(values: Sequence[float], lo: int, hi: int) -> float:
+    n = hi - lo
+    mid = lo + n // 2
+    return values[mid] if n % 2 else (values[mid - 1] + values[mid]) / 2.0
+
+
+def _kth_of_two_runs(k: int, left: Callable[[int], float], n_left: int,
+                     right: Callable[[int], float], n_right: int) -> float:
+    """k-th smallest (0-based) of two ascending runs given by index accessors, by binary search
+    over how many of the k + 1 smallest come from the left run."""
+    lo, hi = max(0, k + 1 - n_right), min(k + 1, n_left)
+    while lo < hi:
+        i = (lo + hi) // 2
+        if left(i) < right(k - i):
+            lo = i + 1
+        else:
+            hi = i
+    taken = []
+    if lo > 0:
+        taken.append(left(lo - 1))
+    if k + 1 - lo > 0:
+        taken.append(right(k - lo))
+    return max(taken)
+
+
+def mad_of_sorted(values: Sequence[float], lo: int, hi: int, med: float) -> float:
+    """Median absolute deviation of the sorted segment values[lo:hi] around med, in O(log n)."""
+    # The absolute deviations are two already-sorted runs: walking outwards from the median to
+    # the left (med - x) and to the right (x - med). Select the middle element(s) of the two
+    # runs instead of sorting the deviations.
+    n = hi - lo
+    p = bisect_left(values, med, lo, hi)
+
+    def left(i: int) -> float:
+        return med - values[p - 1 - i]
+
+    def right(j: int) -> float:
+        return values[p + j] - med
+
+    mid = _kth_of_two_runs(n // 2, left, p - lo, right, hi - p)
+    return mid if n % 2 else (_kth_of_two_runs(n // 2 - 1, left, p - lo, right, hi - p) + mid) / 2.0
+
+
+def detect_expense_anomalies_grouped(payload: Dict[str, Any], z_threshold: float = 3.5,
+                                     medium_threshold: float = MEDIUM_Z_THRESHOLD,
+                                     group_by: Tuple[str, ...] = DEFAULT_GROUP_BY) -> Dict[str, Any]:
+    """Robust z-scores against a per-group median/MAD instead of one global baseline.
+
+    All expenses are sorted once by (group key, amount); each group is then a contiguous sorted
+    segment, so its median is an index lookup and its MAD a partial merge. Rows come back in
+    input order, shaped for the expense_anomalies table (anomaly_level High/Medium/Normal,
+    z_score, deviation_percentage). Groups smaller than MIN_GROUP_SIZE get no z_score and are
+    reported as Normal.
+    """
+    expenses = get_expenses(payload) or []
+    if not expenses:
+        return {"status": "error", "message": "No expenses provided."}
+
+    keys = [tuple(str(e.get(g) or "unknown") for g in group_by) for e in expenses]
+    amounts = [float(e["amount"]) for e in expenses]
+    order = sorted(range(len(expenses)), key=lambda i: (keys[i], amounts[i]))
+    sorted_amounts = [amounts[i] for i in order]
+
+    rows: List[Optional[Dict[str, Any]]] = [None] * len(expenses)
+    groups = []
+    levels = {"High": 0, "Medium": 0, "Normal": 0}
+
+    start = 0
+    n = len(order)
+    while start < n:
+        key = keys[order[start]]
+        end = start + 1
+        while end < n and keys[order[end]] == key:
+            end += 1
+
+        med = median_of_sorted(sorted_amounts, start, end)
+        mad = mad_of_sorted(sorted_amounts, start, end, med)
+        scored = end - start >= MIN_GROUP_SIZE
+        groups.append({
+            **dict(zip(group_by, key)),
+            "count": end - start,
+            "median_amount": round(med, 2),
+            "mad": round(mad, 2),
+            "scored": scored,
+        })
+
+        for pos in range(start, end):
+            i = order[pos]
+            amt = amounts[i]
+            z = robust_z(amt, med, mad) if scored else None
+            level = anomaly_level(z, z_threshold, medium_threshold)
+            levels[level] += 1
+            e = expenses[i]
+            rows[i] = {
+                "transaction_id": e.get("transaction_id"),
+                "business_id": e.get("business_id"),
+                "category": e.get("category"),
+                "amount": amt,
+                "anomaly_level": level,
+                "z_score": round(z, 3) if z is not None else None,
+                "deviation_percentage": deviation_percentage(amt, med),
+            }
+        start = end
+
+    return {
+        "status": "success",
+        "summary": {
+            "count": len(expenses),
+            "groups": len(groups),
+            "anomalies": levels["High"] + levels["Medium"],
+            "high": levels["High"],
+            "medium": levels["Medium"],
+            "method": "grouped-robust-mad-zscore",
+            "group_by": list(group_by),
+            "z_threshold": z_threshold,
+            "medium_threshold": medium_threshold,
+        },
+        "groups": groups,
+        "rows": rows,
+        "anomalies": [r for r in rows if r["anomaly_level"] != "Normal"],
+    }
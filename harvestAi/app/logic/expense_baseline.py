@@ -0,0 +1,196 @@
+import fcntl
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from app.logic.quantile_sketch import KLLSketch, DEFAULT_K
+from app.logic.expense_anomaly import (
+    MEDIUM_Z_THRESHOLD, MIN_GROUP_SIZE, anomaly_level, robust_z, deviation_percentage,
+)
+
+Key = Tuple[str, str]
+
+MAX_MERGED_EXPORTS = 10000     # export ids remembered for idempotent merge()
+
+
+def _key(expense: Dict[str, Any]) -> Key:
+    return str(expense.get("business_id") or "unknown"), str(expense.get("category") or "unknown")
+
+
+class ExpenseBaselineStore:
+    """Persistent per-(business_id, category) expense baselines backed by KLL sketches.
+
+    Memory per key is O(k) regardless of history length, so new expenses are scored without
+    resending old ones. The (median, MAD) pair is cached per key and only recomputed after
+    that key receives new data. Accuracy: see KLLSketch.
+
+    Workers sharing one file call sync(path) periodically. It adds only what this process has
+    seen since its last sync (kept in separate delta sketches) to the file, under a file lock,
+    and then adopts the merged result, so no worker overwrites another's data and nothing is
+    counted twice. Stores that do not share a file are combined with merge() on an export
+    (to_dict(), which carries a fresh export_id); an export id that was already merged is
+    ignored.
+    """
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self._lock = threading.Lock()
+        self._sketches: Dict[Key, KLLSketch] = {}
+        self._delta: Dict[Key, KLLSketch] = {}        # not yet written by sync()
+        self._cache: Dict[Key, Tuple[float, float]] = {}
+        self._merged_exports: "OrderedDict[str, None]" = OrderedDict()
+
+    def update(self, expenses: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for e in expenses:
+                key = _key(e)
+                amount = float(e["amount"])
+                for sketches in (self._sketches, self._delta):
+                    sk = sketches.get(key)
+                    if sk is None:
+                        sk = sketches[key] = KLLSketch(k=self.k)
+                    sk.update(amount)
+                self._cache.pop(key, None)
+
+    def baseline(self, business_id: str, category: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._baseline((str(business_id), str(category)))
+
+    def _baseline(self, key: Key) -> Optional[Dict[str, Any]]:
+        sk = self._sketches.get(key)
+        if sk is None or sk.n == 0:
+            return None
+        if key not in self._cache:
+            self._cache[key] = sk.median_and_mad()
+        med, mad = self._cache[key]
+        return {"business_id": key[0], "category": key[1], "count": sk.n, "median_amount": med, "mad": mad}
+
+    def score(self, expenses: List[Dict[str, Any]], z_threshold: float = 3.5,
+              medium_threshold: float = MEDIUM_Z_THRESHOLD) -> List[Dict[str, Any]]:
+        """Rows shaped like detect_expense_anomalies_grouped's, scored against the stored baseline."""
+        rows = []
+        with self._lock:
+            for e in expenses:
+                key = _key(e)
+                amt = float(e["amount"])
+                base = self._baseline(key)
+                z = None
+                med = None
+                if base is not None:
+                    med = base["median_amount"]
+                    if base["count"] >= MIN_GROUP_SIZE:
+                        z = robust_z(amt, med, base["mad"])
+                level = anomaly_level(z, z_threshold, medium_threshold)
+
+                rows.append({
+                    "transaction_id": e.get("transaction_id"),
+                    "business_id": key[0],
+                    "category": key[1],
+                    "amount": amt,
+                    "anomaly_level": level,
+                    "z_score": round(z, 3) if z is not None else None,
+                    "deviation_percentage": deviation_percentage(amt, med),
+                    "baseline_count": base["count"] if base else 0,
+                })
+        return rows
+
+    # -------------------------
+    # MERGE / PERSISTENCE
+    # -------------------------
+    @staticmethod
+    def _merge_into(target: Dict[Key, KLLSketch], source: Dict[Key, KLLSketch]) -> None:
+        for key, sk in source.items():
+            if key in target:
+                target[key].merge(sk)
+            else:
+                target[key] = KLLSketch.from_dict(sk.to_dict())
+
+    def _remember(self, export_ids: Iterable[str]) -> None:
+        for export_id in export_ids:
+            self._merged_exports[export_id] = None
+            self._merged_exports.move_to_end(export_id)
+        while len(self._merged_exports) > MAX_MERGED_EXPORTS:
+            self._merged_exports.popitem(last=False)
+
+    def merge(self, other: "ExpenseBaselineStore", export_id: Optional[str] = None) -> bool:
+        """Add other's sketches. Returns False (and changes nothing) if export_id was merged before."""
+        with self._lock:
+            if export_id is not None:
+                if export_id in self._merged_exports:
+                    return False
+                self._remember([export_id])
+            self._merge_into(self._sketches, other._sketches)
+            self._merge_into(self._delta, other._sketches)
+            for key in other._sketches:
+                self._cache.pop(key, None)
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "k": self.k,
+                "export_id": uuid.uuid4().hex,
+                "baselines": [
+                    {"business_id": b, "category": c, "sketch": sk.to_dict()}
+                    for (b, c), sk in self._sketches.items()
+                ],
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExpenseBaselineStore":
+        """Raises ValueError if data is not a to_dict() export."""
+        try:
+            store = cls(k=int(data.get("k", DEFAULT_K)))
+            for entry in data.get("baselines", []):
+                key = (str(entry["business_id"]), str(entry["category"]))
+                store._sketches[key] = KLLSketch.from_dict(entry["sketch"])
+            store._remember(str(e) for e in data.get("merged_exports", []))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"Malformed baseline export: {e!r}") from e
+        return store
+
+    def save(self, path: str) -> None:
+        data = self.to_dict()
+        with self._lock:
+            data["merged_exports"] = list(self._merged_exports)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ExpenseBaselineStore":
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def sync(self, path: str) -> None:
+        """Add this process's unsaved data to the file at path, then adopt the file's contents
+        (which include every other worker's syncs) plus whatever arrived meanwhile."""
+        with self._lock:
+            delta, self._delta = self._delta, {}
+            merged_exports = list(self._merged_exports)
+        try:
+            with open(f"{path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                shared = ExpenseBaselineStore.load(path)
+                self._merge_into(shared._sketches, delta)
+                shared._remember(merged_exports)
+                shared.save(path)
+        except BaseException:
+            with self._lock:
+                self._merge_into(delta, self._delta)
+                self._delta = delta
+            raise
+        with self._lock:
+            self._merge_into(shared._sketches, self._delta)
+            self._sketches = shared._sketches
+            self._merged_exports = shared._merged_exports
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._sketches)
@@ -1,11 +1,39 @@
 from datetime import datetime
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.logic.money import KOBO_PER_NAIRA, from_kobo, total_kobo, line_value_kobo, line_values_kobo
 
 CRITICAL_THRESHOLD = 7   # days — expires this week
 WARNING_THRESHOLD  = 14  # days — expires next week
 
 REQUIRED_FIELDS = ['item_id', 'item_name', 'quantity', 'unit', 'expiry_date']
 
+CRITICAL = 'critical'
+WARNING = 'warning'
+EXPIRED = 'expired'
+OK = 'ok'
+SKIPPED = 'skipped'
+BUCKETS = (CRITICAL, WARNING, EXPIRED, OK)
+BUCKET_CODES = {b: code for code, b in enumerate(BUCKETS)}
+SKIPPED_CODE = -1
+
+RECOMMENDATIONS = {
+    EXPIRED: "Item has EXPIRED. Remove from stock immediately and do not sell.",
+    CRITICAL: (
+        "Offer 20-30% discount to clear stock immediately. "
+        "Contact regular customers directly. "
+        "Consider donation if unsellable."
+    ),
+    WARNING: (
+        "Feature prominently in store. "
+        "Include in meal combos or special offers. "
+        "Consider freezing or further processing."
+    ),
+    OK: "Monitor regularly — stock is within safe range.",
+}
+
 
 def validate_item(item: Dict[str, Any], index: int) -> Tuple[bool, str]:
     for field in REQUIRED_FIELDS:
@@ -30,7 +58,8 @@ def validate_item(item: Dict[str, Any], index: int) -> Tuple[bool, str]:
     return True, ""
 
 
-def check_inventory_expiry(inventory_data: Any) -> Dict[str, Any]:
+def parse_inventory_request(inventory_data: Any) -> Tuple[Optional[List[Dict[str, Any]]], datetime, Optional[Dict[str, Any]]]:
+    """Returns (inventory_list, current_date, error_response); error_response is None on success."""
     if isinstance(inventory_data, list):
         inventory_list = inventory_data
         current_date = datetime.now()
@@ -42,7 +71,7 @@ def check_inventory_expiry(inventory_data: Any) -> Dict[str, Any]:
             try:
                 current_date = datetime.fromisoformat(str(inventory_data['current_date']))
             except (ValueError, TypeError):
-                return {
+                return None, datetime.now(), {
                     'status': 'error',
                     'message': (
                         f"Invalid current_date format: '{inventory_data['current_date']}'. "
@@ -54,102 +83,100 @@ def check_inventory_expiry(inventory_data: Any) -> Dict[str, Any]:
             current_date = datetime.now()
 
     else:
-        return {
+        return None, datetime.now(), {
             'status': 'error',
             'message': 'inventory_data must be a list or a dict with an "inventory" key.',
             'timestamp': datetime.now().isoformat()
         }
 
     if not inventory_list:
-        return {
+        return None, current_date, {
             'status': 'error',
             'message': 'Inventory list is empty. Nothing to analyse.',
             'timestamp': current_date.isoformat()
         }
 
-    critical_items = []
-    warning_items = []
-    ok_items = []
-    expired_items = []
-    skipped_items = []
-
-    for index, item in enumerate(inventory_list):
-        is_valid, error_msg = validate_item(item, index)
-        if not is_valid:
-            skipped_items.append({
-                'item_id': item.get('item_id', f'unknown_index_{index}'),
-                'item_name': item.get('item_name', 'unknown'),
-                'reason': error_msg
-            })
-            continue
+    return inventory_list, current_date, None
 
-        expiry_date_raw = item.get('expiry_date')
-        if expiry_date_raw is None:
-            skipped_items.append({
-                'item_id': item['item_id'],
-                'item_name': item['item_name'],
-                'reason': 'No expiry date provided — item excluded from expiry tracking'
-            })
-            continue
 
-        try:
-            expiry_date = datetime.fromisoformat(str(expiry_date_raw))
-        except (ValueError, TypeError):
-            skipped_items.append({
-                'item_id': item['item_id'],
-                'item_name': item['item_name'],
-                'reason': f"Invalid expiry_date format: '{expiry_date_raw}'. Expected YYYY-MM-DD."
-            })
-            continue
+def classify_item(item: Dict[str, Any], index: int, current_date: datetime) -> Tuple[str, int, Optional[Dict[str, Any]]]:
+    """Returns (bucket, days_until_expiry, skipped_entry).
 
-        days_until_expiry = (expiry_date - current_date).days
+    bucket is one of BUCKETS, or SKIPPED together with the skipped_entry to report.
+    """
+    is_valid, error_msg = validate_item(item, index)
+    if not is_valid:
+        return SKIPPED, 0, {
+            'item_id': item.get('item_id', f'unknown_index_{index}'),
+            'item_name': item.get('item_name', 'unknown'),
+            'reason': error_msg
+        }
 
-        value_at_risk = round(
-            float(item.get('purchase_price') or 0) * float(item.get('quantity') or 0), 2
-        )
+    expiry_date_raw = item.get('expiry_date')
+    if expiry_date_raw is None:
+        return SKIPPED, 0, {
+            'item_id': item['item_id'],
+            'item_name': item['item_name'],
+            'reason': 'No expiry date provided — item excluded from expiry tracking'
+        }
 
-        enriched_item = {
+    try:
+        expiry_date = datetime.fromisoformat(str(expiry_date_raw))
+    except (ValueError, TypeError):
+        return SKIPPED, 0, {
             'item_id': item['item_id'],
             'item_name': item['item_name'],
-            'quantity': item['quantity'],
-            'unit': item['unit'],
-            'days_until_expiry': days_until_expiry,
-            'expiry_date': expiry_date_raw,
-            'value_at_risk': value_at_risk
+            'reason': f"Invalid expiry_date format: '{expiry_date_raw}'. Expected YYYY-MM-DD."
         }
 
-        if days_until_expiry <= 0:
-            enriched_item['recommendation'] = "Item has EXPIRED. Remove from stock immediately and do not sell."
-            expired_items.append(enriched_item)
-
-        elif days_until_expiry < CRITICAL_THRESHOLD:
-            enriched_item['recommendation'] = (
-                "Offer 20-30% discount to clear stock immediately. "
-                "Contact regular customers directly. "
-                "Consider donation if unsellable."
-            )
-            critical_items.append(enriched_item)
-
-        elif days_until_expiry < WARNING_THRESHOLD:
-            enriched_item['recommendation'] = (
-                "Feature prominently in store. "
-                "Include in meal combos or special offers. "
-                "Consider freezing or further processing."
-            )
-            warning_items.append(enriched_item)
+    days_until_expiry = (expiry_date - current_date).days
+
+    if days_until_expiry <= 0:
+        bucket = EXPIRED
+    elif days_until_expiry < CRITICAL_THRESHOLD:
+        bucket = CRITICAL
+    elif days_until_expiry < WARNING_THRESHOLD:
+        bucket = WARNING
+    else:
+        bucket = OK
+
+    return bucket, days_until_expiry, None
+
 
-        else:
-            enriched_item['recommendation'] = "Monitor regularly — stock is within safe range."
-            ok_items.append(enriched_item)
 
-    total_value_at_risk = round(sum(
-        item['value_at_risk']
-        for item in critical_items + warning_items
-    ), 2)
 
-    total_expired_value = round(
-        sum(item['value_at_risk'] for item in expired_items), 2
-    )
+def assess_item(item: Dict[str, Any], index: int, current_date: datetime) -> Tuple[str, int, int, Optional[Dict[str, Any]]]:
+    """classify_item plus the item's value at risk in kobo: (bucket, days, value_kobo, skipped_entry)."""
+    bucket, days_until_expiry, skipped = classify_item(item, index, current_date)
+    if skipped is not None:
+        return SKIPPED, 0, 0, skipped
+    return bucket, days_until_expiry, line_value_kobo(item.get('purchase_price') or 0, item.get('quantity') or 0), None
+
+
+def enrich_item(item: Dict[str, Any], bucket: str, days_until_expiry: int, value_at_risk: float) -> Dict[str, Any]:
+    return {
+        'item_id': item['item_id'],
+        'item_name': item['item_name'],
+        'quantity': item['quantity'],
+        'unit': item['unit'],
+        'days_until_expiry': days_until_expiry,
+        'expiry_date': item['expiry_date'],
+        'value_at_risk': value_at_risk,
+        'recommendation': RECOMMENDATIONS[bucket]
+    }
+
+
+def build_result(buckets: Dict[str, List[Dict[str, Any]]], skipped_items: List[Dict[str, Any]],
+                 current_date: datetime, totals_kobo: Tuple[int, int]) -> Dict[str, Any]:
+    """totals_kobo is (value at risk, expired value) in kobo, as collect_items returns it."""
+    critical_items = buckets[CRITICAL]
+    warning_items = buckets[WARNING]
+    expired_items = buckets[EXPIRED]
+    ok_items = buckets[OK]
+
+    at_risk_kobo, expired_kobo = totals_kobo
+    total_value_at_risk = from_kobo(at_risk_kobo)
+    total_expired_value = from_kobo(expired_kobo)
 
     return {
         'status': 'success',
@@ -168,4 +195,64 @@ def check_inventory_expiry(inventory_data: Any) -> Dict[str, Any]:
         'ok_items': ok_items,
         'skipped_items': skipped_items,
         'timestamp': current_date.isoformat()
-    }
\ No newline at end of file
+    }
+
+
+def check_inventory_expiry(inventory_data: Any) -> Dict[str, Any]:
+    inventory_list, current_date, error = parse_inventory_request(inventory_data)
+    if error is not None:
+        return error
+    return classify_inventory(inventory_list, current_date)
+
+
+def assess_items(items: List[Dict[str, Any]], current_date: datetime,
+                 indices: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Columnar assessment: (codes, days, value kobo), one entry per item. A code is the item's
+    index in BUCKETS, or SKIPPED_CODE. Values are priced in one vectorized pass as int64 kobo
+    (an object array of Python ints in the unrealistic case they overflow int64). indices are
+    the items' positions for skipped-item messages (default 0..n-1)."""
+    codes, days, prices, quantities = [], [], [], []
+    for index, item in zip(range(len(items)) if indices is None else indices, items):
+        bucket, days_until_expiry, skipped = classify_item(item, index, current_date)
+        if skipped is not None:
+            codes.append(SKIPPED_CODE)
+            days.append(0)
+            prices.append(0)
+            quantities.append(0)
+            continue
+        codes.append(BUCKET_CODES[bucket])
+        days.append(days_until_expiry)
+        prices.append(item.get('purchase_price') or 0)
+        quantities.append(item.get('quantity') or 0)
+    return np.array(codes, dtype=np.int8), np.array(days, dtype=np.int64), line_values_kobo(prices, quantities)
+
+
+def totals_kobo(codes: np.ndarray, kobo: np.ndarray) -> Tuple[int, int]:
+    """(value at risk, expired value) in kobo of assessed items; exact, so partial totals add up."""
+    at_risk = (codes == BUCKET_CODES[CRITICAL]) | (codes == BUCKET_CODES[WARNING])
+    return total_kobo(kobo[at_risk]), total_kobo(kobo[codes == BUCKET_CODES[EXPIRED]])
+
+
+def collect_items(items: List[Dict[str, Any]], start: int, codes: np.ndarray, days: np.ndarray,
+                  kobo: np.ndarray, current_date: datetime, buckets: Dict[str, List[Dict[str, Any]]],
+                  skipped_items: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Appends the response entries of items[start:start + len(codes)], assessed by assess_items,
+    to buckets / skipped_items; returns their totals_kobo."""
+    lists = [buckets[b] for b in BUCKETS]
+    values = (kobo / KOBO_PER_NAIRA).tolist()
+    for index, item, code, days_until_expiry, value in zip(
+            range(start, start + len(codes)), items[start:start + len(codes)], codes.tolist(), days.tolist(), values):
+        if code == SKIPPED_CODE:
+            # rare; re-assessed here so the entry carries the item's own id and index
+            skipped_items.append(classify_item(item, index, current_date)[2])
+            continue
+        lists[code].append(enrich_item(item, BUCKETS[code], days_until_expiry, value))
+    return totals_kobo(codes, kobo)
+
+
+def classify_inventory(inventory_list: List[Dict[str, Any]], current_date: datetime) -> Dict[str, Any]:
+    buckets: Dict[str, List[Dict[str, Any]]] = {b: [] for b in BUCKETS}
+    skipped_items: List[Dict[str, Any]] = []
+    codes, days, kobo = assess_items(inventory_list, current_date)
+    totals = collect_items(inventory_list, 0, codes, days, kobo, current_date, buckets, skipped_items)
+    return build_result(buckets, skipped_items, current_date, totals)
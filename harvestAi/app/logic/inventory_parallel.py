@@ -0,0 +1,103 @@
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from app.logic.inventory_expiry_tracker import (
+    BUCKETS, REQUIRED_FIELDS, parse_inventory_request, classify_inventory, assess_items, collect_items,
+    build_result,
+)
+
+# Below this many items the serial tracker is faster than shipping chunks to other processes.
+PARALLEL_MIN_ITEMS = int(os.getenv("HARVESTAI_INVENTORY_PARALLEL_MIN_ITEMS", "100000"))
+MIN_CHUNK_ITEMS = 20000
+MAX_WORKERS = int(os.getenv("HARVESTAI_INVENTORY_WORKERS", str(os.cpu_count() or 1)))
+
+# the fields classify_item / assess_items read the values of; of the other required fields it only checks presence
+VALUE_FIELDS = ('quantity', 'expiry_date', 'purchase_price')
+PRESENCE_FIELDS = tuple(f for f in REQUIRED_FIELDS if f not in VALUE_FIELDS)
+
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+class _Absent:
+    """Column value for a field the item does not have. The class itself is the marker: it
+    pickles by reference, so `is _Absent` still holds in the worker."""
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        # spawn, not fork: the API process is multi-threaded and forking it is not safe
+        _POOL = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_POOL.shutdown, wait=False, cancel_futures=True)
+    return _POOL
+
+
+def _columns(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    columns: Dict[str, Any] = {f: [item.get(f, _Absent) for item in items] for f in VALUE_FIELDS}
+    present = frozenset(PRESENCE_FIELDS)
+    columns['present'] = bytes([item.keys() >= present for item in items])
+    return columns
+
+
+def _assess_chunk(columns: Dict[str, Any], current_date_iso: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Worker side: assess one chunk from its columns. Returns assess_items' (codes, days, kobo)
+    arrays, which pickle as three flat buffers."""
+    placeholders = dict.fromkeys(PRESENCE_FIELDS)
+    items = []
+    for present, *values in zip(columns['present'], *(columns[f] for f in VALUE_FIELDS)):
+        item = {f: v for f, v in zip(VALUE_FIELDS, values) if v is not _Absent}
+        if present:
+            item.update(placeholders)
+        items.append(item)
+    return assess_items(items, datetime.fromisoformat(current_date_iso))
+
+
+def check_inventory_expiry_parallel(inventory_data: Any, workers: Optional[int] = None,
+                                    min_items: Optional[int] = None) -> Dict[str, Any]:
+    """Same contract and output as check_inventory_expiry, sharded across worker processes.
+
+    The inventory is split into contiguous chunks. Each chunk goes to a worker as one list per
+    field in VALUE_FIELDS plus a presence flag per item for the other required fields. The
+    worker validates, parses dates and prices the chunk, and returns compact columns: a bucket
+    code, days until expiry and the value in kobo per item. The parent then builds the
+    response entries from its own items in one pass (collect_items, as the serial path does),
+    so no per-item dict crosses a process boundary and the result is identical to the serial
+    one.
+    """
+    inventory_list, current_date, error = parse_inventory_request(inventory_data)
+    if error is not None:
+        return error
+
+    workers = workers or MAX_WORKERS
+    threshold = PARALLEL_MIN_ITEMS if min_items is None else min_items
+    if workers < 2 or len(inventory_list) < threshold:
+        return classify_inventory(inventory_list, current_date)
+
+    n = len(inventory_list)
+    chunk_size = max(MIN_CHUNK_ITEMS, -(-n // (workers * 2)))
+
+    pool = _pool()
+    current_date_iso = current_date.isoformat()
+    futures = [
+        (start, pool.submit(_assess_chunk, _columns(inventory_list[start:start + chunk_size]), current_date_iso))
+        for start in range(0, n, chunk_size)
+    ]
+
+    buckets: Dict[str, List[Dict[str, Any]]] = {b: [] for b in BUCKETS}
+    skipped_items: List[Dict[str, Any]] = []
+    at_risk_kobo = expired_kobo = 0
+
+    for start, fut in futures:
+        codes, days, kobo = fut.result()
+        at_risk, expired = collect_items(inventory_list, start, codes, days, kobo, current_date,
+                                         buckets, skipped_items)
+        at_risk_kobo += at_risk
+        expired_kobo += expired
+
+    return build_result(buckets, skipped_items, current_date, (at_risk_kobo, expired_kobo))
@@ -0,0 +1,392 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.logic.inventory_expiry_tracker import (
+    BUCKETS, CRITICAL, WARNING, EXPIRED, OK, SKIPPED, SKIPPED_CODE, assess_items, classify_item,
+    enrich_item, build_result,
+)
+from app.logic.money import from_kobo, total_kobo
+
+# snapshots kept in memory per process; beyond this the least recently synced business is
+# evicted and has to resync (replace=True) on its next delta, unless a shared store holds it
+MAX_SNAPSHOTS = int(os.getenv("HARVESTAI_INVENTORY_SNAPSHOTS_MAX", "1000"))
+
+# with several uvicorn workers, snapshots are shared through this sqlite file (see
+# SqliteSnapshotStore); the same file business_state uses
+SNAPSHOT_DB_PATH = os.getenv("HARVESTAI_STATE_DB")
+# deltas kept per business so a worker that is behind replays them instead of reloading everything
+DELTA_LOG_MAX = int(os.getenv("HARVESTAI_INVENTORY_DELTA_LOG_MAX", "256"))
+
+
+# (bucket, days_until_expiry, value at risk in kobo, skipped_entry), as assess_item returns it
+Assessed = Tuple[str, int, int, Optional[Dict[str, Any]]]
+
+
+class VersionConflict(Exception):
+    """The delta's base_version is not this process's current version token: the client is
+    behind, or the snapshot is not held (never synced, evicted, or lost in a restart without a
+    shared store). Either way it must resync."""
+
+    def __init__(self, business_id: str, base_version: Any, current_version: Optional[str]):
+        self.business_id = business_id
+        self.base_version = base_version
+        self.current_version = current_version
+        held = f"is at version {current_version}" if current_version else "is not held"
+        super().__init__(
+            f"Snapshot for business '{business_id}' {held}, delta was based on {base_version}; resync required"
+        )
+
+
+class InventorySnapshot:
+    """One business's inventory plus the classification of every item in it.
+
+    Each item's assessment (bucket, days, value) is kept, together with per-bucket counts and
+    kobo totals. A delta therefore only re-assesses the items it touches. Everything is
+    re-assessed only when the reference date moves to a new day.
+
+    The version handed to clients is a token "<epoch>-<n>". The epoch is random per snapshot
+    (and per replace), so a token from another worker's unshared snapshot, or from before a
+    restart or eviction, can never match by accident.
+    """
+
+    def __init__(self, business_id: str):
+        self.business_id = business_id
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        self.current_date: Optional[datetime] = None
+        self.items: Dict[Any, Dict[str, Any]] = {}
+        self.assessed: Dict[Any, Assessed] = {}
+        self.counts: Dict[str, int] = {b: 0 for b in BUCKETS + (SKIPPED,)}
+        self.kobo: Dict[str, int] = {b: 0 for b in BUCKETS}
+        self.lock = threading.Lock()
+
+    @property
+    def token(self) -> str:
+        return f"{self.epoch}-{self.version}"
+
+    def _add(self, item_id: Any, assessed: Assessed) -> None:
+        self.assessed[item_id] = assessed
+        bucket, _, value, _ = assessed
+        self.counts[bucket] += 1
+        if bucket != SKIPPED:
+            self.kobo[bucket] += value
+
+    def _drop(self, item_id: Any) -> None:
+        bucket, _, value, _ = self.assessed.pop(item_id)
+        self.counts[bucket] -= 1
+        if bucket != SKIPPED:
+            self.kobo[bucket] -= value
+
+    @staticmethod
+    def _assess(items: List[Dict[str, Any]], indices: List[int], current_date: datetime) -> Tuple[List[Assessed], Any, Any]:
+        """assess_items over items, as Assessed tuples plus its code and kobo arrays."""
+        codes, days, kobo = assess_items(items, current_date, indices)
+        assessed = [
+            (SKIPPED, 0, 0, classify_item(item, index, current_date)[2]) if code == SKIPPED_CODE
+            else (BUCKETS[code], days_until_expiry, value, None)
+            for item, index, code, days_until_expiry, value in zip(
+                items, indices, codes.tolist(), days.tolist(), kobo.tolist())
+        ]
+        return assessed, codes, kobo
+
+    def reassess_all(self, current_date: datetime) -> None:
+        self.current_date = current_date
+        assessed, codes, kobo = self._assess(list(self.items.values()), list(range(len(self.items))), current_date)
+        self.assessed = dict(zip(self.items, assessed))
+        self.counts = {b: int(np.count_nonzero(codes == code)) for code, b in enumerate(BUCKETS)}
+        self.counts[SKIPPED] = int(np.count_nonzero(codes == SKIPPED_CODE))
+        self.kobo = {b: total_kobo(kobo[codes == code]) for code, b in enumerate(BUCKETS)}
+
+    def prepare(self, upserts: List[Dict[str, Any]], deletes: List[Any], current_date: datetime,
+                replace: bool = False) -> List[Assessed]:
+        """Assess every upsert as apply() will place it, without touching the snapshot. Anything
+        in the delta that can fail (an unhashable id, an amount that cannot be converted) raises
+        here, so a delta is applied completely or not at all."""
+        try:
+            present = set() if replace else set(self.items)
+            present.difference_update(deletes)
+            indices = []
+            for item in upserts:
+                present.add(item["item_id"])
+                indices.append(len(present) - 1)
+        except TypeError as e:
+            raise ValueError(f"item_id must be a string or number: {e}")
+        try:
+            return self._assess(upserts, indices, current_date)[0]
+        except ArithmeticError as e:
+            raise ValueError(f"quantity or purchase_price out of range: {e!r}")
+
+    def apply(self, upserts: List[Dict[str, Any]], deletes: List[Any],
+              assessed: List[Assessed]) -> Tuple[List[Any], List[Any]]:
+        """Apply a delta whose upserts prepare() assessed against the current date."""
+        changed, removed = [], []
+        for item_id in deletes:
+            if item_id in self.items:
+                self._drop(item_id)
+                del self.items[item_id]
+                removed.append(item_id)
+
+        for item, item_assessed in zip(upserts, assessed):
+            item_id = item["item_id"]
+            if item_id in self.assessed:
+                self._drop(item_id)
+            self.items[item_id] = item
+            self._add(item_id, item_assessed)
+            changed.append(item_id)
+        return changed, removed
+
+    def advance(self, upserts: List[Dict[str, Any]], deletes: List[Any], target: datetime,
+                replace: bool = False) -> Tuple[List[Any], List[Any]]:
+        """Apply one delta against reference date target (the caller has checked the version)."""
+        assessed = self.prepare(upserts, deletes, target, replace=replace)
+        if replace:
+            self.items.clear()
+            self.epoch = uuid.uuid4().hex[:12]
+            self.version = 0
+        if replace or target != self.current_date:
+            self.reassess_all(target)
+        changed, removed = self.apply(upserts, deletes, assessed)
+        self.version += 1
+        return changed, removed
+
+    def view(self, item_id: Any) -> Dict[str, Any]:
+        bucket, days, value, skipped = self.assessed[item_id]
+        if bucket == SKIPPED:
+            return {**skipped, 'status': SKIPPED}
+        return {**enrich_item(self.items[item_id], bucket, days, from_kobo(value)), 'status': bucket}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'critical_items': self.counts[CRITICAL],
+            'warning_items': self.counts[WARNING],
+            'ok_items': self.counts[OK],
+            'expired_items': self.counts[EXPIRED],
+            'skipped_items': self.counts[SKIPPED],
+            'total_value_at_risk': from_kobo(self.kobo[CRITICAL] + self.kobo[WARNING]),
+            'total_expired_value': from_kobo(self.kobo[EXPIRED])
+        }
+
+    def full_result(self) -> Dict[str, Any]:
+        """The whole snapshot in check_inventory_expiry's response shape."""
+        buckets: Dict[str, List[Dict[str, Any]]] = {b: [] for b in BUCKETS}
+        skipped_items = []
+        for item_id, (bucket, days, value, skipped) in self.assessed.items():
+            if bucket == SKIPPED:
+                skipped_items.append(skipped)
+            else:
+                buckets[bucket].append(enrich_item(self.items[item_id], bucket, days, from_kobo(value)))
+        # totals straight from the kobo counters so they agree with every delta response
+        totals = (self.kobo[CRITICAL] + self.kobo[WARNING], self.kobo[EXPIRED])
+        return build_result(buckets, skipped_items, self.current_date, totals)
+
+
+class SqliteSnapshotStore:
+    """Snapshots in one sqlite file shared by all workers: a head row per business (epoch,
+    version, reference date), one row per item in insertion order, and the last DELTA_LOG_MAX
+    deltas. Workers keep their in-memory snapshots and catch up from here before every use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS inventory_head (business_id TEXT PRIMARY KEY, epoch TEXT NOT NULL,"
+            " version INTEGER NOT NULL, reference_date TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS inventory_item (business_id TEXT NOT NULL, item_key TEXT NOT NULL,"
+            " position INTEGER NOT NULL, item TEXT NOT NULL, PRIMARY KEY (business_id, item_key))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS inventory_delta (business_id TEXT NOT NULL, version INTEGER NOT NULL,"
+            " reference_date TEXT NOT NULL, upserts TEXT NOT NULL, deletes TEXT NOT NULL,"
+            " PRIMARY KEY (business_id, version))"
+        )
+
+    @contextmanager
+    def transaction(self, write: bool = True) -> Iterator[None]:
+        """One transaction at a time per process; a write transaction also excludes every other
+        worker's writers, so checking a version and writing the next one cannot interleave."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def head(self, business_id: str) -> Optional[Tuple[str, int, datetime]]:
+        row = self._conn.execute(
+            "SELECT epoch, version, reference_date FROM inventory_head WHERE business_id = ?", (business_id,)
+        ).fetchone()
+        return (row[0], row[1], datetime.fromisoformat(row[2])) if row else None
+
+    def items(self, business_id: str) -> List[Dict[str, Any]]:
+        return [json.loads(item) for (item,) in self._conn.execute(
+            "SELECT item FROM inventory_item WHERE business_id = ? ORDER BY position", (business_id,)
+        )]
+
+    def deltas(self, business_id: str, after_version: int) -> List[Tuple[int, datetime, List[Dict[str, Any]], List[Any]]]:
+        return [(version, datetime.fromisoformat(ref), json.loads(upserts), json.loads(deletes))
+                for version, ref, upserts, deletes in self._conn.execute(
+                    "SELECT version, reference_date, upserts, deletes FROM inventory_delta"
+                    " WHERE business_id = ? AND version > ? ORDER BY version", (business_id, after_version))]
+
+    @staticmethod
+    def _key(item_id: Any) -> str:
+        return json.dumps(item_id)
+
+    def write(self, snap: "InventorySnapshot", upserts: List[Dict[str, Any]], deletes: List[Any],
+              changed: List[Any], removed: List[Any], replace: bool) -> None:
+        """Record the delta snap.advance() just applied (inside a write transaction)."""
+        b = snap.business_id
+        self._conn.execute(
+            "INSERT OR REPLACE INTO inventory_head (business_id, epoch, version, reference_date) VALUES (?, ?, ?, ?)",
+            (b, snap.epoch, snap.version, snap.current_date.isoformat()),
+        )
+        if replace:
+            self._conn.execute("DELETE FROM inventory_item WHERE business_id = ?", (b,))
+            self._conn.execute("DELETE FROM inventory_delta WHERE business_id = ?", (b,))
+        self._conn.executemany("DELETE FROM inventory_item WHERE business_id = ? AND item_key = ?",
+                               [(b, self._key(item_id)) for item_id in removed])
+        # an upsert of a known item keeps its position, a new one goes last, as in snap.items
+        self._conn.executemany(
+            "INSERT INTO inventory_item (business_id, item_key, position, item)"
+            " VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM inventory_item WHERE business_id = ?), ?)"
+            " ON CONFLICT (business_id, item_key) DO UPDATE SET item = excluded.item",
+            [(b, self._key(item_id), b, json.dumps(snap.items[item_id], default=str)) for item_id in changed],
+        )
+        if not replace:
+            # a replace starts a new epoch, which workers reload instead of replaying
+            self._conn.execute(
+                "INSERT INTO inventory_delta (business_id, version, reference_date, upserts, deletes)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (b, snap.version, snap.current_date.isoformat(), json.dumps(upserts, default=str),
+                 json.dumps(deletes, default=str)),
+            )
+            self._conn.execute("DELETE FROM inventory_delta WHERE business_id = ? AND version <= ?",
+                               (b, snap.version - DELTA_LOG_MAX))
+
+
+class InventorySnapshotStore:
+    """Snapshots by business_id, least recently synced first; at most max_snapshots are kept in
+    memory. With a shared SqliteSnapshotStore every worker sees every delta: a snapshot is
+    brought up to the shared version (replaying the deltas it missed, or reloading) before it
+    is read or changed, so a client may send each delta to any worker."""
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS, shared: Optional[SqliteSnapshotStore] = None):
+        self.max_snapshots = max_snapshots
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[str, InventorySnapshot]" = OrderedDict()
+
+    def get(self, business_id: str) -> Optional[InventorySnapshot]:
+        if self.shared is None:
+            with self._lock:
+                return self._snapshots.get(business_id)
+        with self.shared.transaction(write=False):
+            head = self.shared.head(business_id)
+            if head is None:
+                return None
+            snap = self._get_or_create(business_id, create=True)
+            with snap.lock:
+                self._catch_up(snap, head)
+        return snap
+
+    def _get_or_create(self, business_id: str, create: bool) -> Optional[InventorySnapshot]:
+        with self._lock:
+            snap = self._snapshots.get(business_id)
+            if snap is None and create:
+                snap = self._snapshots[business_id] = InventorySnapshot(business_id)
+                while len(self._snapshots) > self.max_snapshots:
+                    self._snapshots.popitem(last=False)
+            if snap is not None:
+                self._snapshots.move_to_end(business_id)
+            return snap
+
+    def _catch_up(self, snap: InventorySnapshot, head: Tuple[str, int, datetime]) -> None:
+        """Bring snap (locked) to the shared head: replay the missed deltas, or reload."""
+        epoch, version, reference_date = head
+        if snap.epoch == epoch and snap.version == version:
+            return
+        if snap.epoch == epoch and snap.version < version and snap.current_date is not None:
+            missed = self.shared.deltas(snap.business_id, snap.version)
+            if [v for v, _, _, _ in missed] == list(range(snap.version + 1, version + 1)):
+                for _, target, upserts, deletes in missed:
+                    snap.advance(upserts, deletes, target)
+                return
+        snap.items = {item["item_id"]: item for item in self.shared.items(snap.business_id)}
+        snap.reassess_all(reference_date)
+        snap.epoch, snap.version = epoch, version
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._snapshots)
+
+    def apply_delta(self, business_id: str, base_version: Any, upserts: List[Dict[str, Any]],
+                    deletes: List[Any], current_date: Optional[datetime] = None,
+                    replace: bool = False) -> Dict[str, Any]:
+        """Apply upserts/deletes keyed by item_id on top of base_version (a version token).
+
+        replace=True discards the stored snapshot and treats upserts as the full inventory
+        (initial sync, or recovery after a VersionConflict); base_version is not checked then.
+        Without one, a delta is accepted only on top of the current token (this worker's, or
+        the shared one). The one exception is the first sync of a business nobody has synced,
+        which must send no base_version (or 0). Without an explicit current_date the reference
+        date stays fixed for the calendar day and moves to datetime.now() on the first delta of
+        a new day.
+        """
+        if self.shared is None:
+            return self._apply_delta(business_id, base_version, upserts, deletes, current_date, replace)
+        with self.shared.transaction():
+            return self._apply_delta(business_id, base_version, upserts, deletes, current_date, replace,
+                                     head=self.shared.head(business_id))
+
+    def _apply_delta(self, business_id: str, base_version: Any, upserts: List[Dict[str, Any]],
+                     deletes: List[Any], current_date: Optional[datetime], replace: bool,
+                     head: Optional[Tuple[str, int, datetime]] = None) -> Dict[str, Any]:
+        fresh = not replace and base_version in (None, 0, "")
+        snap = self._get_or_create(business_id, create=replace or fresh or head is not None)
+        if snap is None:
+            raise VersionConflict(business_id, base_version, None)
+        with snap.lock:
+            if head is not None:
+                self._catch_up(snap, head)
+            if not replace and not (fresh and snap.version == 0) and str(base_version) != snap.token:
+                raise VersionConflict(business_id, base_version, snap.token)
+
+            now = datetime.now()
+            target = snap.current_date
+            if current_date is not None:
+                target = current_date
+            elif target is None or target.date() != now.date():
+                target = now
+            changed, removed = snap.advance(upserts, deletes, target, replace=replace)
+            if self.shared is not None:
+                try:
+                    self.shared.write(snap, upserts, deletes, changed, removed, replace)
+                except BaseException:
+                    snap.epoch = ""       # not recorded: reload from the shared store next time
+                    raise
+
+            return {
+                'status': 'success',
+                'business_id': business_id,
+                'version': snap.token,
+                'summary': snap.summary(),
+                'upserted': [snap.view(item_id) for item_id in changed],
+                'deleted': removed,
+                'timestamp': snap.current_date.isoformat()
+            }
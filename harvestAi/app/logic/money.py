@@ -0,0 +1,137 @@
+'''
+Fixed-point money: naira amounts as int64 kobo (minor units).
+
+Rounding matches the NUMERIC(15,2) columns in the database: half away from zero, the way
+PostgreSQL rounds NUMERIC. Python's round() rounds half to even, and its floats add small
+binary errors, so it does not.
+
+- to_kobo / line_value_kobo: scalar conversion for per-item values (strings and Decimals
+  go through Decimal)
+- to_kobo_array / line_values_kobo: vectorized versions of the same rules for large inputs
+- total_kobo / group_total_kobo: exact integer sums; they switch to Python ints if int64
+  could overflow
+
+Amounts go back to floats (from_kobo) only at the response boundary. A float that came from
+an integer number of kobo has exactly 2 dp, so JSON output is unchanged.
+'''
+import math
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from typing import Any, Iterable
+
+import numpy as np
+
+KOBO_PER_NAIRA = 100
+_SAFE = 2 ** 62          # headroom below int64 max for intermediate products and sums
+
+
+# -------------------------
+# SCALAR
+# -------------------------
+def _decimal(value: Any) -> Decimal:
+    # str() first so a float like 1.005 converts as written, not as 1.00499999999999989...
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Not a valid amount: {value!r}")
+
+
+def to_kobo(value: Any) -> int:
+    """Naira (float, int, str or Decimal) -> kobo, rounded half away from zero."""
+    if isinstance(value, int):
+        return int(value) * KOBO_PER_NAIRA
+    if isinstance(value, float):
+        # same rule as _round_half_away, without the cost of a Decimal per item
+        if not math.isfinite(value):
+            raise ValueError(f"Not a valid amount: {value!r}")
+        a = abs(value) * KOBO_PER_NAIRA
+        floor = math.floor(a)
+        kobo = floor + ((a - floor) + 8 * math.ulp(a) >= 0.5)
+        return kobo if value >= 0 else -kobo
+    return int(_decimal(value).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_kobo(kobo: int) -> float:
+    return int(kobo) / KOBO_PER_NAIRA
+
+
+def line_value_kobo(price: Any, quantity: Any) -> int:
+    """price * quantity in kobo, with both stored as NUMERIC(.,2) first, as in the inventory table."""
+    price_kobo = to_kobo(price)
+    qty_centi = to_kobo(quantity)          # hundredths of a unit, same scale as kobo
+    return _div_half_away_int(price_kobo * qty_centi, 100)
+
+
+def _div_half_away_int(n: int, d: int) -> int:
+    q = (2 * abs(n) + d) // (2 * d)
+    return q if n >= 0 else -q
+
+
+# -------------------------
+# VECTORIZED
+# -------------------------
+def _round_half_away(x: np.ndarray) -> np.ndarray:
+    """Round float64 to the nearest integer, ties away from zero. A value a few ulps below a tie
+    (e.g. 1.005 * 100 == 100.49999999999999) counts as the tie it was meant to be."""
+    a = np.abs(x)
+    floor = np.floor(a)
+    up = (a - floor) + 8 * np.spacing(a) >= 0.5
+    return (np.copysign(floor + up, x)).astype(np.int64)
+
+
+def to_kobo_array(values: Any) -> np.ndarray:
+    """Vectorized to_kobo. Numeric input is converted in one pass; strings / Decimals / mixed
+    object input fall back to the exact scalar path element by element."""
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iub":
+        return arr.astype(np.int64) * KOBO_PER_NAIRA
+    if arr.dtype.kind == "f":
+        return _round_half_away(arr.astype(np.float64) * KOBO_PER_NAIRA)
+    return np.fromiter((to_kobo(v) for v in arr.ravel()), dtype=np.int64, count=arr.size).reshape(arr.shape)
+
+
+def from_kobo_array(kobo: np.ndarray) -> np.ndarray:
+    return np.asarray(kobo, dtype=np.int64) / KOBO_PER_NAIRA
+
+
+def line_values_kobo(prices: Any, quantities: Any) -> np.ndarray:
+    """Vectorized line_value_kobo. Returns an object array of Python ints in the (unrealistic)
+    case that some product would not fit in int64."""
+    p = to_kobo_array(prices)
+    q = to_kobo_array(quantities)
+    if p.size and float(np.max(np.abs(p.astype(np.float64) * q.astype(np.float64)))) >= _SAFE:
+        return np.array([_div_half_away_int(a * b, 100) for a, b in zip(p.tolist(), q.tolist())], dtype=object)
+    prod = p * q
+    out = (2 * np.abs(prod) + 100) // 200
+    return np.where(prod < 0, -out, out)
+
+
+def total_kobo(kobo: Any) -> int:
+    """Exact sum as a Python int."""
+    arr = np.asarray(kobo)
+    if arr.size == 0:
+        return 0
+    if arr.dtype == object:
+        return sum(int(v) for v in arr.ravel())
+    arr = arr.astype(np.int64, copy=False)
+    if int(np.abs(arr).max()) * arr.size < _SAFE:
+        return int(arr.sum())
+    return sum(int(v) for v in arr.ravel())
+
+
+def group_total_kobo(codes: Any, kobo: Any, n_groups: int) -> np.ndarray:
+    """Exact per-group sums of kobo by integer group code (0..n_groups-1)."""
+    codes = np.asarray(codes, dtype=np.intp)
+    kobo = np.asarray(kobo, dtype=np.int64)
+    out = np.zeros(n_groups, dtype=np.int64)
+    if kobo.size and int(np.abs(kobo).max()) * kobo.size >= _SAFE:
+        big = [0] * n_groups
+        for c, v in zip(codes.tolist(), kobo.tolist()):
+            big[c] += v
+        return np.array(big, dtype=object)
+    np.add.at(out, codes, kobo)
+    return out
+
+
+def sum_naira(values: Iterable[Any]) -> float:
+    """Exact sum of naira amounts, returned as a 2 dp float."""
+    return from_kobo(total_kobo(to_kobo_array(list(values))))
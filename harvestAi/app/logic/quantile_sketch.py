@@ -0,0 +1,158 @@
+import math
+import random
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+DEFAULT_K = 200
+_C = 2.0 / 3.0      # capacity decay between levels
+_MIN_CAPACITY = 8
+
+
+class KLLSketch:
+    """Mergeable streaming quantile sketch (Karnin, Lang & Liberty, 2016).
+
+    Items go into level 0. A level holding more than its capacity is sorted and half of it
+    (every other item, random offset) is promoted to the next level, where each item stands for
+    twice as many inputs. Capacities shrink geometrically towards the lower levels, so memory is
+    O(k) no matter how many items are added (about 3k floats).
+
+    Error bounds: any rank query is off by at most eps * n with high probability, where
+    eps = O(1/k). For this compactor scheme Apache DataSketches reports eps ~ 1.65% at k=200
+    (99% confidence). So median() returns a value whose true rank lies in roughly
+    [0.5 - eps, 0.5 + eps]. mad() is the weighted median of |x - median()| over the retained
+    items. Its rank error is about 2 * eps in the deviation distribution, plus the shift caused
+    by the median estimate. benchmarks/sketch_accuracy.py measures both against exact values.
+
+    Two sketches built on different processes merge into a sketch of the union with the same
+    error guarantee (merge / to_dict / from_dict).
+    """
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.levels: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+
+    # -------------------------
+    # UPDATE / MERGE
+    # -------------------------
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(_MIN_CAPACITY, int(math.ceil(self.k * (_C ** depth))))
+
+    def _retained(self) -> int:
+        return sum(len(lvl) for lvl in self.levels)
+
+    def _total_capacity(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def update(self, value: float) -> None:
+        value = float(value)
+        self.n += 1
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+        self.levels[0].append(value)
+        if self._retained() > self._total_capacity():
+            self._compress()
+
+    def update_many(self, values: Iterable[float]) -> None:
+        for v in values:
+            self.update(v)
+
+    def _compress(self) -> None:
+        while self._retained() > self._total_capacity():
+            for h, level in enumerate(self.levels):
+                if len(level) >= self._capacity(h):
+                    break
+            else:
+                return
+            if h + 1 == len(self.levels):
+                self.levels.append([])
+
+            level.sort()
+            # keep one item back if the level is odd so the promoted half is exact
+            keep = [level.pop()] if len(level) % 2 else []
+            offset = self._rng.randint(0, 1)
+            self.levels[h + 1].extend(level[offset::2])
+            self.levels[h] = keep
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    # -------------------------
+    # QUERIES
+    # -------------------------
+    def _weighted(self) -> List[Tuple[float, int]]:
+        items = [(v, 1 << h) for h, level in enumerate(self.levels) for v in level]
+        items.sort()
+        return items
+
+    @staticmethod
+    def _weighted_quantile(items: List[Tuple[float, int]], q: float) -> float:
+        total = sum(w for _, w in items)
+        target = q * total
+        acc = 0
+        for v, w in items:
+            acc += w
+            if acc >= target:
+                return v
+        return items[-1][0]
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        return self._weighted_quantile(self._weighted(), q)
+
+    def median(self) -> Optional[float]:
+        return self.quantile(0.5)
+
+    def median_and_mad(self) -> Tuple[Optional[float], Optional[float]]:
+        if self.n == 0:
+            return None, None
+        items = self._weighted()
+        med = self._weighted_quantile(items, 0.5)
+        deviations = sorted((abs(v - med), w) for v, w in items)
+        return med, self._weighted_quantile(deviations, 0.5)
+
+    def mad(self) -> Optional[float]:
+        return self.median_and_mad()[1]
+
+    def rank(self, value: float) -> float:
+        """Approximate fraction of inputs <= value."""
+        if self.n == 0:
+            return 0.0
+        items = self._weighted()
+        total = sum(w for _, w in items)
+        return sum(w for v, w in items if v <= value) / total
+
+    # -------------------------
+    # SERIALISATION
+    # -------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max, "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        sk = cls(k=int(data.get("k", DEFAULT_K)))
+        sk.n = int(data.get("n", 0))
+        if sk.k < 1 or sk.n < 0:
+            raise ValueError(f"Invalid sketch: k={sk.k}, n={sk.n}")
+        sk.min = float(data["min"]) if data.get("min") is not None else None
+        sk.max = float(data["max"]) if data.get("max") is not None else None
+        sk.levels = [[float(v) for v in level] for level in data.get("levels", [[]])] or [[]]
+        return sk
@@ -0,0 +1,185 @@
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_PATHS = 10000
+DEFAULT_HORIZON_DAYS = 180
+BLOCK_DAYS = 7               # bootstrap whole weeks so weekday patterns survive resampling
+MIN_HISTORY_DAYS = 7
+
+# same cut-offs as CashflowPredictor in Cash_flow_prediction_oop.ipynb
+CRITICAL_THRESHOLD = 30
+WARNING_THRESHOLD = 60
+
+METHODS = ("bootstrap", "normal")
+
+# paths are simulated CHUNK_CELLS path-days at a time (~4 MB of float32 plus a bool mask), so
+# peak memory no longer grows with paths * horizon_days; only the int32 day per path is kept
+CHUNK_CELLS = int(os.getenv("HARVESTAI_RUNWAY_CHUNK_CELLS", str(1 << 20)))
+
+
+def daily_net_cashflow(transactions: List[Dict[str, Any]]) -> Tuple[np.ndarray, int]:
+    """Net cashflow per calendar day (income - expense), zero-filled between the first and last
+    transaction date. Returns (nets, skipped_count); rows without a usable date/type/amount are skipped."""
+    days, signed = [], []
+    skipped = 0
+    for tx in transactions:
+        try:
+            day = datetime.fromisoformat(str(tx["date"]).replace("Z", "+00:00")).date().toordinal()
+            amount = float(tx["amount"])
+            ttype = str(tx["type"]).lower()
+        except (KeyError, TypeError, ValueError):
+            skipped += 1
+            continue
+        if ttype not in ("income", "expense"):
+            skipped += 1
+            continue
+        days.append(day)
+        signed.append(amount if ttype == "income" else -amount)
+
+    if not days:
+        return np.zeros(0), skipped
+    d = np.asarray(days, dtype=np.int64)
+    return np.bincount(d - d.min(), weights=np.asarray(signed, dtype=np.float64)), skipped
+
+
+def latest_balance(transactions: List[Dict[str, Any]]) -> Optional[float]:
+    """current_balance of the most recent transaction that carries one."""
+    best = None
+    for tx in transactions:
+        if tx.get("current_balance") is None:
+            continue
+        try:
+            key = datetime.fromisoformat(str(tx["date"]).replace("Z", "+00:00"))
+            bal = float(tx["current_balance"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if key.tzinfo is not None:
+            key = key.replace(tzinfo=None)
+        if best is None or key >= best[0]:
+            best = (key, bal)
+    return best[1] if best else None
+
+
+def _sample_paths(nets: np.ndarray, paths: int, horizon: int, method: str,
+                  rng: np.random.Generator) -> np.ndarray:
+    """(paths x horizon) float32 daily nets; nets is already float32."""
+    if method == "normal":
+        sims = rng.standard_normal(size=(paths, horizon), dtype=np.float32)
+        sims *= np.float32(nets.std(ddof=1))
+        sims += np.float32(nets.mean())
+        return sims
+
+    # moving-block bootstrap: pick random 7-day windows of history and lay them end to end
+    block = min(BLOCK_DAYS, len(nets))
+    n_blocks = -(-horizon // block)
+    starts = rng.integers(0, len(nets) - block + 1, size=(paths, n_blocks), dtype=np.int32)
+    idx = (starts[:, :, None] + np.arange(block, dtype=np.int32)).reshape(paths, n_blocks * block)[:, :horizon]
+    return nets[idx]
+
+
+def _days_until_breach(nets: np.ndarray, current_balance: float, min_cash_buffer: float, paths: int,
+                       horizon_days: int, method: str, rng: np.random.Generator) -> np.ndarray:
+    """First simulated day (1-based) each path's balance is below min_cash_buffer, or
+    horizon_days + 1 if it never is. Runs CHUNK_CELLS path-days at a time."""
+    nets = nets.astype(np.float32)
+    days = np.empty(paths, dtype=np.int32)
+    chunk = max(1, CHUNK_CELLS // horizon_days)
+    for lo in range(0, paths, chunk):
+        n = min(chunk, paths - lo)
+        sims = _sample_paths(nets, n, horizon_days, method, rng)
+        balances = np.cumsum(sims, axis=1, out=sims)
+        balances += np.float32(current_balance)
+        below = balances < np.float32(min_cash_buffer)
+        # argmax finds the first True; day 1 is the first simulated day
+        days[lo:lo + n] = np.where(below.any(axis=1), below.argmax(axis=1) + 1, horizon_days + 1)
+    return days
+
+
+def simulate_runway(nets: np.ndarray, current_balance: float, min_cash_buffer: float = 0.0,
+                    paths: int = DEFAULT_PATHS, horizon_days: int = DEFAULT_HORIZON_DAYS,
+                    method: str = "bootstrap", seed: Optional[int] = None) -> Dict[str, Any]:
+    """Distribution of days until the balance first drops below min_cash_buffer.
+
+    Paths are simulated in (chunk x horizon_days) float32 blocks: resample daily net cashflow,
+    cumulative-sum it onto current_balance, and take the first column where the buffer is
+    breached. Paths that never breach within the horizon count as "beyond horizon".
+    A percentile that falls there is reported as None.
+    """
+    if method not in METHODS:
+        return {"status": "error", "message": f"method must be one of {list(METHODS)}"}
+    if len(nets) < MIN_HISTORY_DAYS:
+        return {"status": "error", "message": f"Need at least {MIN_HISTORY_DAYS} days of history, got {len(nets)}."}
+
+    rng = np.random.default_rng(seed)
+    if current_balance < min_cash_buffer:
+        days = np.zeros(paths, dtype=np.int32)
+    else:
+        days = _days_until_breach(nets, current_balance, min_cash_buffer, paths, horizon_days, method, rng)
+    breached = days <= horizon_days
+
+    p10, p50, p90 = np.percentile(days, [10, 50, 90], method="lower")
+
+    def _days(v) -> Optional[int]:
+        return int(v) if v <= horizon_days else None
+
+    median_days = _days(p50)
+    if median_days is None:
+        risk_level = "stable"
+    elif median_days <= CRITICAL_THRESHOLD:
+        risk_level = "critical"
+    elif median_days <= WARNING_THRESHOLD:
+        risk_level = "warning"
+    else:
+        risk_level = "ok"
+
+    return {
+        "status": "success",
+        "risk_level": risk_level,
+        "days_until_broke": {"p10": _days(p10), "median": median_days, "p90": _days(p90)},
+        "prob_broke_within": {
+            "30_days": round(float(np.mean(days <= 30)), 4),
+            "60_days": round(float(np.mean(days <= 60)), 4),
+            "horizon": round(float(breached.mean()), 4),
+        },
+        "avg_daily_net": round(float(nets.mean()), 2),
+        "current_balance": round(float(current_balance), 2),
+        "min_cash_buffer": min_cash_buffer,
+        "history_days": int(len(nets)),
+        "paths": paths,
+        "horizon_days": horizon_days,
+        "method": method,
+    }
+
+
+def simulate_runway_from_transactions(transactions: List[Dict[str, Any]], current_balance: Optional[float] = None,
+                                      min_cash_buffer: float = 0.0, **kwargs) -> Dict[str, Any]:
+    nets, skipped = daily_net_cashflow(transactions)
+    if current_balance is None:
+        current_balance = latest_balance(transactions)
+    if current_balance is None:
+        return {"status": "error", "message": "current_balance not given and no transaction carries one."}
+
+    result = simulate_runway(nets, current_balance, min_cash_buffer, **kwargs)
+    result["skipped_transactions"] = skipped
+    return result
+
+
+def simulate_runway_batch(businesses: List[Dict[str, Any]], **kwargs) -> List[Dict[str, Any]]:
+    """One simulation per business ({"business_id", "transactions", "current_balance"?,
+    "min_cash_buffer"?}). Each gets a child of one SeedSequence, so a seeded batch is reproducible."""
+    rng_seed = kwargs.pop("seed", None)
+    seeds = np.random.SeedSequence(rng_seed).spawn(len(businesses))
+    results = []
+    for biz, ss in zip(businesses, seeds):
+        r = simulate_runway_from_transactions(
+            biz.get("transactions") or [],
+            current_balance=biz.get("current_balance"),
+            min_cash_buffer=float(biz.get("min_cash_buffer") or 0.0),
+            seed=ss,
+            **kwargs,
+        )
+        results.append({"business_id": biz.get("business_id"), **r})
+    return results
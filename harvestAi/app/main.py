@@ -1,50 +1,257 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException, Header, Query, Request
 from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.schemas import (
+    InventoryExpiryRequest, InventoryRequest, CashflowRequest, AnomalyRequest, InventorySyncRequest,
+    RunwayRequest, RunwayBatchRequest,
+)
+from app.admission import AdmissionRejected, admit, admission_stats, count_items, simulation_items, tenant_of
+from app.codecs import NegotiatedRoute, NegotiatedResponse
+from app.engines import WARMUP, engine, lazy, loaded, registry, resolve, warm, warmup_names, status as engine_status
+from app.shadow import Shadow, pin_inventory_date, timed
+
+# Heavy modules (numpy, requests, ...) are imported on first use or by the warm-up, see app/engines.py.
+backend_client = engine("backend_client", "app.backend_client")
+inventory_parallel = engine("inventory_parallel", "app.logic.inventory_parallel")
+inventory_snapshot = engine("inventory_snapshot", "app.logic.inventory_snapshot")
+cashflow_logic = engine("cashflow_logic", "app.logic.cashflow_logic")
+expense_anomaly = engine("expense_anomaly", "app.logic.expense_anomaly")
+expense_baseline = engine("expense_baseline", "app.logic.expense_baseline")
+runway_simulator = engine("runway_simulator", "app.logic.runway_simulator")
+business_state = engine("business_state", "app.business_state")
+txlog = engine("txlog", "app.txlog")
+txlog_consumers = engine("txlog_consumers", "app.txlog_consumers")
+
+
+# Sketch-based expense baselines, kept across restarts when HARVESTAI_BASELINE_PATH is set.
+# Every worker folds its new data into that file every HARVESTAI_BASELINE_SYNC_SECONDS.
+BASELINE_PATH = os.getenv("HARVESTAI_BASELINE_PATH")
+BASELINE_SYNC_SECONDS = float(os.getenv("HARVESTAI_BASELINE_SYNC_SECONDS", "30"))
+
+
+def _load_baselines():
+    if BASELINE_PATH:
+        return expense_baseline.ExpenseBaselineStore.load(BASELINE_PATH)
+    return expense_baseline.ExpenseBaselineStore()
+
 
-from app.schemas import InventoryExpiryRequest, InventoryRequest, CashflowRequest, AnomalyRequest
-from app.backend_client import post_cashflow, post_inventory, post_anomalies, BackendError
+# Warm derived state per business (/run/cashflow, /run/anomalies-local); shared across workers
+# through HARVESTAI_STATE_DB when set.
+def _business_states():
+    path = business_state.STATE_DB_PATH
+    return business_state.BusinessStateCache(shared=business_state.SqliteStateStore(path) if path else None)
+
+
+# Per-business inventory snapshots for the delta sync protocol (/sync/inventory); shared across
+# workers through HARVESTAI_STATE_DB when set, so a delta may land on any worker.
+def _inventory_snapshots():
+    path = inventory_snapshot.SNAPSHOT_DB_PATH
+    return inventory_snapshot.InventorySnapshotStore(
+        shared=inventory_snapshot.SqliteSnapshotStore(path) if path else None)
+
+
+# Append-only transaction log fed by /run/cashflow, with incremental consumers (app/txlog.py).
+# Disabled unless HARVESTAI_TXLOG_DIR is set (read here too, so a disabled log is never imported).
+TXLOG_DIR = os.getenv("HARVESTAI_TXLOG_DIR")
+
+
+def _build_state(app: FastAPI) -> None:
+    """One app's stores, built lazily and registered for its warm-up, and its shadows. Nothing
+    mutable is shared between two apps from create_app()."""
+    state = app.state
+    state.engines = engines = registry()
+    state.baselines = lazy("baselines", _load_baselines, engines)
+    state.inventory_snapshots = lazy("inventory_snapshots", _inventory_snapshots, engines)
+    state.business_states = lazy("business_states", _business_states, engines)
+    state.transaction_log = state.log_consumers = None
+    if TXLOG_DIR:
+        log = state.transaction_log = lazy("transaction_log", lambda: txlog.TransactionLog(TXLOG_DIR), engines)
+        state.log_consumers = lazy(
+            "log_consumers", lambda: txlog.ConsumerRunner(resolve(log), txlog_consumers.default_consumers()), engines
+        )
+    # candidate engines run on a sample of live requests, off the response path (app/shadow.py)
+    state.shadows = {
+        "inventory-expiry": Shadow.from_env("inventory-expiry", "HARVESTAI_SHADOW_INVENTORY_EXPIRY",
+                                            prepare=pin_inventory_date),
+        "anomalies-local": Shadow.from_env("anomalies-local", "HARVESTAI_SHADOW_ANOMALIES_LOCAL"),
+    }
 
-from app.logic.inventory_expiry_tracker import check_inventory_expiry
-from app.logic.cashflow_logic import validate_transaction, summarize_cashflow
-from app.logic.expense_anomaly import validate_expense_payload, detect_expense_anomalies
 
-app = FastAPI(title="harvestAi Integration API", version="1.0.0")
+async def _consume_log(log_consumers):
+    while True:
+        try:
+            await run_in_threadpool(log_consumers.poll)
+        except Exception:  # keep polling; the next poll retries from the committed offset
+            logging.getLogger(__name__).exception("transaction log consumer poll failed")
+        await asyncio.sleep(txlog.POLL_SECONDS)
 
 
-@app.get("/health")
+async def _sync_baselines(baselines):
+    while True:
+        await asyncio.sleep(BASELINE_SYNC_SECONDS)
+        # an unloaded store was never changed, so there is nothing to save
+        if not loaded(baselines):
+            continue
+        try:
+            await run_in_threadpool(baselines.sync, BASELINE_PATH)
+        except Exception:  # unsaved data is kept for the next sync
+            logging.getLogger(__name__).exception("expense baseline sync failed")
+
+
+async def _warm_up(app: FastAPI):
+    t0 = time.perf_counter()
+    try:
+        await run_in_threadpool(warm, app.state.warmup_names, app.state.engines)
+    except Exception as e:
+        logging.getLogger(__name__).exception("engine warm-up failed")
+        app.state.warmup.update(status="failed", error=repr(e))
+    else:
+        app.state.warmup.update(status="done")
+    app.state.warmup["seconds"] = round(time.perf_counter() - t0, 3)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    state = app.state
+    consumer_task = asyncio.create_task(_consume_log(state.log_consumers)) if state.log_consumers else None
+    baseline_task = asyncio.create_task(_sync_baselines(state.baselines)) if BASELINE_PATH else None
+    warmup_task = None
+    if app.state.warmup_names != []:
+        app.state.warmup["status"] = "running"
+        warmup_task = asyncio.create_task(_warm_up(app))
+    app.state.started = True
+    yield
+    for task in (consumer_task, baseline_task, warmup_task):
+        if task:
+            task.cancel()
+    if BASELINE_PATH and loaded(state.baselines):
+        state.baselines.sync(BASELINE_PATH)
+
+
+# msgpack / Arrow / gzip / zstd request bodies and msgpack responses, see app/codecs.py. The
+# router only holds route definitions (include_router copies them into each app); handlers
+# reach their app's stores through request.app.state.
+router = APIRouter(route_class=NegotiatedRoute, default_response_class=NegotiatedResponse)
+
+
+def _backend_http_error(e: "backend_client.BackendError") -> HTTPException:
+    headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+    return HTTPException(status_code=e.status_code, detail=e.message, headers=headers)
+
+
+async def admission_rejected(request: Request, e: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Route '{e.route}' is saturated ({e.reason}). Retry later."},
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+@router.get("/health")
 def health():
-    return {"status": "ok"}
+    # liveness only; does not load the backend client just to report its circuits
+    circuits = backend_client.breaker_states() if loaded(backend_client) else {}
+    return {"status": "ok", "backend_circuits": circuits}
+
 
+@router.get("/ready")
+def ready(request: Request):
+    state = request.app.state
+    is_ready = getattr(state, "started", False) and state.warmup["status"] in ("off", "done")
+    body = {"status": "ready" if is_ready else "not_ready", "warmup": state.warmup,
+            "engines": engine_status(state.engines)}
+    return body if is_ready else JSONResponse(status_code=503, content=body)
+
+
+@router.get("/state/stats")
+def get_state_stats(request: Request):
+    return request.app.state.business_states.snapshot()
+
+
+@router.post("/state/{business_id}/invalidate")
+def invalidate_business_state(business_id: str, request: Request):
+    # call when new or amended transactions for the business are written elsewhere
+    request.app.state.business_states.invalidate(business_id)
+    return {"status": "success", "business_id": business_id}
+
+
+@router.get("/shadow/stats")
+def get_shadow_stats(request: Request):
+    return {name: shadow.stats() for name, shadow in request.app.state.shadows.items()}
+
+
+@router.post("/shadow/{name}/reset")
+def reset_shadow_stats(name: str, request: Request):
+    shadows = request.app.state.shadows
+    if name not in shadows:
+        raise HTTPException(status_code=404, detail=f"No shadowed route '{name}'")
+    shadows[name].reset()
+    return {"status": "success", "route": name}
+
+
+@router.get("/admission/stats")
+def get_admission_stats():
+    return admission_stats()
+
+
+# Every /run route goes through the admission layer (app/admission.py): its cost is estimated
+# from the payload row count and it is scheduled fairly per business_id before the sync work
+# is handed to the threadpool.
 
 # 1) Local Inventory Expiry Tracker (YOUR model)
-@app.post("/run/inventory-expiry")
-def run_inventory_expiry(req: InventoryExpiryRequest):
-    result = check_inventory_expiry(req.payload)
+def _inventory_expiry(payload, shadow):
+    # serial below PARALLEL_MIN_ITEMS, sharded across worker processes above it
+    result, seconds = timed(inventory_parallel.check_inventory_expiry_parallel, payload)
     if result.get("status") == "error":
         raise HTTPException(status_code=400, detail=result.get("message", "Invalid inventory input"))
+    shadow.observe(payload, result, seconds)
     return result
 
 
+@router.post("/run/inventory-expiry")
+async def run_inventory_expiry(req: InventoryExpiryRequest, request: Request,
+                               x_business_id: Optional[str] = Header(None)):
+    shadow = request.app.state.shadows["inventory-expiry"]
+    async with admit("inventory-expiry", tenant_of(req.payload, x_business_id), count_items(req.payload)):
+        return await run_in_threadpool(_inventory_expiry, req.payload, shadow)
+
+
 # 2) Forward inventory to DS backend
-@app.post("/run/inventory")
-def run_inventory(req: InventoryRequest):
-    payload = jsonable_encoder(req.payload)
+def _inventory(payload, deadline):
     try:
-        ds = post_inventory(payload)
-    except BackendError as e:
-        raise HTTPException(status_code=e.status_code, detail=e.message)
+        ds = backend_client.post_inventory(payload, deadline=deadline)
+    except backend_client.BackendError as e:
+        raise _backend_http_error(e)
     return {"posted_to_backend": True, "backend_response": ds}
 
 
-# 3) Cashflow: validate + summarize + send to DS backend
-@app.post("/run/cashflow")
-def run_cashflow(req: CashflowRequest):
-    txs = jsonable_encoder(req.transactions)
+@router.post("/run/inventory")
+async def run_inventory(req: InventoryRequest, x_request_deadline_ms: Optional[str] = Header(None),
+                        x_business_id: Optional[str] = Header(None)):
+    deadline = backend_client.deadline_from_header(x_request_deadline_ms)
+    payload = jsonable_encoder(req.payload)
+    async with admit("inventory", tenant_of(payload, x_business_id), count_items(payload)):
+        return await run_in_threadpool(_inventory, payload, deadline)
 
+
+# 3) Cashflow: validate + summarize + send to DS backend
+def _cashflow(txs, deadline, business_id, state):
     valid = []
     skipped = []
     for i, tx in enumerate(txs):
-        ok, msg = validate_transaction(tx, i)
+        ok, msg = cashflow_logic.validate_transaction(tx, i)
         if ok:
             valid.append(tx)
         else:
@@ -53,46 +260,297 @@ def run_cashflow(req: CashflowRequest):
     if not valid:
         raise HTTPException(status_code=400, detail={"message": "No valid transactions", "skipped": skipped})
 
-    summary = summarize_cashflow(valid)
+    if business_id == "anonymous":
+        derived = business_state.build_cashflow_state(valid)
+    else:
+        derived, _ = state.business_states.get_or_build(business_id, business_state.CASHFLOW, valid)
+    summary = derived["summary"]
+    if state.transaction_log:
+        try:
+            state.transaction_log.append_new([txlog.normalise(tx, business_id) for tx in valid])
+        except Exception:
+            # the log feeds background consumers; it must never fail the request itself
+            logging.getLogger(__name__).exception("transaction log append failed")
     ds_payload = {"transactions": valid, "summary": summary}
 
     try:
-        ds = post_cashflow(ds_payload)
-    except BackendError as e:
-        raise HTTPException(status_code=e.status_code, detail=e.message)
+        ds = backend_client.post_cashflow(ds_payload, deadline=deadline)
+    except backend_client.BackendError as e:
+        raise _backend_http_error(e)
 
     return {
         "posted_to_backend": True,
         "local_summary": summary,
+        "risk_inputs": derived["risk_inputs"],
         "skipped_transactions": skipped,
         "backend_response": ds,
     }
 
 
+@router.post("/run/cashflow")
+async def run_cashflow(req: CashflowRequest, request: Request, x_request_deadline_ms: Optional[str] = Header(None),
+                       x_business_id: Optional[str] = Header(None)):
+    deadline = backend_client.deadline_from_header(x_request_deadline_ms)
+    txs = jsonable_encoder(req.transactions)
+    tenant = tenant_of(txs, x_business_id)
+    async with admit("cashflow", tenant, len(txs)):
+        return await run_in_threadpool(_cashflow, txs, deadline, tenant, request.app.state)
+
+
 # 4A) Expense anomalies - LOCAL model (instant result)
-@app.post("/run/anomalies-local")
-def run_anomalies_local(req: AnomalyRequest):
+def _anomalies_local(payload, business_id, state):
+    ok, msg = expense_anomaly.validate_expense_payload(payload)
+    if not ok:
+        raise HTTPException(status_code=400, detail=msg)
+
+    if business_id == "anonymous":
+        how = "miss"
+        result, seconds = timed(expense_anomaly.detect_expense_anomalies, payload)
+    else:
+        (result, how), seconds = timed(state.business_states.get_or_build, business_id,
+                                       business_state.ANOMALIES, expense_anomaly.get_expenses(payload))
+    if how == "miss":
+        # only full computations are shadowed, not cache hits or incremental folds
+        state.shadows["anomalies-local"].observe(payload, result, seconds)
+    return result
+
+
+@router.post("/run/anomalies-local")
+async def run_anomalies_local(req: AnomalyRequest, request: Request, x_business_id: Optional[str] = Header(None)):
     payload = jsonable_encoder(req.payload)
+    tenant = tenant_of(payload, x_business_id)
+    async with admit("anomalies-local", tenant, count_items(payload)):
+        return await run_in_threadpool(_anomalies_local, payload, tenant, request.app.state)
+
 
-    ok, msg = validate_expense_payload(payload)
+# 4B) Expense anomalies - Forward to DS backend
+def _anomalies(payload, deadline):
+    ok, msg = expense_anomaly.validate_expense_payload(payload)
     if not ok:
         raise HTTPException(status_code=400, detail=msg)
 
-    return detect_expense_anomalies(payload)
+    try:
+        ds = backend_client.post_anomalies(payload, deadline=deadline)
+    except backend_client.BackendError as e:
+        raise _backend_http_error(e)
+
+    return {"posted_to_backend": True, "backend_response": ds}
 
 
-# 4B) Expense anomalies - Forward to DS backend
-@app.post("/run/anomalies")
-def run_anomalies(req: AnomalyRequest):
+@router.post("/run/anomalies")
+async def run_anomalies(req: AnomalyRequest, x_request_deadline_ms: Optional[str] = Header(None),
+                        x_business_id: Optional[str] = Header(None)):
+    deadline = backend_client.deadline_from_header(x_request_deadline_ms)
     payload = jsonable_encoder(req.payload)
+    async with admit("anomalies", tenant_of(payload, x_business_id), count_items(payload)):
+        return await run_in_threadpool(_anomalies, payload, deadline)
+
 
-    ok, msg = validate_expense_payload(payload)
+# 4C) Expense anomalies - LOCAL, per-group baselines (rows for the expense_anomalies table)
+def _anomalies_grouped(payload, group_by):
+    ok, msg = expense_anomaly.validate_expense_payload(payload)
     if not ok:
         raise HTTPException(status_code=400, detail=msg)
 
+    return expense_anomaly.detect_expense_anomalies_grouped(payload, group_by=group_by)
+
+
+@router.post("/run/anomalies-grouped")
+async def run_anomalies_grouped(req: AnomalyRequest, group_by: str = Query("business_id,category"),
+                                x_business_id: Optional[str] = Header(None)):
+    payload = jsonable_encoder(req.payload)
+    fields = tuple(f.strip() for f in group_by.split(",") if f.strip())
+    if not fields:
+        raise HTTPException(status_code=400, detail="group_by must name at least one field")
+    async with admit("anomalies-grouped", tenant_of(payload, x_business_id), count_items(payload)):
+        return await run_in_threadpool(_anomalies_grouped, payload, fields)
+
+
+# 4D) Expense anomalies - LOCAL, scored against the stored per-business/category baseline.
+# Only the new expenses are sent; they are folded into the baseline after scoring.
+def _anomalies_baseline(payload, update, baselines):
+    ok, msg = expense_anomaly.validate_expense_payload(payload)
+    if not ok:
+        raise HTTPException(status_code=400, detail=msg)
+
+    expenses = expense_anomaly.get_expenses(payload)
+    rows = baselines.score(expenses)
+    if update:
+        baselines.update(expenses)
+
+    return {
+        "status": "success",
+        "summary": {
+            "count": len(rows),
+            "anomalies": sum(1 for r in rows if r["anomaly_level"] != "Normal"),
+            "method": "sketch-robust-mad-zscore",
+            "baseline_updated": update,
+        },
+        "rows": rows,
+        "anomalies": [r for r in rows if r["anomaly_level"] != "Normal"],
+    }
+
+
+@router.post("/run/anomalies-baseline")
+async def run_anomalies_baseline(req: AnomalyRequest, request: Request, update: bool = Query(True),
+                                 x_business_id: Optional[str] = Header(None)):
+    payload = jsonable_encoder(req.payload)
+    baselines = request.app.state.baselines
+    async with admit("anomalies-baseline", tenant_of(payload, x_business_id), count_items(payload)):
+        return await run_in_threadpool(_anomalies_baseline, payload, update, baselines)
+
+
+@router.get("/baselines/expenses")
+def export_baselines(request: Request):
+    return request.app.state.baselines.to_dict()
+
+
+@router.post("/baselines/expenses/merge")
+def merge_baselines(body: Dict[str, Any], request: Request):
+    # body is a GET /baselines/expenses export from a process that does not share
+    # HARVESTAI_BASELINE_PATH; posting the same export again is a no-op
+    if not body.get("export_id"):
+        raise HTTPException(status_code=400, detail="Export has no export_id; re-export it with GET /baselines/expenses")
     try:
-        ds = post_anomalies(payload)
-    except BackendError as e:
-        raise HTTPException(status_code=e.status_code, detail=e.message)
+        export = expense_baseline.ExpenseBaselineStore.from_dict(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    baselines = request.app.state.baselines
+    merged = baselines.merge(export, export_id=str(body["export_id"]))
+    return {"status": "success" if merged else "already_merged", "baselines": len(baselines)}
+
+
+# 5) Delta inventory sync: clients send only upserts/deletes keyed by item_id against the
+# version they last saw; classification and totals are updated incrementally.
+def _inventory_sync(req: InventorySyncRequest, inventory_snapshots):
+    current_date = None
+    if req.current_date is not None:
+        try:
+            current_date = datetime.fromisoformat(req.current_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid current_date format: '{req.current_date}'.")
+
+    for i, item in enumerate(req.upserts):
+        if "item_id" not in item:
+            raise HTTPException(status_code=400, detail=f"Upsert at index {i} is missing 'item_id'")
+
+    try:
+        return inventory_snapshots.apply_delta(
+            req.business_id, req.base_version, req.upserts, req.deletes,
+            current_date=current_date, replace=req.replace,
+        )
+    except inventory_snapshot.VersionConflict as e:
+        raise HTTPException(status_code=409, detail={
+            "message": str(e),
+            "current_version": e.current_version,
+            "resync_required": True,
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/sync/inventory")
+async def sync_inventory(req: InventorySyncRequest, request: Request):
+    items = len(req.upserts) + len(req.deletes)
+    async with admit("inventory-sync", req.business_id, items):
+        return await run_in_threadpool(_inventory_sync, req, request.app.state.inventory_snapshots)
+
+
+@router.get("/sync/inventory/{business_id}")
+def get_inventory_snapshot(business_id: str, request: Request):
+    snap = request.app.state.inventory_snapshots.get(business_id)
+    if snap is None or snap.current_date is None:
+        raise HTTPException(status_code=404, detail=f"No inventory snapshot for business '{business_id}'")
+    with snap.lock:
+        return {"business_id": business_id, "version": snap.token, **snap.full_result()}
+
+
+# 6) Cashflow runway: Monte Carlo distribution of days until the balance drops below min_cash_buffer
+def _runway(req: RunwayRequest):
+    result = runway_simulator.simulate_runway_from_transactions(
+        req.transactions, current_balance=req.current_balance, min_cash_buffer=req.min_cash_buffer,
+        paths=req.paths, horizon_days=req.horizon_days, method=req.method, seed=req.seed,
+    )
+    if result.get("status") == "error":
+        raise HTTPException(status_code=400, detail=result.get("message", "Invalid runway input"))
+    return {"business_id": req.business_id, **result}
+
+
+@router.post("/run/cashflow-runway")
+async def run_cashflow_runway(req: RunwayRequest, x_business_id: Optional[str] = Header(None)):
+    items = len(req.transactions) + simulation_items(req.paths, req.horizon_days)
+    async with admit("cashflow-runway", x_business_id or req.business_id or "anonymous", items):
+        return await run_in_threadpool(_runway, req)
+
+
+def _runway_batch(req: RunwayBatchRequest):
+    results = runway_simulator.simulate_runway_batch(
+        [b.model_dump() for b in req.businesses],
+        paths=req.paths, horizon_days=req.horizon_days, method=req.method, seed=req.seed,
+    )
+    return {"status": "success", "count": len(results), "results": results}
+
+
+@router.post("/run/cashflow-runway/batch")
+async def run_cashflow_runway_batch(req: RunwayBatchRequest, x_business_id: Optional[str] = Header(None)):
+    items = sum(len(b.transactions) for b in req.businesses)
+    items += len(req.businesses) * simulation_items(req.paths, req.horizon_days)
+    async with admit("cashflow-runway", x_business_id or "batch", items):
+        return await run_in_threadpool(_runway_batch, req)
+
+
+# 7) Transaction log: consumer offsets / lag, replay, and the consumers' per-business views
+def _require_log(request: Request):
+    log_consumers = request.app.state.log_consumers
+    if log_consumers is None:
+        raise HTTPException(status_code=404, detail="Transaction log is disabled (set HARVESTAI_TXLOG_DIR).")
+    return log_consumers
+
+
+@router.get("/txlog/stats")
+def txlog_stats(request: Request):
+    return _require_log(request).stats()
+
+
+@router.post("/txlog/consumers/{name}/replay")
+def txlog_replay(name: str, request: Request, from_offset: int = Query(0, ge=0)):
+    runner = _require_log(request)
+    if name not in runner.consumers:
+        raise HTTPException(status_code=404, detail=f"Unknown consumer '{name}'")
+    runner.replay(name, from_offset)
+    return {"status": "success", "consumer": name, "offset": from_offset}
+
+
+@router.get("/txlog/businesses/{business_id}")
+def txlog_business(business_id: str, request: Request):
+    runner = _require_log(request)
+    rollup = runner.consumer("rollups").view(business_id)
+    if rollup is None:
+        raise HTTPException(status_code=404, detail=f"No logged transactions for business '{business_id}'")
+    return {
+        "business_id": business_id,
+        "rollup": rollup,
+        "risk_inputs": runner.consumer("cashflow_risk").view(business_id),
+        "expense_baselines": runner.consumer("expense_baselines").view(business_id),
+        "offsets": runner.offsets(),
+    }
+
+
+def create_app(warmup: Optional[str] = None) -> FastAPI:
+    """The API, with engines loaded lazily. warmup ("all", "name,name" or "") overrides
+    HARVESTAI_WARMUP: engines to load in the background after startup; /ready waits for them."""
+    app = FastAPI(title="harvestAi Integration API", version="1.0.0", lifespan=lifespan,
+                  default_response_class=NegotiatedResponse)
+    _build_state(app)
+    names = warmup_names(WARMUP if warmup is None else warmup, app.state.engines)
+    app.state.started = False
+    app.state.warmup_names = names
+    app.state.warmup = {"status": "off" if names == [] else "pending",
+                        "engines": "all" if names is None else names, "seconds": None}
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+    app.add_exception_handler(AdmissionRejected, admission_rejected)
+    app.include_router(router)
+    return app
+
 
-    return {"posted_to_backend": True, "backend_response": ds}
\ No newline at end of file
+app = create_app()
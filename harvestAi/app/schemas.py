@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Any, Dict, List
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Union
 
 
 class InventoryExpiryRequest(BaseModel):
@@ -19,4 +19,38 @@ class CashflowRequest(BaseModel):
 
 class AnomalyRequest(BaseModel):
     # accepts {"expenses":[...]} or {"data":{"expenses":[...]}}
-    payload: Dict[str, Any]
\ No newline at end of file
+    payload: Dict[str, Any]
+
+
+class InventorySyncRequest(BaseModel):
+    # delta against the server-side snapshot; see app/logic/inventory_snapshot.py
+    business_id: str
+    base_version: Union[str, int, None] = None   # the "version" token of the last response
+    upserts: List[Dict[str, Any]] = []
+    deletes: List[Any] = []
+    current_date: Optional[str] = None
+    replace: bool = False
+
+
+class RunwayBusiness(BaseModel):
+    business_id: Optional[str] = None
+    transactions: List[Dict[str, Any]]
+    current_balance: Optional[float] = None   # defaults to the latest transaction's current_balance
+    min_cash_buffer: float = 0.0
+
+
+class RunwayRequest(RunwayBusiness):
+    # Monte Carlo days-until-broke; see app/logic/runway_simulator.py
+    paths: int = Field(10000, ge=100, le=100000)
+    horizon_days: int = Field(180, ge=7, le=730)
+    method: str = "bootstrap"                  # or "normal"
+    seed: Optional[int] = None
+
+
+class RunwayBatchRequest(BaseModel):
+    # simulation settings are shared by every business in the batch
+    businesses: List[RunwayBusiness]
+    paths: int = Field(10000, ge=100, le=100000)
+    horizon_days: int = Field(180, ge=7, le=730)
+    method: str = "bootstrap"
+    seed: Optional[int] = None
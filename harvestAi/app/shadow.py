@@ -0,0 +1,235 @@
+'''
+Shadow execution: run a candidate engine next to the primary one on sampled live requests.
+
+For each shadowed route, a candidate implementation is named by a dotted path in an env var:
+
+    HARVESTAI_SHADOW_INVENTORY_EXPIRY=app.logic.inventory_expiry_tracker:check_inventory_expiry
+    HARVESTAI_SHADOW_ANOMALIES_LOCAL=mypkg.fast_anomalies:detect_expense_anomalies
+
+("module:function" or "module.function"). A route with no candidate is not shadowed.
+
+- HARVESTAI_SHADOW_SAMPLE_RATE (default 0.05) of the requests that actually run the primary
+  engine are copied to a small background thread pool.
+- The candidate runs there after the primary result is already on its way to the client, so
+  it never adds latency to the response.
+- If more than HARVESTAI_SHADOW_MAX_PENDING shadow runs are already queued, the sample is
+  dropped instead of queued.
+
+Outputs are diffed recursively:
+- numbers match within HARVESTAI_SHADOW_ABS_TOL / HARVESTAI_SHADOW_REL_TOL
+- lists are compared by position
+- volatile keys (timestamp) are ignored
+
+The latency ratio compares the candidate's run time with the primary's. Both run in this
+process, so load on the shared CPU skews single samples; read the percentiles, not one run.
+GET /shadow/stats reports mismatch counts, recent mismatch paths and speedup percentiles.
+'''
+import copy
+import importlib
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+SAMPLE_RATE = float(os.getenv("HARVESTAI_SHADOW_SAMPLE_RATE", "0.05"))
+ABS_TOL = float(os.getenv("HARVESTAI_SHADOW_ABS_TOL", "0.01"))
+REL_TOL = float(os.getenv("HARVESTAI_SHADOW_REL_TOL", "1e-6"))
+MAX_PENDING = int(os.getenv("HARVESTAI_SHADOW_MAX_PENDING", "4"))
+WORKERS = int(os.getenv("HARVESTAI_SHADOW_WORKERS", "1"))
+
+IGNORED_KEYS = frozenset({"timestamp"})
+MAX_DIFF_PATHS = 20
+RECENT = 1000            # latency ratios kept for percentiles
+RECENT_MISMATCHES = 10
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="shadow")
+        return _EXECUTOR
+
+
+def load_engine(path: str) -> Callable[..., Any]:
+    """'pkg.module:function' or 'pkg.module.function' -> the callable."""
+    module_name, sep, attr = path.partition(":")
+    if not sep:
+        module_name, _, attr = path.rpartition(".")
+    if not module_name or not attr:
+        raise ValueError(f"Not a dotted path to a callable: '{path}'")
+    fn = getattr(importlib.import_module(module_name), attr)
+    if not callable(fn):
+        raise ValueError(f"'{path}' is not callable")
+    return fn
+
+
+# -------------------------
+# DIFF
+# -------------------------
+def diff(primary: Any, candidate: Any, abs_tol: float = ABS_TOL, rel_tol: float = REL_TOL,
+         path: str = "$", out: Optional[List[str]] = None) -> List[str]:
+    """Paths where the two outputs differ beyond tolerance (at most MAX_DIFF_PATHS)."""
+    out = [] if out is None else out
+    if len(out) >= MAX_DIFF_PATHS:
+        return out
+
+    if isinstance(primary, dict) and isinstance(candidate, dict):
+        for key in sorted(primary.keys() | candidate.keys(), key=str):
+            if key in IGNORED_KEYS:
+                continue
+            if key not in primary or key not in candidate:
+                out.append(f"{path}.{key} (missing in {'candidate' if key in primary else 'primary'})")
+            else:
+                diff(primary[key], candidate[key], abs_tol, rel_tol, f"{path}.{key}", out)
+    elif isinstance(primary, list) and isinstance(candidate, list):
+        if len(primary) != len(candidate):
+            out.append(f"{path} (length {len(primary)} != {len(candidate)})")
+        for i, (a, b) in enumerate(zip(primary, candidate)):
+            diff(a, b, abs_tol, rel_tol, f"{path}[{i}]", out)
+    elif (isinstance(primary, (int, float)) and isinstance(candidate, (int, float))
+          and not isinstance(primary, bool) and not isinstance(candidate, bool)):
+        if not math.isclose(primary, candidate, rel_tol=rel_tol, abs_tol=abs_tol):
+            out.append(f"{path} ({primary!r} != {candidate!r})")
+    elif primary != candidate:
+        out.append(f"{path} ({primary!r} != {candidate!r})")
+    return out[:MAX_DIFF_PATHS]
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+
+# -------------------------
+# SHADOW
+# -------------------------
+class Shadow:
+    """Shadows one route. prepare(payload, primary_result) builds the candidate's input, e.g.
+    pinning the reference date the primary used."""
+
+    def __init__(self, name: str, candidate: Optional[Callable[..., Any]], candidate_path: Optional[str] = None,
+                 sample_rate: float = SAMPLE_RATE,
+                 prepare: Optional[Callable[[Any, Any], Any]] = None):
+        self.name = name
+        self.candidate = candidate
+        self.candidate_path = candidate_path
+        self.sample_rate = sample_rate
+        self.prepare = prepare
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.reset()
+
+    @classmethod
+    def from_env(cls, name: str, env_var: str, **kwargs) -> "Shadow":
+        # the candidate is imported by the first shadow run, off the response path
+        return cls(name, None, candidate_path=os.getenv(env_var), **kwargs)
+
+    @property
+    def enabled(self) -> bool:
+        return (self.candidate is not None or bool(self.candidate_path)) and self.sample_rate > 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = {"sampled": 0, "compared": 0, "matched": 0, "mismatched": 0,
+                           "candidate_errors": 0, "dropped": 0}
+            self.primary_seconds = 0.0
+            self.candidate_seconds = 0.0
+            self.speedups: Deque[float] = deque(maxlen=RECENT)
+            self.mismatches: Deque[Dict[str, Any]] = deque(maxlen=RECENT_MISMATCHES)
+
+    def observe(self, payload: Any, primary_result: Any, primary_seconds: float) -> None:
+        """Called after the primary engine ran; maybe schedules a shadow run. Never raises."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= MAX_PENDING:
+                self.counts["dropped"] += 1
+                return
+            self._pending += 1
+            self.counts["sampled"] += 1
+        try:
+            _executor().submit(self._run, payload, primary_result, primary_seconds)
+        except RuntimeError:     # interpreter shutting down
+            with self._lock:
+                self._pending -= 1
+
+    def _run(self, payload: Any, primary_result: Any, primary_seconds: float) -> None:
+        try:
+            data = copy.deepcopy(payload)
+            if self.prepare is not None:
+                data = self.prepare(data, primary_result)
+            t0 = time.perf_counter()
+            try:
+                if self.candidate is None:
+                    self.candidate = load_engine(self.candidate_path)
+                    t0 = time.perf_counter()
+                result = self.candidate(data)
+            except Exception as e:
+                with self._lock:
+                    self.counts["candidate_errors"] += 1
+                    self.mismatches.append({"error": repr(e)})
+                return
+            seconds = time.perf_counter() - t0
+            paths = diff(primary_result, result)
+            with self._lock:
+                self.counts["compared"] += 1
+                self.primary_seconds += primary_seconds
+                self.candidate_seconds += seconds
+                if seconds > 0:
+                    self.speedups.append(primary_seconds / seconds)
+                if paths:
+                    self.counts["mismatched"] += 1
+                    self.mismatches.append({"paths": paths})
+                else:
+                    self.counts["matched"] += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            speedups = list(self.speedups)
+            compared = self.counts["compared"]
+            return {
+                "enabled": self.enabled,
+                "candidate": self.candidate_path,
+                "sample_rate": self.sample_rate,
+                **self.counts,
+                "pending": self._pending,
+                "mismatch_rate": round(self.counts["mismatched"] / compared, 4) if compared else None,
+                "speedup": {
+                    "total": round(self.primary_seconds / self.candidate_seconds, 4) if self.candidate_seconds else None,
+                    "p10": _percentile(speedups, 0.10),
+                    "p50": _percentile(speedups, 0.50),
+                    "p90": _percentile(speedups, 0.90),
+                },
+                "recent_mismatches": list(self.mismatches),
+                "tolerance": {"abs": ABS_TOL, "rel": REL_TOL},
+            }
+
+
+def pin_inventory_date(payload: Any, primary_result: Dict[str, Any]) -> Any:
+    """Inventory requests without current_date use datetime.now(); give the candidate the date
+    the primary used so days_until_expiry cannot drift between the two runs."""
+    if isinstance(payload, list):
+        return {"inventory": payload, "current_date": primary_result.get("timestamp")}
+    if isinstance(payload, dict) and "current_date" not in payload and primary_result.get("timestamp"):
+        return {**payload, "current_date": primary_result["timestamp"]}
+    return payload
+
+
+def timed(fn: Callable[..., Any], *args, **kwargs):
+    """(result, seconds) for one call of fn."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
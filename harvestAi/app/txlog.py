@@ -0,0 +1,432 @@
+'''
+Append-only local transaction log with offset-tracking consumers.
+
+/run/cashflow appends every valid transaction here. Each one is parsed once at append time
+(date -> day, amount -> kobo, type lower-cased). Every downstream model then reads the
+normalised record instead of re-parsing the raw request.
+
+Layout under HARVESTAI_TXLOG_DIR:
+
+    segments/<base offset, 20 digits>.log   JSON lines, one record per line, each with its offset "o"
+    consumers.db                            consumer offsets and state rows (sqlite, see ConsumerStore)
+    append.lock / consumers.lock            flock files
+
+- Offsets are record sequence numbers. A segment rolls over after SEGMENT_RECORDS records.
+- Appends from several uvicorn workers are serialised with flock. A half-written trailing line
+  left by a crash is truncated the next time the log is appended to.
+- Consumers are run by one process: whichever worker takes consumers.lock. Each poll reads from
+  the committed offset, applies the batch, and then commits the state rows it touched together
+  with the offset, so a crash re-applies at most the uncommitted batch. Consumers are idempotent
+  per transaction_id, so re-applying does no harm.
+- replay(name, from_offset) clears a consumer and rebuilds it from any offset, e.g. after a
+  logic change. Any worker may call it.
+'''
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.logic.money import to_kobo
+
+TXLOG_DIR = os.getenv("HARVESTAI_TXLOG_DIR")
+SEGMENT_RECORDS = int(os.getenv("HARVESTAI_TXLOG_SEGMENT_RECORDS", "100000"))
+FSYNC = os.getenv("HARVESTAI_TXLOG_FSYNC", "0") == "1"
+POLL_SECONDS = float(os.getenv("HARVESTAI_TXLOG_POLL_SECONDS", "1.0"))
+POLL_BATCH = 50000
+DEDUP_MAX = int(os.getenv("HARVESTAI_TXLOG_DEDUP_MAX", "1000000"))
+
+
+def _balance_kobo(balance: Any) -> Optional[int]:
+    # validate_transaction only requires the field to be present: "" or "N/A" get through
+    try:
+        return to_kobo(balance) if balance is not None else None
+    except (TypeError, ValueError, ArithmeticError):
+        return None
+
+
+def normalise(tx: Dict[str, Any], business_id: str) -> Dict[str, Any]:
+    """The parsed form every consumer reads (transactions are assumed validated already)."""
+    ts = datetime.fromisoformat(str(tx["date"]).replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.replace(tzinfo=None)
+    return {
+        "b": str(tx.get("business_id") or business_id),
+        "id": tx.get("transaction_id"),
+        "ts": ts.isoformat(),
+        "day": ts.date().isoformat(),
+        "type": str(tx["type"]).lower(),
+        "kobo": to_kobo(tx["amount"]),
+        "cat": str(tx.get("category") or "unknown"),
+        "bal": _balance_kobo(tx.get("current_balance")),
+    }
+
+
+class _FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+# -------------------------
+# LOG
+# -------------------------
+class TransactionLog:
+    def __init__(self, root: str, segment_records: int = SEGMENT_RECORDS):
+        self.root = root
+        self.segment_records = segment_records
+        self.segment_dir = os.path.join(root, "segments")
+        os.makedirs(self.segment_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # writer's view of the active segment: (base offset, bytes, records); re-checked under flock
+        self._active: Optional[Tuple[int, int, int]] = None
+        # reader positions: next offset -> (segment base, byte position)
+        self._positions: Dict[int, Tuple[int, int]] = {}
+        # (business, transaction_id) -> record this process last appended, for append_new
+        self._recent: "OrderedDict[Tuple[str, Any], Dict[str, Any]]" = OrderedDict()
+
+    def _segment_path(self, base: int) -> str:
+        return os.path.join(self.segment_dir, f"{base:020d}.log")
+
+    def segments(self) -> List[int]:
+        return sorted(int(n[:-4]) for n in os.listdir(self.segment_dir) if n.endswith(".log"))
+
+    def _sync_active(self) -> Tuple[int, int, int]:
+        """Bring the cached (base, size, records) up to date with the files (other processes may
+        have appended or rolled). Truncates a torn trailing line."""
+        bases = self.segments()
+        if not bases:
+            return 0, 0, 0
+        base = bases[-1]
+        path = self._segment_path(base)
+        size = os.path.getsize(path)
+        if self._active and self._active[0] == base and self._active[1] == size:
+            return self._active
+
+        start, records = (self._active[1], self._active[2]) if self._active and self._active[0] == base else (0, 0)
+        with open(path, "rb+") as f:
+            f.seek(start)
+            tail = f.read()
+            complete = tail.rfind(b"\n") + 1
+            if complete < len(tail):
+                f.truncate(start + complete)
+                size = start + complete
+            records += tail.count(b"\n", 0, complete)
+        return base, size, records
+
+    def append(self, records: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+        """Append normalised records; returns [first, last + 1) offsets."""
+        records = list(records)
+        with self._lock, _FileLock(os.path.join(self.root, "append.lock")):
+            base, size, count = self._sync_active()
+            first = base + count
+            offset = first
+            pending = records
+            while pending:
+                if count >= self.segment_records:
+                    base, size, count = offset, 0, 0
+                room = self.segment_records - count
+                chunk, pending = pending[:room], pending[room:]
+                lines = []
+                for r in chunk:
+                    lines.append(json.dumps({"o": offset, **r}, separators=(",", ":")))
+                    offset += 1
+                data = ("\n".join(lines) + "\n").encode()
+                with open(self._segment_path(base), "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    if FSYNC:
+                        os.fsync(f.fileno())
+                size += len(data)
+                count += len(chunk)
+            self._active = (base, size, count)
+        return first, offset
+
+    def append_new(self, records: Iterable[Dict[str, Any]]) -> Tuple[int, int, int]:
+        """append() minus records this process already appended unchanged (clients resend
+        their whole window on every call). Returns (first, end, skipped). Best effort only:
+        the consumers are idempotent per transaction_id anyway."""
+        fresh, skipped = [], 0
+        with self._lock:
+            for r in records:
+                key = (r["b"], r["id"])
+                if r["id"] is not None and self._recent.get(key) == r:
+                    skipped += 1
+                    continue
+                fresh.append(r)
+                if r["id"] is not None:
+                    self._recent[key] = r
+                    self._recent.move_to_end(key)
+            while len(self._recent) > DEDUP_MAX:
+                self._recent.popitem(last=False)
+        if not fresh:
+            end = self.end_offset()
+            return end, end, skipped
+        first, end = self.append(fresh)
+        return first, end, skipped
+
+    def end_offset(self) -> int:
+        with self._lock, _FileLock(os.path.join(self.root, "append.lock")):
+            self._active = self._sync_active()
+            return self._active[0] + self._active[2]
+
+    def read(self, from_offset: int, max_records: int = POLL_BATCH) -> List[Dict[str, Any]]:
+        """Up to max_records records starting at from_offset (fewer at the end of the log)."""
+        out: List[Dict[str, Any]] = []
+        bases = self.segments()
+        offset = from_offset
+        while len(out) < max_records:
+            candidates = [b for b in bases if b <= offset]
+            if not candidates:
+                break
+            base = candidates[-1]
+            pos = self._positions.get(offset)
+            with open(self._segment_path(base), "rb") as f:
+                if pos and pos[0] == base:
+                    f.seek(pos[1])
+                else:
+                    for _ in range(offset - base):
+                        if not f.readline():
+                            break
+                got = 0
+                position = f.tell()
+                while len(out) < max_records:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break   # end of segment, or a line still being written
+                    out.append(json.loads(line))
+                    got += 1
+                    position += len(line)
+                offset += got
+                self._positions[offset] = (base, position)
+                while len(self._positions) > 32:
+                    self._positions.pop(next(iter(self._positions)))
+            if got == 0:
+                # nothing complete past offset in the segment holding it (the end of the log, or
+                # a line still being written); a later segment would have been picked above
+                break
+        return out
+
+
+# -------------------------
+# CONSUMERS
+# -------------------------
+def state_key(*parts: Any) -> str:
+    """Key for a consumer state row, e.g. state_key("tx", business_id, transaction_id)."""
+    return json.dumps(parts, separators=(",", ":"))
+
+
+def state_prefix(*parts: Any) -> str:
+    """Prefix matching every state_key(*parts, ...) (and nothing else)."""
+    return state_key(*parts)[:-1] + ","
+
+
+class ConsumerStore:
+    """Consumer offsets and key -> JSON state rows in one sqlite file shared by all workers.
+
+    A poll writes only the rows its batch touched, in the same transaction as the new offset,
+    so a commit costs O(batch) no matter how long the history is. replay() bumps the consumer's
+    epoch; a commit from a batch read under an older epoch is discarded, so a replay requested
+    on any worker can't be overwritten by the leader's in-flight poll.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS consumer_offsets"
+            " (name TEXT PRIMARY KEY, offset INTEGER NOT NULL, epoch INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS consumer_state"
+            " (name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (name, key)) WITHOUT ROWID"
+        )
+
+    def position(self, name: str) -> Tuple[int, int]:
+        """(offset, epoch)."""
+        with self._lock:
+            row = self._conn.execute("SELECT offset, epoch FROM consumer_offsets WHERE name = ?", (name,)).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def get(self, name: str, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM consumer_state WHERE name = ? AND key = ?",
+                                     (name, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def scan(self, name: str, prefix: str) -> List[Tuple[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM consumer_state WHERE name = ? AND key >= ? AND key < ? ORDER BY key",
+                (name, prefix, prefix + "\uffff"),
+            ).fetchall()
+        return [(k, json.loads(v)) for k, v in rows]
+
+    def commit(self, name: str, epoch: int, offset: int, writes: Dict[str, Any]) -> bool:
+        """Apply a batch's writes (value None deletes) and advance the offset, unless the
+        consumer was replayed since the batch was read. Returns whether it was applied."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT epoch FROM consumer_offsets WHERE name = ?", (name,)).fetchone()
+                if (row[0] if row else 0) != epoch:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.executemany(
+                    "DELETE FROM consumer_state WHERE name = ? AND key = ?",
+                    [(name, k) for k, v in writes.items() if v is None],
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO consumer_state (name, key, value) VALUES (?, ?, ?)",
+                    [(name, k, json.dumps(v, separators=(",", ":"))) for k, v in writes.items() if v is not None],
+                )
+                self._conn.execute(
+                    "INSERT INTO consumer_offsets (name, offset, epoch) VALUES (?, ?, ?)"
+                    " ON CONFLICT(name) DO UPDATE SET offset = excluded.offset",
+                    (name, offset, epoch),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def reset(self, name: str, offset: int) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM consumer_state WHERE name = ?", (name,))
+                self._conn.execute(
+                    "INSERT INTO consumer_offsets (name, offset, epoch) VALUES (?, ?, 1)"
+                    " ON CONFLICT(name) DO UPDATE SET offset = excluded.offset, epoch = epoch + 1",
+                    (name, offset),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class ConsumerState:
+    """One consumer's view of the store during a poll: reads see the batch's own pending
+    writes, and nothing reaches the file until the runner commits."""
+
+    def __init__(self, store: ConsumerStore, name: str):
+        self.store = store
+        self.name = name
+        self.pending: Dict[str, Any] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.pending:
+            value = self.pending[key]
+        else:
+            value = self.store.get(self.name, key)
+        return default if value is None else value
+
+    def put(self, key: str, value: Any) -> None:
+        self.pending[key] = value
+
+    def delete(self, key: str) -> None:
+        self.pending[key] = None
+
+    def scan(self, prefix: str) -> List[Tuple[str, Any]]:
+        """Committed rows under prefix (pending writes are not included)."""
+        return self.store.scan(self.name, prefix)
+
+
+class Consumer:
+    """Base class: apply() folds a batch of records into self.state (a ConsumerState); view()
+    reads one business back. State lives in the ConsumerStore, not in memory."""
+
+    name = "consumer"
+    state: ConsumerState
+
+    def apply(self, records: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def view(self, business_id: str) -> Any:
+        raise NotImplementedError
+
+
+class ConsumerRunner:
+    def __init__(self, log: TransactionLog, consumers: List[Consumer]):
+        self.log = log
+        self.consumers = {c.name: c for c in consumers}
+        self.store = ConsumerStore(os.path.join(log.root, "consumers.db"))
+        self._lock = threading.Lock()
+        self._leader_fd: Optional[int] = None
+        for c in consumers:
+            c.state = ConsumerState(self.store, c.name)
+
+    def is_leader(self) -> bool:
+        """Only one process runs the consumers; the first to take consumers.lock keeps it."""
+        if self._leader_fd is None:
+            fd = os.open(os.path.join(self.log.root, "consumers.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._leader_fd = fd
+        return True
+
+    def poll(self, max_records: int = POLL_BATCH) -> Dict[str, int]:
+        """Advance every consumer by up to max_records; returns records applied per consumer."""
+        if not self.is_leader():
+            return {}
+        applied = {}
+        with self._lock:
+            for c in self.consumers.values():
+                # offset and epoch come from the file each time, so a replay from any worker is seen
+                offset, epoch = self.store.position(c.name)
+                batch = self.log.read(offset, max_records)
+                applied[c.name] = 0
+                if not batch:
+                    continue
+                c.state.pending = {}
+                try:
+                    c.apply(batch)
+                    if self.store.commit(c.name, epoch, batch[-1]["o"] + 1, c.state.pending):
+                        applied[c.name] = len(batch)
+                finally:
+                    c.state.pending = {}
+        return applied
+
+    def drain(self) -> None:
+        while any(self.poll().values()):
+            pass
+
+    def replay(self, name: str, from_offset: int = 0) -> None:
+        """Forget a consumer's state and re-consume from from_offset on the next polls. Safe to
+        call from any worker: the leader discards a batch it was applying when this lands."""
+        self.store.reset(name, max(0, from_offset))
+
+    def consumer(self, name: str) -> Consumer:
+        return self.consumers[name]
+
+    def offsets(self) -> Dict[str, int]:
+        return {name: self.store.position(name)[0] for name in self.consumers}
+
+    def stats(self) -> Dict[str, Any]:
+        end = self.log.end_offset()
+        out = {"end_offset": end, "segments": len(self.log.segments()), "leader": self._leader_fd is not None,
+               "consumers": {}}
+        for name, offset in self.offsets().items():
+            out["consumers"][name] = {"offset": offset, "lag": max(0, end - offset)}
+        return out
@@ -0,0 +1,188 @@
+import json
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional
+
+from app.logic.money import from_kobo
+from app.logic.quantile_sketch import KLLSketch, DEFAULT_K
+from app.txlog import Consumer, state_key, state_prefix
+
+RISK_WINDOW_DAYS = 7
+RISK_RETENTION_DAYS = 35     # daily totals kept per business for the risk consumer
+
+
+def _tx_key(r: Dict[str, Any]) -> str:
+    # records without a transaction_id cannot be de-duplicated; key them by offset
+    return str(r["id"]) if r.get("id") is not None else f"@{r['o']}"
+
+
+# -------------------------
+# ROLLUPS
+# -------------------------
+class RollupConsumer(Consumer):
+    """Per-business income / expense / category totals and daily totals, in kobo.
+
+    Idempotent per transaction_id: a repeated record is a no-op, and an amended one replaces the
+    old contribution. Rows: ("sum", b) totals, ("day", b, day) daily totals, and ("tx", b, id)
+    the last contribution of each transaction, read back only when that id shows up again.
+    """
+
+    name = "rollups"
+
+    def _add(self, s: Dict[str, Any], b: str, day: str, ttype: str, kobo: int, cat: str, sign: int) -> None:
+        day_key = state_key("day", b, day)
+        daily = self.state.get(day_key)
+        if daily is None:
+            daily = [0, 0]
+            s["days"] += 1
+        if ttype == "income":
+            s["income"] += sign * kobo
+            daily[0] += sign * kobo
+        else:
+            s["expense"] += sign * kobo
+            daily[1] += sign * kobo
+            s["categories"][cat] = s["categories"].get(cat, 0) + sign * kobo
+        self.state.put(day_key, daily)
+
+    def apply(self, records: List[Dict[str, Any]]) -> None:
+        sums: Dict[str, Dict[str, Any]] = {}
+        for r in records:
+            b = r["b"]
+            s = sums.get(b)
+            if s is None:
+                s = sums[b] = self.state.get(state_key("sum", b)) or {
+                    "tx": 0, "days": 0, "income": 0, "expense": 0, "categories": {}}
+            tx_key = state_key("tx", b, _tx_key(r))
+            new = [r["day"], r["type"], r["kobo"], r["cat"]]
+            old = self.state.get(tx_key)
+            if old == new:
+                continue
+            if old is not None:
+                self._add(s, b, *old, sign=-1)
+            else:
+                s["tx"] += 1
+            self._add(s, b, *new, sign=1)
+            self.state.put(tx_key, new)
+        for b, s in sums.items():
+            self.state.put(state_key("sum", b), s)
+
+    def view(self, business_id: str) -> Optional[Dict[str, Any]]:
+        s = self.state.get(state_key("sum", business_id))
+        if s is None:
+            return None
+        top = sorted(s["categories"].items(), key=lambda x: x[1], reverse=True)[:5]
+        return {
+            "transaction_count": s["tx"],
+            "total_income": from_kobo(s["income"]),
+            "total_expense": from_kobo(s["expense"]),
+            "net_cashflow": from_kobo(s["income"] - s["expense"]),
+            "top_expense_categories": [{"category": c, "amount": from_kobo(k)} for c, k in top],
+            "days": s["days"],
+        }
+
+
+# -------------------------
+# EXPENSE BASELINES
+# -------------------------
+class ExpenseBaselineConsumer(Consumer):
+    """KLL-sketch baselines (app/logic/quantile_sketch.py) fed from logged expenses, one
+    ("sketch", b, category) row each; a poll rewrites only the sketches it updated.
+
+    A sketch cannot forget a value, so only the first version of each transaction_id is
+    counted (("seen", b, id) rows). Amendments show up in the baselines after replay(name, 0).
+    """
+
+    name = "expense_baselines"
+
+    def apply(self, records: List[Dict[str, Any]]) -> None:
+        sketches: Dict[str, KLLSketch] = {}
+        for r in records:
+            if r["type"] != "expense":
+                continue
+            seen_key = state_key("seen", r["b"], _tx_key(r))
+            if self.state.get(seen_key) is not None:
+                continue
+            self.state.put(seen_key, 1)
+            key = state_key("sketch", r["b"], r["cat"])
+            sk = sketches.get(key)
+            if sk is None:
+                saved = self.state.get(key)
+                sk = sketches[key] = KLLSketch.from_dict(saved["sketch"]) if saved else KLLSketch(k=DEFAULT_K)
+            sk.update(from_kobo(r["kobo"]))
+        for key, sk in sketches.items():
+            self.state.put(key, {"category": json.loads(key)[2], "sketch": sk.to_dict()})
+
+    def view(self, business_id: str) -> List[Dict[str, Any]]:
+        out = []
+        for _, saved in self.state.scan(state_prefix("sketch", business_id)):
+            sk = KLLSketch.from_dict(saved["sketch"])
+            med, mad = sk.median_and_mad()
+            out.append({"business_id": business_id, "category": saved["category"], "count": sk.n,
+                        "median_amount": med, "mad": mad})
+        return sorted(out, key=lambda e: e["category"])
+
+
+# -------------------------
+# CASHFLOW RISK
+# -------------------------
+class CashflowRiskConsumer(Consumer):
+    """The inputs evaluate_cashflow_risk expects, per business: daily income / expense totals
+    over the last RISK_RETENTION_DAYS and the latest balance.
+
+    "Today" is the business's latest transaction day. Transactions older than the retention
+    window are ignored, so each ("biz", b) row stays bounded.
+    """
+
+    name = "cashflow_risk"
+
+    def apply(self, records: List[Dict[str, Any]]) -> None:
+        touched: Dict[str, Dict[str, Any]] = {}
+        for r in records:
+            b = r["b"]
+            s = touched.get(b)
+            if s is None:
+                s = touched[b] = self.state.get(state_key("biz", b)) or {
+                    "tx": {}, "daily": {}, "latest": None, "balance": None}
+            if s["latest"] is None or r["ts"] >= s["latest"]:
+                s["latest"] = r["ts"]
+                s["balance"] = r["bal"]
+            cutoff = (date.fromisoformat(s["latest"][:10]) - timedelta(days=RISK_RETENTION_DAYS)).isoformat()
+            if r["day"] <= cutoff:
+                continue
+
+            key = _tx_key(r)
+            col = 0 if r["type"] == "income" else 1
+            old = s["tx"].get(key)
+            if old is not None and old[0] in s["daily"]:
+                s["daily"][old[0]][old[1]] -= old[2]
+            s["daily"].setdefault(r["day"], [0, 0])[col] += r["kobo"]
+            s["tx"][key] = [r["day"], col, r["kobo"]]
+
+        for b, s in touched.items():
+            self._trim(s)
+            self.state.put(state_key("biz", b), s)
+
+    @staticmethod
+    def _trim(s: Dict[str, Any]) -> None:
+        cutoff = (date.fromisoformat(s["latest"][:10]) - timedelta(days=RISK_RETENTION_DAYS)).isoformat()
+        s["daily"] = {d: v for d, v in s["daily"].items() if d > cutoff}
+        s["tx"] = {k: v for k, v in s["tx"].items() if v[0] > cutoff}
+
+    def view(self, business_id: str) -> Optional[Dict[str, Any]]:
+        s = self.state.get(state_key("biz", business_id))
+        if s is None or s["latest"] is None:
+            return None
+        today = date.fromisoformat(s["latest"][:10])
+        window = [(today - timedelta(days=d)).isoformat() for d in range(RISK_WINDOW_DAYS, 0, -1)]
+        daily = s["daily"]
+        return {
+            "as_of": today.isoformat(),
+            "last_7_days_income_totals": [from_kobo(daily.get(d, [0, 0])[0]) for d in window],
+            "last_7_days_expense_totals": [from_kobo(daily.get(d, [0, 0])[1]) for d in window],
+            "today_income": from_kobo(daily.get(today.isoformat(), [0, 0])[0]),
+            "today_expense": from_kobo(daily.get(today.isoformat(), [0, 0])[1]),
+            "today_cash_balance": from_kobo(s["balance"]) if s["balance"] is not None else None,
+        }
+
+
+def default_consumers() -> List[Consumer]:
+    return [RollupConsumer(), ExpenseBaselineConsumer(), CashflowRiskConsumer()]
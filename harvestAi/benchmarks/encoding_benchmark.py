@@ -0,0 +1,87 @@
+'''
+Bytes on the wire and parse time: JSON vs msgpack vs Arrow IPC, raw / gzip / zstd.
+
+run with (from harvestAi/):
+    python -m benchmarks.encoding_benchmark
+    python -m benchmarks.encoding_benchmark --rows 10000,200000 --repeat 5
+
+Parse time is what the server spends turning the request bytes into the Python objects handed
+to the logic functions (decompression included), measured with app.codecs.decode_body on a
+/run/cashflow body. Encodings whose package is not installed are skipped.
+'''
+import argparse
+import gzip
+import json
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.codecs import decode_body, msgpack, zstandard, ARROW_STREAM
+from loadtest.load_generator import build_transactions
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional
+    pa = None
+
+
+def encoders() -> Dict[str, Tuple[str, Callable[[List[dict]], bytes]]]:
+    out = {"json": ("application/json", lambda rows: json.dumps({"transactions": rows}).encode())}
+    if msgpack is not None:
+        out["msgpack"] = ("application/msgpack", lambda rows: msgpack.packb({"transactions": rows}))
+    if pa is not None:
+        def arrow(rows):
+            table = pa.Table.from_pylist(rows)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+        out["arrow"] = (ARROW_STREAM, arrow)
+    return out
+
+
+def compressors() -> Dict[str, Optional[Callable[[bytes], bytes]]]:
+    out = {"identity": None, "gzip": lambda b: gzip.compress(b, compresslevel=6)}
+    if zstandard is not None:
+        out["zstd"] = zstandard.ZstdCompressor(level=3).compress
+    return out
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(row_counts: List[int], repeat: int) -> None:
+    print(f"{'rows':>8}  {'encoding':<9}{'compression':<12}{'bytes':>13}{'vs json':>9}{'parse ms':>11}{'vs json':>9}")
+    print("-" * 72)
+    for n in row_counts:
+        rows = build_transactions(n, random.Random(n))
+        baseline_bytes = baseline_time = None
+        for enc_name, (content_type, encode) in encoders().items():
+            raw = encode(rows)
+            for comp_name, compress in compressors().items():
+                body = compress(raw) if compress else raw
+                encoding = "" if comp_name == "identity" else comp_name
+                t = best_of(lambda: decode_body(body, content_type, encoding, "/run/cashflow"), repeat)
+                if baseline_bytes is None:
+                    baseline_bytes, baseline_time = len(body), t
+                print(f"{n:>8}  {enc_name:<9}{comp_name:<12}{len(body):>13,}{len(body) / baseline_bytes:>9.2f}"
+                      f"{t * 1000:>11.2f}{t / baseline_time:>9.2f}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare request encodings for /run/cashflow bodies.")
+    parser.add_argument("--rows", default="1000,50000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run([int(r) for r in args.rows.split(",")], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
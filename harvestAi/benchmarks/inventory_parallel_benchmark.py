@@ -0,0 +1,92 @@
+'''
+Serial vs process-parallel inventory expiry check (app/logic/inventory_parallel.py).
+
+run with (from harvestAi/):
+    python -m benchmarks.inventory_parallel_benchmark
+    python -m benchmarks.inventory_parallel_benchmark --rows 100000,1000000 --workers 4 --repeat 3
+
+The worker pool is started (and its workers have imported the tracker) before anything is
+timed. Every parallel result is checked for equality with check_inventory_expiry, so a run
+that is fast but wrong fails. The speedup is bounded by the cores actually available, so
+os.cpu_count() is printed. "parent cpu" is the API process's own CPU time for the parallel
+call: building the column lists, unpickling the workers' code/days/kobo arrays, and building
+the response entries, which the serial path has to build too. That serial part caps the
+speedup at serial / parent cpu on any number of cores.
+'''
+import argparse
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from app.logic.inventory_expiry_tracker import check_inventory_expiry
+from app.logic.inventory_parallel import MAX_WORKERS, check_inventory_expiry_parallel
+
+UNITS = ("kg", "crate", "bag", "litre", "piece")
+
+
+def build_inventory(rows: int, seed: int = 7) -> Dict[str, Any]:
+    """rows items in the API's schema; about 1% miss a field or have a bad expiry date."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(rows):
+        item = {
+            "item_id": f"itm-{i}",
+            "item_name": f"produce {i % 500}",
+            "quantity": rng.randint(0, 200),
+            "unit": rng.choice(UNITS),
+            "expiry_date": f"2030-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d}",
+            "purchase_price": round(rng.uniform(50, 5000), 2),
+            "category": "vegetables",
+        }
+        roll = rng.random()
+        if roll < 0.005:
+            del item["unit"]
+        elif roll < 0.01:
+            item["expiry_date"] = "soon"
+        items.append(item)
+    return {"inventory": items, "current_date": "2030-02-01"}
+
+
+def best_of(fn: Callable[[], Any], repeat: int):
+    """(best wall seconds, best CPU seconds of this process, result)."""
+    best, best_cpu, result = float("inf"), float("inf"), None
+    for _ in range(repeat):
+        started, cpu = time.perf_counter(), time.process_time()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+        best_cpu = min(best_cpu, time.process_time() - cpu)
+    return best, best_cpu, result
+
+
+def run(row_counts: List[int], workers: int, repeat: int) -> None:
+    # start the pool outside the timings
+    check_inventory_expiry_parallel(build_inventory(workers * 10), workers=workers, min_items=0)
+
+    print(f"cpu_count={os.cpu_count()} workers={workers}\n")
+    print(f"{'rows':>9}{'serial ms':>12}{'parallel ms':>13}{'speedup':>9}{'parent cpu ms':>15}{'max speedup':>13}  equal")
+    print("-" * 78)
+    for rows in row_counts:
+        payload = build_inventory(rows)
+        serial_s, _, expected = best_of(lambda: check_inventory_expiry(payload), repeat)
+        parallel_s, parent_s, result = best_of(
+            lambda: check_inventory_expiry_parallel(payload, workers=workers, min_items=0), repeat
+        )
+        equal = result == expected
+        print(f"{rows:>9}{serial_s * 1000:>12.1f}{parallel_s * 1000:>13.1f}{serial_s / parallel_s:>8.2f}x"
+              f"{parent_s * 1000:>15.1f}{serial_s / parent_s:>12.2f}x  {equal}")
+        if not equal:
+            raise SystemExit(f"parallel result differs from check_inventory_expiry at {rows} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs parallel inventory expiry check.")
+    parser.add_argument("--rows", default="100000,500000", help="comma-separated inventory sizes")
+    parser.add_argument("--workers", type=int, default=max(2, MAX_WORKERS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run([int(r) for r in args.rows.split(",")], args.workers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
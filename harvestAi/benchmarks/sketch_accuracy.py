@@ -0,0 +1,102 @@
+'''
+Accuracy / cost of the KLL-backed expense baselines versus exact median and MAD.
+
+run with (from harvestAi/):
+    python -m benchmarks.sketch_accuracy
+    python -m benchmarks.sketch_accuracy --sizes 1000,100000 --k 100,200,400 --trials 5
+
+For every distribution, size and k it reports:
+- rank error of the median and the MAD (|true rank - 0.5|, worst over trials)
+- relative error of the median and the MAD versus statistics.median
+- the same for a sketch merged from 4 partial sketches (one per simulated worker)
+- retained items (memory) and update throughput
+'''
+import argparse
+import bisect
+import random
+import time
+from statistics import median
+from typing import Callable, Dict, List
+
+from app.logic.quantile_sketch import KLLSketch
+
+DISTRIBUTIONS: Dict[str, Callable[[random.Random], float]] = {
+    # daily produce purchases
+    "lognormal": lambda r: r.lognormvariate(8, 0.6),
+    # produce purchases plus the occasional rent/salary payment
+    "bimodal": lambda r: r.lognormvariate(7, 0.4) if r.random() < 0.9 else r.lognormvariate(12, 0.2),
+    "uniform": lambda r: r.uniform(500, 5000),
+}
+
+
+def rank_error(sorted_values: List[float], estimate: float) -> float:
+    lo = bisect.bisect_left(sorted_values, estimate)
+    hi = bisect.bisect_right(sorted_values, estimate)
+    n = len(sorted_values)
+    # any rank inside [lo, hi] is a correct rank for the estimate; report distance of the closest
+    if lo / n <= 0.5 <= hi / n:
+        return 0.0
+    return min(abs(lo / n - 0.5), abs(hi / n - 0.5))
+
+
+def rel_error(exact: float, approx: float) -> float:
+    return abs(approx - exact) / abs(exact) if exact else abs(approx)
+
+
+def run(sizes: List[int], ks: List[int], trials: int, workers: int = 4) -> None:
+    print(f"{'dist':<10}{'n':>9}{'k':>5}{'med rank':>10}{'med rel':>9}{'mad rank':>10}{'mad rel':>9}"
+          f"{'merged med':>12}{'merged mad':>12}{'retained':>10}{'upd/s':>11}")
+    print("-" * 107)
+    for dist_name, draw in DISTRIBUTIONS.items():
+        for n in sizes:
+            for k in ks:
+                worst = {"med_rank": 0.0, "med_rel": 0.0, "mad_rank": 0.0, "mad_rel": 0.0,
+                         "merged_med": 0.0, "merged_mad": 0.0}
+                retained = 0
+                rate = 0.0
+                for t in range(trials):
+                    rng = random.Random(1000 * t + n + k)
+                    values = [draw(rng) for _ in range(n)]
+                    ordered = sorted(values)
+                    exact_med = median(ordered)
+                    deviations = sorted(abs(v - exact_med) for v in values)
+                    exact_mad = median(deviations)
+
+                    sk = KLLSketch(k=k, seed=t)
+                    started = time.perf_counter()
+                    sk.update_many(values)
+                    rate = max(rate, n / (time.perf_counter() - started))
+                    med, mad = sk.median_and_mad()
+                    retained = max(retained, sum(len(lvl) for lvl in sk.levels))
+
+                    parts = [KLLSketch(k=k, seed=t * 10 + w) for w in range(workers)]
+                    for i, v in enumerate(values):
+                        parts[i % workers].update(v)
+                    merged = parts[0]
+                    for p in parts[1:]:
+                        merged.merge(KLLSketch.from_dict(p.to_dict()))
+                    m_med, m_mad = merged.median_and_mad()
+
+                    worst["med_rank"] = max(worst["med_rank"], rank_error(ordered, med))
+                    worst["med_rel"] = max(worst["med_rel"], rel_error(exact_med, med))
+                    worst["mad_rank"] = max(worst["mad_rank"], rank_error(deviations, mad))
+                    worst["mad_rel"] = max(worst["mad_rel"], rel_error(exact_mad, mad))
+                    worst["merged_med"] = max(worst["merged_med"], rel_error(exact_med, m_med))
+                    worst["merged_mad"] = max(worst["merged_mad"], rel_error(exact_mad, m_mad))
+
+                print(f"{dist_name:<10}{n:>9}{k:>5}{worst['med_rank']:>10.2%}{worst['med_rel']:>9.2%}"
+                      f"{worst['mad_rank']:>10.2%}{worst['mad_rel']:>9.2%}{worst['merged_med']:>12.2%}"
+                      f"{worst['merged_mad']:>12.2%}{retained:>10}{rate:>11,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KLL sketch vs exact median/MAD.")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--k", default="200")
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(",")], [int(k) for k in args.k.split(",")], args.trials)
+
+
+if __name__ == "__main__":
+    main()
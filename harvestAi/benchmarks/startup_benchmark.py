@@ -0,0 +1,133 @@
+'''
+Cold-start cost: import time of app.main and latency of the first request per route.
+
+run with (from harvestAi/):
+    python -m benchmarks.startup_benchmark
+    python -m benchmarks.startup_benchmark --repeat 7 --warmup all
+    python -m benchmarks.startup_benchmark --max-import-ms 600     # exits 1 on a regression
+
+Every measurement runs in a fresh interpreter, because only the first import and the first
+request pay for loading modules. "first" is the first request to a route after startup, which
+is when its engine loads, unless --warmup loaded it and /ready was awaited. "second" is the
+same request again. The check fails if any of HEAVY is imported by `import app.main` alone.
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+HEAVY = ("numpy", "pandas", "pyarrow", "requests", "sklearn")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT = """
+import json, sys, time
+t = time.perf_counter()
+import app.main
+print(json.dumps({"seconds": time.perf_counter() - t,
+                  "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+_FIRST_REQUEST = """
+import json, sys, time
+from fastapi.testclient import TestClient
+from app.main import create_app
+
+method, path, body, warmup = json.loads(sys.argv[1])
+t = time.perf_counter()
+with TestClient(create_app(warmup=warmup)) as client:
+    startup = time.perf_counter() - t
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter() - t
+    times = []
+    for _ in range(2):
+        t0 = time.perf_counter()
+        r = client.request(method, path, json=body)
+        times.append(time.perf_counter() - t0)
+    summary = r.json().get("summary") or {}
+    print(json.dumps({"status": r.status_code, "startup": startup, "ready": ready,
+                      "first": times[0], "second": times[1], "skipped": summary.get("skipped_items")}))
+"""
+
+_INVENTORY = {"payload": {"inventory": [
+    {"item_id": f"itm-{i}", "item_name": f"item {i}", "quantity": 3, "unit": "kg",
+     "expiry_date": f"2030-01-{i % 28 + 1:02d}", "purchase_price": 150.0}
+    for i in range(200)
+], "current_date": "2030-01-01"}}
+_EXPENSES = {"payload": {"expenses": [
+    {"amount": 1000 + (i * 37) % 400, "category": "supplies", "date": "2030-01-01"} for i in range(200)
+]}}
+_TRANSACTIONS = {"current_balance": 50000, "paths": 500, "transactions": [
+    {"date": f"2030-01-{d % 28 + 1:02d}", "type": "income" if d % 2 else "expense", "amount": 900 + d}
+    for d in range(60)
+]}
+
+ROUTES = [
+    ("GET", "/health", None),
+    ("POST", "/run/inventory-expiry", _INVENTORY),
+    ("POST", "/run/anomalies-local", _EXPENSES),
+    ("POST", "/run/cashflow-runway", _TRANSACTIONS),
+]
+
+
+def _python(code: str, *args: str) -> Dict[str, Any]:
+    out = subprocess.run([sys.executable, "-c", code, *args], cwd=ROOT, capture_output=True, text=True,
+                         check=True, env={**os.environ, "PYTHONPATH": ROOT})
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _ms(values: List[float]) -> str:
+    return f"{statistics.median(values) * 1000:>9.1f}{min(values) * 1000:>9.1f}"
+
+
+def run(repeat: int, warmup: str) -> Dict[str, Any]:
+    imports = [_python(_IMPORT) for _ in range(repeat)]
+    import_seconds = [r["seconds"] for r in imports]
+    heavy = sorted({m for r in imports for m in r["heavy"]})
+    print(f"{'':<28}{'median ms':>9}{'min ms':>9}")
+    print("-" * 46)
+    print(f"{'import app.main':<28}{_ms(import_seconds)}")
+    print(f"heavy modules imported: {', '.join(heavy) or 'none'}\n")
+
+    print(f"{'route (warmup=' + (warmup or 'none') + ')':<28}{'startup':>9}{'ready':>9}{'first':>9}{'second':>9}")
+    print("-" * 64)
+    routes = {}
+    for method, path, body in ROUTES:
+        runs = [_python(_FIRST_REQUEST, json.dumps([method, path, body, warmup])) for _ in range(repeat)]
+        bad = [r["status"] for r in runs if r["status"] != 200]
+        if bad:
+            raise SystemExit(f"{method} {path} returned {bad[0]}")
+        skipped = [r["skipped"] for r in runs if r.get("skipped")]
+        if skipped:
+            # a payload the engine mostly skips would time the validation path, not the route
+            raise SystemExit(f"{method} {path} skipped {skipped[0]} rows of its benchmark payload")
+        med = {k: statistics.median(r[k] for r in runs) for k in ("startup", "ready", "first", "second")}
+        routes[path] = med
+        print(f"{method + ' ' + path:<28}" + "".join(f"{med[k] * 1000:>9.1f}" for k in med))
+    return {"import_seconds": statistics.median(import_seconds), "heavy_at_import": heavy, "routes": routes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and first-request latency of the API.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", default="", help='HARVESTAI_WARMUP for the app under test, e.g. "all"')
+    parser.add_argument("--max-import-ms", type=float, default=None, help="fail if the median import is slower")
+    args = parser.parse_args()
+
+    report = run(args.repeat, args.warmup)
+    failures = []
+    if report["heavy_at_import"]:
+        failures.append(f"imported at startup: {', '.join(report['heavy_at_import'])}")
+    if args.max_import_ms is not None and report["import_seconds"] * 1000 > args.max_import_ms:
+        failures.append(f"import took {report['import_seconds'] * 1000:.0f}ms > {args.max_import_ms:.0f}ms")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+'''
+Open-loop load generator for the harvestAi API.
+
+run with (from harvestAi/, with the app pointed at loadtest.stub_backend):
+    python -m loadtest.load_generator --base-url http://127.0.0.1:8000 --rps 50 --duration 30
+    python -m loadtest.load_generator --endpoints cashflow,inventory-expiry --items 2000 --json-out report.json
+
+Requests are fired on a fixed schedule regardless of how fast responses come back,
+and latency is measured from the *scheduled* send time, so a stalled server shows up
+as queueing latency instead of silently lowering the offered load.
+'''
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Any, List, Tuple
+
+import requests
+
+CATEGORIES = ["produce", "rent", "transport", "utilities", "salaries", "packaging", "fuel"]
+UNITS = ["kg", "crate", "bag", "litre", "piece"]
+
+
+# -------------------------
+# PAYLOAD BUILDERS
+# -------------------------
+def build_transactions(n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    start = date.today() - timedelta(days=90)
+    balance = 250000.0
+    rows = []
+    for i in range(n):
+        ttype = "income" if rng.random() < 0.45 else "expense"
+        amount = round(rng.uniform(500, 60000), 2)
+        balance += amount if ttype == "income" else -amount
+        rows.append({
+            "transaction_id": f"tx-{i}",
+            "business_id": "biz-load",
+            "date": (start + timedelta(days=i * 90 // max(n, 1))).isoformat(),
+            "type": ttype,
+            "amount": amount,
+            "category": "sales" if ttype == "income" else rng.choice(CATEGORIES),
+            "description": f"load-test {ttype} {i}",
+            "current_balance": round(balance, 2),
+        })
+    return rows
+
+
+def build_inventory(n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    today = date.today()
+    return [
+        {
+            "item_id": f"item-{i}",
+            "business_id": "biz-load",
+            "item_name": f"Item {i}",
+            "quantity": rng.randint(1, 200),
+            "unit": rng.choice(UNITS),
+            "expiry_date": (today + timedelta(days=rng.randint(-5, 40))).isoformat(),
+            "purchase_price": round(rng.uniform(100, 15000), 2),
+            "category": rng.choice(CATEGORIES),
+        }
+        for i in range(n)
+    ]
+
+
+def build_expenses(n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {
+            "transaction_id": f"exp-{i}",
+            "business_id": "biz-load",
+            "amount": round(rng.lognormvariate(8, 0.6) * (10 if rng.random() < 0.01 else 1), 2),
+            "category": rng.choice(CATEGORIES),
+        }
+        for i in range(n)
+    ]
+
+
+def endpoint_payloads(items: int, seed: int) -> Dict[str, Tuple[str, List[str]]]:
+    """Each endpoint gets a small pool of pre-built bodies so generation cost stays off the hot path."""
+    rng = random.Random(seed)
+    pool = 8
+
+    cashflow = [json.dumps({"transactions": build_transactions(items, rng)}) for _ in range(pool)]
+    inventory = [build_inventory(items, rng) for _ in range(pool)]
+    expenses = [build_expenses(items, rng) for _ in range(pool)]
+
+    inv_expiry = [json.dumps({"payload": {"inventory": inv}}) for inv in inventory]
+    inv_forward = [json.dumps({"payload": {"business_id": "biz-load", "inventory": inv}}) for inv in inventory]
+    anomalies = [json.dumps({"payload": {"expenses": exp}}) for exp in expenses]
+
+    return {
+        "cashflow": ("/run/cashflow", cashflow),
+        "inventory": ("/run/inventory", inv_forward),
+        "anomalies": ("/run/anomalies", anomalies),
+        "inventory-expiry": ("/run/inventory-expiry", inv_expiry),
+        "anomalies-local": ("/run/anomalies-local", anomalies),
+    }
+
+
+# -------------------------
+# STATS
+# -------------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies_ms: List[float] = []
+        self.status_counts: Dict[str, int] = {}
+        self.errors = 0
+
+    def record(self, latency_ms: float, status: str, ok: bool):
+        with self.lock:
+            self.latencies_ms.append(latency_ms)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if not ok:
+                self.errors += 1
+
+    def report(self, wall_seconds: float) -> Dict[str, Any]:
+        lat = sorted(self.latencies_ms)
+        count = len(lat)
+        return {
+            "requests": count,
+            "throughput_rps": round(count / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "p50_ms": round(percentile(lat, 50), 2),
+            "p95_ms": round(percentile(lat, 95), 2),
+            "p99_ms": round(percentile(lat, 99), 2),
+            "max_ms": round(lat[-1], 2) if lat else 0.0,
+            "status_counts": dict(sorted(self.status_counts.items())),
+        }
+
+
+# -------------------------
+# DRIVER
+# -------------------------
+def run_load(base_url: str, endpoints: List[str], rps: float, duration: float, items: int,
+             timeout: float, max_workers: int, seed: int = 7) -> Dict[str, Any]:
+    payloads = endpoint_payloads(items, seed)
+    unknown = [e for e in endpoints if e not in payloads]
+    if unknown:
+        raise ValueError(f"Unknown endpoint(s): {unknown}. Choose from {sorted(payloads)}")
+
+    stats = {e: EndpointStats() for e in endpoints}
+    local = threading.local()
+    headers = {"Content-Type": "application/json"}
+
+    def session() -> requests.Session:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def fire(name: str, body: str, scheduled_at: float):
+        path = payloads[name][0]
+        try:
+            r = session().post(f"{base_url}{path}", data=body, headers=headers, timeout=timeout)
+            status, ok = str(r.status_code), r.status_code < 400
+        except requests.Timeout:
+            status, ok = "timeout", False
+        except requests.RequestException:
+            status, ok = "conn_error", False
+        stats[name].record((time.perf_counter() - scheduled_at) * 1000.0, status, ok)
+
+    interval = 1.0 / rps
+    total = int(rps * duration)
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i in range(total):
+            scheduled_at = started + i * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = endpoints[i % len(endpoints)]
+            pool.submit(fire, name, rng.choice(payloads[name][1]), scheduled_at)
+    wall = time.perf_counter() - started
+
+    return {
+        "config": {"base_url": base_url, "rps": rps, "duration_s": duration, "items_per_request": items},
+        "wall_seconds": round(wall, 2),
+        "endpoints": {e: stats[e].report(wall) for e in endpoints},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the harvestAi API at a target request rate.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoints", default="cashflow,inventory,anomalies,inventory-expiry,anomalies-local",
+                        help="comma separated; requests are spread round-robin across them")
+    parser.add_argument("--rps", type=float, default=20.0, help="total target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--items", type=int, default=500, help="rows per payload (transactions/items/expenses)")
+    parser.add_argument("--timeout", type=float, default=35.0, help="client timeout per request, seconds")
+    parser.add_argument("--max-workers", type=int, default=256, help="max in-flight requests")
+    parser.add_argument("--json-out", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run_load(
+        base_url=args.base_url.rstrip("/"),
+        endpoints=[e.strip() for e in args.endpoints.split(",") if e.strip()],
+        rps=args.rps,
+        duration=args.duration,
+        items=args.items,
+        timeout=args.timeout,
+        max_workers=args.max_workers,
+    )
+
+    print("=" * 96)
+    print(f"{'endpoint':<18}{'reqs':>7}{'rps':>9}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    print("-" * 96)
+    for name, r in report["endpoints"].items():
+        print(f"{name:<18}{r['requests']:>7}{r['throughput_rps']:>9.1f}{r['error_rate'] * 100:>8.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}  {r['status_counts']}")
+    print("=" * 96)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+'''
+Local stand-in for the DS backend, used for load-testing harvestAi.
+
+run with (from harvestAi/):
+    python -m loadtest.stub_backend --port 3001 --latency-ms 40 --error-rate 0.01
+
+then start harvestAi against it:
+    HARVESTAI_BACKEND_URL=http://127.0.0.1:3001 uvicorn app.main:app
+
+Behaviour can also be changed while a test is running:
+    curl -X POST localhost:3001/stub/config -H 'content-type: application/json' \\
+         -d '{"slow_rate": 0.2, "slow_ms": 35000}'
+'''
+import argparse
+import asyncio
+import os
+import random
+from typing import Dict, Any, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+app = FastAPI(title="harvestAi DS Backend Stub", version="1.0.0")
+
+CONFIG: Dict[str, float] = {
+    "latency_ms": float(os.getenv("STUB_LATENCY_MS", "40")),    # base latency of every response
+    "jitter_ms": float(os.getenv("STUB_JITTER_MS", "10")),      # +/- uniform jitter on the base latency
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),     # fraction of requests answered with 5xx
+    "slow_rate": float(os.getenv("STUB_SLOW_RATE", "0")),       # fraction of requests that take slow_ms
+    "slow_ms": float(os.getenv("STUB_SLOW_MS", "5000")),
+}
+
+STATS: Dict[str, int] = {"requests": 0, "errors": 0, "slow": 0}
+
+
+class StubConfig(BaseModel):
+    latency_ms: Optional[float] = None
+    jitter_ms: Optional[float] = None
+    error_rate: Optional[float] = None
+    slow_rate: Optional[float] = None
+    slow_ms: Optional[float] = None
+
+
+async def _simulate(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    STATS["requests"] += 1
+
+    if random.random() < CONFIG["slow_rate"]:
+        STATS["slow"] += 1
+        delay_ms = CONFIG["slow_ms"]
+    else:
+        jitter = CONFIG["jitter_ms"]
+        delay_ms = max(0.0, CONFIG["latency_ms"] + random.uniform(-jitter, jitter))
+    await asyncio.sleep(delay_ms / 1000.0)
+
+    if random.random() < CONFIG["error_rate"]:
+        STATS["errors"] += 1
+        raise HTTPException(status_code=random.choice([500, 502, 503]), detail="stub: injected failure")
+
+    return {"status": "success", "stub": True, "prediction": kind, "received_keys": sorted(payload.keys())}
+
+
+@app.post("/predictions/cashflow")
+async def predictions_cashflow(payload: Dict[str, Any]):
+    return await _simulate("cashflow", payload)
+
+
+@app.post("/predictions/inventory")
+async def predictions_inventory(payload: Dict[str, Any]):
+    return await _simulate("inventory", payload)
+
+
+@app.post("/predictions/anomalies")
+async def predictions_anomalies(payload: Dict[str, Any]):
+    return await _simulate("anomalies", payload)
+
+
+@app.get("/stub/config")
+def get_config():
+    return {"config": CONFIG, "stats": STATS}
+
+
+@app.post("/stub/config")
+def set_config(cfg: StubConfig):
+    CONFIG.update({k: v for k, v in cfg.model_dump().items() if v is not None})
+    return {"config": CONFIG}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the local DS backend stub.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"])
+    parser.add_argument("--slow-rate", type=float, default=CONFIG["slow_rate"])
+    parser.add_argument("--slow-ms", type=float, default=CONFIG["slow_ms"])
+    args = parser.parse_args()
+
+    CONFIG.update({
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "slow_rate": args.slow_rate,
+        "slow_ms": args.slow_ms,
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
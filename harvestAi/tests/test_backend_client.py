@@ -0,0 +1,42 @@
+import time
+
+import pytest
+import requests
+
+from app import backend_client
+
+
+@pytest.fixture
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(backend_client, "_BREAKERS", {})
+    monkeypatch.setattr(backend_client, "_backoff", lambda attempt: 0.0)
+
+
+def _hung_backend(url, payload, remaining):
+    raise requests.Timeout("read timed out")
+
+
+def test_backend_timeouts_open_the_breaker(monkeypatch, fresh_breakers):
+    monkeypatch.setattr(backend_client, "_attempt", _hung_backend)
+    statuses = []
+    for _ in range(backend_client.BREAKER_FAILURE_THRESHOLD + 2):
+        with pytest.raises(backend_client.BackendError) as e:
+            backend_client.post_cashflow({"transactions": []})
+        statuses.append(e.value.status_code)
+    state = backend_client.breaker_states()["/predictions/cashflow"]
+    assert state["state"] == backend_client.CircuitBreaker.OPEN
+    assert statuses[0] == 504 and statuses[-1] == 503
+
+
+def test_short_client_deadline_does_not_trip_the_breaker(monkeypatch, fresh_breakers):
+    def slow(url, payload, remaining):
+        time.sleep(remaining)
+        raise requests.Timeout("read timed out")
+
+    monkeypatch.setattr(backend_client, "_attempt", slow)
+    for _ in range(backend_client.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(backend_client.BackendError) as e:
+            backend_client.post_cashflow({"transactions": []}, deadline=time.monotonic() + 0.01)
+        assert e.value.status_code == 504
+    state = backend_client.breaker_states()["/predictions/cashflow"]
+    assert state == {"state": backend_client.CircuitBreaker.CLOSED, "consecutive_failures": 0}
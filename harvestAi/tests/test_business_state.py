@@ -0,0 +1,72 @@
+import random
+from statistics import median
+
+from app import business_state
+from app.logic.cashflow_logic import summarize_cashflow
+from app.logic.expense_anomaly import detect_expense_anomalies, mad_of_sorted, median_of_sorted
+
+
+def _transactions(rng, n, start=0):
+    return [
+        {"transaction_id": f"t{i}", "date": f"2030-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+         "type": rng.choice(["income", "expense"]), "amount": rng.choice([round(rng.uniform(1, 900), 2), 100, "250.25"]),
+         "category": rng.choice("abcdefg"), "description": "", "current_balance": rng.randint(0, 10 ** 6)}
+        for i in range(start, start + n)
+    ]
+
+
+def _expenses(rng, n):
+    return [{"amount": rng.choice([1000, 1000, 1200, 0, 99999, round(rng.uniform(0, 5000), 2)]), "category": "feed"}
+            for _ in range(n)]
+
+
+def test_incremental_folds_match_full_computation():
+    rng = random.Random(3)
+    for _ in range(50):
+        cache = business_state.BusinessStateCache()
+        txs, expenses = [], []
+        for step in range(4):
+            txs += _transactions(rng, rng.randint(1, 30), len(txs))
+            expenses += _expenses(rng, rng.randint(1, 300))
+            derived, how = cache.get_or_build("biz", business_state.CASHFLOW, txs)
+            assert how == ("miss" if step == 0 else "fold")
+            assert derived["summary"] == summarize_cashflow(txs)
+            assert derived == business_state.build_cashflow_state(txs)
+            derived, _ = cache.get_or_build("biz", business_state.ANOMALIES, expenses)
+            assert derived == detect_expense_anomalies({"expenses": expenses})
+            assert cache.get_or_build("biz", business_state.ANOMALIES, expenses)[1] == "hit"
+
+
+def test_different_history_sharing_the_row_at_the_mark_is_rebuilt():
+    a, b, c, d = ({"amount": v, "category": "x"} for v in (10, 20, 35, 30))
+    x, y = {"amount": 900, "category": "x"}, {"amount": 927, "category": "x"}
+    cache = business_state.BusinessStateCache()
+    cache.get_or_build("biz", business_state.ANOMALIES, [a, b, c])
+    derived, how = cache.get_or_build("biz", business_state.ANOMALIES, [x, y, c, d])
+    assert how == "miss"
+    assert derived == detect_expense_anomalies({"expenses": [x, y, c, d]})
+
+
+def test_workers_share_checkpoints(tmp_path):
+    rng = random.Random(5)
+    path = str(tmp_path / "state.db")
+    one = business_state.BusinessStateCache(shared=business_state.SqliteStateStore(path))
+    two = business_state.BusinessStateCache(shared=business_state.SqliteStateStore(path))
+    expenses = _expenses(rng, 400)
+    one.get_or_build("biz", business_state.ANOMALIES, expenses)
+    expenses += _expenses(rng, 5)
+    derived, how = two.get_or_build("biz", business_state.ANOMALIES, expenses)
+    assert how == "shared" and derived == detect_expense_anomalies({"expenses": expenses})
+    # a few new rows on a long history do not rewrite the checkpoint
+    assert two.snapshot()["checkpoints"] == 0
+    one.invalidate("biz")
+    assert two.get_or_build("biz", business_state.ANOMALIES, expenses)[1] == "miss"
+
+
+def test_sorted_median_and_mad_match_statistics():
+    rng = random.Random(7)
+    for n in range(1, 40):
+        values = sorted(rng.choice([1.0, 2.0, 2.0, 5.5, rng.uniform(0, 10)]) for _ in range(n))
+        med = median_of_sorted(values, 0, n)
+        assert med == median(values)
+        assert mad_of_sorted(values, 0, n, med) == median([abs(v - med) for v in values])
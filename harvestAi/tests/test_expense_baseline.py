@@ -0,0 +1,25 @@
+import pytest
+
+from app.logic.expense_baseline import ExpenseBaselineStore
+
+
+def test_export_round_trips_and_merges_once():
+    store = ExpenseBaselineStore()
+    store.update([{"business_id": "b", "category": "feed", "amount": 100 + i} for i in range(50)])
+    export = store.to_dict()
+    target = ExpenseBaselineStore()
+    assert target.merge(ExpenseBaselineStore.from_dict(export), export_id=export["export_id"])
+    assert not target.merge(ExpenseBaselineStore.from_dict(export), export_id=export["export_id"])
+    assert target.baseline("b", "feed") == store.baseline("b", "feed")
+
+
+@pytest.mark.parametrize("body", [
+    {"baselines": [{"business_id": "b", "category": "c"}]},
+    {"baselines": ["not an entry"]},
+    {"baselines": 5},
+    {"baselines": [{"business_id": "b", "category": "c", "sketch": {"min": "low"}}]},
+    {"baselines": [{"business_id": "b", "category": "c", "sketch": {"k": 0}}]},
+])
+def test_malformed_export_raises_value_error(body):
+    with pytest.raises(ValueError):
+        ExpenseBaselineStore.from_dict(body)
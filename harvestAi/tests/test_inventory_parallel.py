@@ -0,0 +1,40 @@
+from app.logic.inventory_expiry_tracker import check_inventory_expiry
+from app.logic.inventory_parallel import check_inventory_expiry_parallel, MIN_CHUNK_ITEMS
+
+
+def _inventory(rows):
+    items = []
+    for i in range(rows):
+        item = {
+            "item_id": i if i % 3 else f"itm-{i}",        # ids keep their type
+            "item_name": f"produce {i % 50}",
+            "quantity": (i % 40) / 4,
+            "unit": "kg",
+            "expiry_date": f"2030-{i % 3 + 1:02d}-{i % 28 + 1:02d}",
+            "purchase_price": [None, 0, 99.995, "120.50"][i % 4],
+        }
+        if i % 97 == 0:
+            del item["unit"]                              # skipped: missing field
+        elif i % 89 == 0:
+            item["expiry_date"] = None                    # skipped: no expiry date
+        elif i % 83 == 0:
+            item["expiry_date"] = "next week"             # skipped: bad date
+        elif i % 79 == 0:
+            del item["purchase_price"]
+        items.append(item)
+    return {"inventory": items, "current_date": "2030-02-01"}
+
+
+def test_parallel_matches_serial_across_chunks():
+    payload = _inventory(2 * MIN_CHUNK_ITEMS + 123)       # three chunks, the last one partial
+    expected = check_inventory_expiry(payload)
+    result = check_inventory_expiry_parallel(payload, workers=2, min_items=0)
+    assert result == expected
+    assert result["summary"]["skipped_items"] > 0
+    assert [type(i["item_id"]) for i in result["ok_items"]] == [type(i["item_id"]) for i in expected["ok_items"]]
+
+
+def test_small_or_invalid_input_uses_serial_path():
+    small = _inventory(50)
+    assert check_inventory_expiry_parallel(small, workers=2) == check_inventory_expiry(small)
+    assert check_inventory_expiry_parallel({"inventory": []}, workers=2)["status"] == "error"
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+from app.logic.inventory_snapshot import InventorySnapshotStore, SqliteSnapshotStore, VersionConflict
+
+DAY = datetime(2030, 2, 1)
+
+
+def _item(i, **extra):
+    return {"item_id": i, "item_name": f"item {i}", "quantity": 2, "unit": "kg",
+            "expiry_date": f"2030-02-{i % 28 + 1:02d}", "purchase_price": 10.5, **extra}
+
+
+def _workers(tmp_path, n=2):
+    path = str(tmp_path / "state.db")
+    return [InventorySnapshotStore(shared=SqliteSnapshotStore(path)) for _ in range(n)]
+
+
+def test_deltas_may_land_on_any_worker(tmp_path):
+    one, two = _workers(tmp_path)
+    r = one.apply_delta("biz", None, [_item(i) for i in range(10)], [], current_date=DAY)
+    r = two.apply_delta("biz", r["version"], [_item(3, quantity=7), _item(10)], [4], current_date=DAY)
+    r = one.apply_delta("biz", r["version"], [_item(11)], [0], current_date=DAY)   # replays two's delta
+    assert r["summary"] == two.apply_delta("biz", r["version"], [], [], current_date=DAY)["summary"]
+    a, b = one.get("biz"), two.get("biz")
+    assert a.token == b.token
+    assert a.full_result() == b.full_result()
+    assert a.full_result()["summary"]["skipped_items"] == 0 and len(a.items) == 10
+
+
+def test_stale_token_and_replace_across_workers(tmp_path):
+    one, two = _workers(tmp_path)
+    first = one.apply_delta("biz", None, [_item(i) for i in range(5)], [], current_date=DAY)
+    two.apply_delta("biz", first["version"], [_item(9)], [], current_date=DAY)
+    with pytest.raises(VersionConflict):
+        one.apply_delta("biz", first["version"], [_item(8)], [], current_date=DAY)
+    with pytest.raises(VersionConflict):
+        two.apply_delta("biz", None, [_item(8)], [], current_date=DAY)      # not a first sync any more
+    fresh = two.apply_delta("biz", None, [_item(1)], [], current_date=DAY, replace=True)
+    r = one.apply_delta("biz", fresh["version"], [_item(2)], [], current_date=DAY)
+    assert r["summary"]["critical_items"] + r["summary"]["expired_items"] + r["summary"]["ok_items"] \
+        + r["summary"]["warning_items"] == 2
+    assert two.get("biz").full_result() == one.get("biz").full_result()
+
+
+def test_worker_that_missed_more_than_the_log_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.logic.inventory_snapshot.DELTA_LOG_MAX", 2)
+    one, two = _workers(tmp_path)
+    r = one.apply_delta("biz", None, [_item(i) for i in range(3)], [], current_date=DAY)
+    assert two.get("biz").token == r["version"]
+    for i in range(5):
+        r = one.apply_delta("biz", r["version"], [_item(100 + i)], [i % 3], current_date=DAY)
+    assert two.get("biz").full_result() == one.get("biz").full_result()
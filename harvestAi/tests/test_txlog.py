@@ -0,0 +1,30 @@
+import os
+
+from app import txlog
+
+
+def _record(i):
+    return {"b": "biz", "id": f"t{i}", "ts": "2030-01-01T00:00:00", "day": "2030-01-01", "type": "expense",
+            "kobo": 100 * i, "cat": "feed", "bal": None}
+
+
+def test_read_stops_at_a_torn_segment_head(tmp_path):
+    log = txlog.TransactionLog(str(tmp_path), segment_records=3)
+    log.append(_record(i) for i in range(3))
+    # the next segment was created but its first line is only half written
+    with open(os.path.join(log.segment_dir, f"{3:020d}.log"), "wb") as f:
+        f.write(b'{"o":3,"b":"bi')
+    assert [r["o"] for r in log.read(0)] == [0, 1, 2]
+    assert log.read(3) == []
+    assert log.read(10) == []
+    # the next append truncates the torn line and continues from offset 3
+    assert log.append([_record(3)]) == (3, 4)
+    assert [r["o"] for r in log.read(2)] == [2, 3]
+
+
+def test_normalise_keeps_unparseable_balances_out_of_the_log():
+    tx = {"transaction_id": "t1", "date": "2030-01-02", "type": "Income", "amount": "12.50",
+          "category": "sales", "description": "", "current_balance": ""}
+    assert txlog.normalise(tx, "biz")["bal"] is None
+    assert txlog.normalise({**tx, "current_balance": "N/A"}, "biz")["bal"] is None
+    assert txlog.normalise({**tx, "current_balance": "1000.25"}, "biz")["bal"] == 100025